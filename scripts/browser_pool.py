@@ -0,0 +1,235 @@
+"""
+Shared pool of long-lived Playwright browsers.
+
+Launching a browser costs seconds, opening a context on a running one costs
+milliseconds. The pool starts browsers lazily, hands out a fresh context and
+page per request, replaces browsers that crashed and recycles each one after
+a number of pages so memory leaks don't accumulate.
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Browsers kept running per engine
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '2'))
+# Contexts open at the same time on one browser
+BROWSER_CONTEXTS_PER_BROWSER = int(os.getenv('BROWSER_CONTEXTS_PER_BROWSER', '4'))
+# Pages open at the same time across the whole pool
+BROWSER_MAX_PAGES = int(os.getenv('BROWSER_MAX_PAGES', '6'))
+# Pages served by one browser before it is closed and replaced
+BROWSER_RECYCLE_AFTER = int(os.getenv('BROWSER_RECYCLE_AFTER', '50'))
+
+LAUNCH_OPTIONS = {
+    'chromium': {
+        'headless': True,
+        'args': [
+            '--no-sandbox',
+            '--disable-setuid-sandbox',
+            '--disable-dev-shm-usage',
+            '--disable-accelerated-2d-canvas',
+            '--disable-gpu',
+            '--disable-blink-features=AutomationControlled',
+            '--window-size=1920,1080',
+        ],
+    },
+    'firefox': {
+        'headless': True,
+        'firefox_user_prefs': {
+            'general.useragent.override': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:122.0) Gecko/20100101 Firefox/122.0',
+            'privacy.trackingprotection.enabled': False,
+            'network.http.referer.spoofSource': True,
+            'network.cookie.cookieBehavior': 0,
+            'permissions.default.image': 2  # Disable images for faster loading
+        },
+    },
+}
+
+
+class PooledBrowser:
+    """A running browser and its usage counters."""
+
+    def __init__(self, engine: str, browser):
+        self.engine = engine
+        self.browser = browser
+        self.active = 0
+        self.pages_served = 0
+        self.retiring = False
+
+    @property
+    def healthy(self) -> bool:
+        if self.browser is None:
+            # Still launching
+            return True
+        try:
+            return self.browser.is_connected()
+        except Exception:
+            return False
+
+
+class BrowserPool:
+    """
+    Pool of Playwright browsers per engine ('chromium', 'firefox').
+
+    Use `async with pool.page('chromium', **context_options) as page:`; the
+    context is closed when the block exits and the browser goes back to the pool.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, contexts_per_browser: int = BROWSER_CONTEXTS_PER_BROWSER,
+                 max_pages: int = BROWSER_MAX_PAGES, recycle_after: int = BROWSER_RECYCLE_AFTER,
+                 launcher: Optional[Callable[[str], Awaitable[Any]]] = None):
+        self.size = max(1, size)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.max_pages = max(1, max_pages)
+        self.recycle_after = max(1, recycle_after)
+        self._launcher = launcher
+
+        # Statistics
+        self.launched = 0
+        self.recycled = 0
+        self.replaced = 0
+        self.pages_served = 0
+
+        self._reset()
+
+    def _reset(self):
+        # Playwright objects and asyncio primitives belong to one event loop
+        self._loop = None
+        self._playwright = None
+        self._browsers: Dict[str, List[PooledBrowser]] = {}
+        self._condition: Optional[asyncio.Condition] = None
+        self._page_slots: Optional[asyncio.Semaphore] = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None:
+                logger.info("Event loop changed, starting a fresh browser pool")
+            self._reset()
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self._page_slots = asyncio.Semaphore(self.max_pages)
+
+    async def _launch(self, engine: str):
+        if self._launcher is not None:
+            return await self._launcher(engine)
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        return await getattr(self._playwright, engine).launch(**LAUNCH_OPTIONS.get(engine, {'headless': True}))
+
+    async def _close_browser(self, pooled: PooledBrowser):
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.debug(f"Error closing {pooled.engine} browser: {e}")
+
+    async def _acquire(self, engine: str) -> PooledBrowser:
+        async with self._condition:
+            while True:
+                browsers = self._browsers.setdefault(engine, [])
+
+                # Health check: forget browsers that crashed or were disconnected
+                for pooled in [b for b in browsers if not b.healthy]:
+                    logger.warning(f"Replacing disconnected {engine} browser")
+                    browsers.remove(pooled)
+                    self.replaced += 1
+
+                available = [
+                    b for b in browsers
+                    if b.browser is not None and not b.retiring and b.active < self.contexts_per_browser
+                ]
+                if available:
+                    pooled = min(available, key=lambda b: b.active)
+                    pooled.active += 1
+                    return pooled
+
+                if len(browsers) < self.size:
+                    # Reserve the slot before launching so concurrent callers don't overshoot
+                    pooled = PooledBrowser(engine, None)
+                    pooled.active = 1
+                    browsers.append(pooled)
+                    break
+
+                await self._condition.wait()
+
+        try:
+            pooled.browser = await self._launch(engine)
+        except Exception:
+            async with self._condition:
+                browsers.remove(pooled)
+                self._condition.notify_all()
+            raise
+        self.launched += 1
+        async with self._condition:
+            # Waiters may now share the new browser's remaining contexts
+            self._condition.notify_all()
+        logger.info(f"Launched pooled {engine} browser ({len(browsers)}/{self.size})")
+        return pooled
+
+    async def _release(self, pooled: PooledBrowser):
+        close = False
+        async with self._condition:
+            pooled.active -= 1
+            pooled.pages_served += 1
+            self.pages_served += 1
+            if pooled.pages_served >= self.recycle_after:
+                pooled.retiring = True
+            browsers = self._browsers.get(pooled.engine, [])
+            if pooled.retiring and pooled.active == 0 and pooled in browsers:
+                browsers.remove(pooled)
+                self.recycled += 1
+                close = True
+            self._condition.notify_all()
+        if close:
+            logger.info(f"Recycling {pooled.engine} browser after {pooled.pages_served} pages")
+            await self._close_browser(pooled)
+
+    @asynccontextmanager
+    async def page(self, engine: str = 'chromium', **context_options):
+        """Open a page in a fresh context on a pooled browser."""
+        self._bind_loop()
+        async with self._page_slots:
+            pooled = await self._acquire(engine)
+            context = None
+            try:
+                context = await pooled.browser.new_context(**context_options)
+                yield await context.new_page()
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        logger.debug(f"Error closing browser context: {e}")
+                await self._release(pooled)
+
+    async def close(self):
+        """Close every browser and stop Playwright."""
+        if self._loop is None:
+            return
+        browsers = [pooled for engine_browsers in self._browsers.values() for pooled in engine_browsers]
+        for pooled in browsers:
+            if pooled.browser is not None:
+                await self._close_browser(pooled)
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception as e:
+                logger.debug(f"Error stopping Playwright: {e}")
+        self._reset()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'browsers': sum(len(b) for b in self._browsers.values()),
+            'launched': self.launched,
+            'recycled': self.recycled,
+            'replaced': self.replaced,
+            'pages_served': self.pages_served,
+        }
+
+
+browser_pool = BrowserPool()
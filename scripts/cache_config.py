@@ -0,0 +1,18 @@
+"""
+Locations of the local caches and indexes kept between runs.
+"""
+
+import os
+import pathlib
+
+# Root directory for all local caches, override with CYBERNEWS_CACHE_DIR
+CACHE_ROOT = os.getenv('CYBERNEWS_CACHE_DIR', str(pathlib.Path(__file__).parent.parent / '.cache'))
+
+FEED_CACHE_DIR = os.path.join(CACHE_ROOT, 'feeds')
+TOPIC_INDEX_PATH = os.path.join(CACHE_ROOT, 'topic_index.sqlite3')
+TOPIC_VECTORS_PATH = os.path.join(CACHE_ROOT, 'topic_vectors.sqlite3')
+TOPIC_PREVIEWS_PATH = os.path.join(CACHE_ROOT, 'topic_previews.sqlite3')
+SCRAPE_STATS_PATH = os.path.join(CACHE_ROOT, 'scrape_stats.sqlite3')
+SCRAPE_CACHE_PATH = os.path.join(CACHE_ROOT, 'scrape_cache.sqlite3')
+LLM_CACHE_PATH = os.path.join(CACHE_ROOT, 'llm_cache.sqlite3')
+KEV_STATE_PATH = os.path.join(CACHE_ROOT, 'kev_state.sqlite3')
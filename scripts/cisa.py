@@ -1,35 +1,50 @@
 #Download the Json at the following url and save the attributes to the supabase table labeled exploits: https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json
-import httpx
+import asyncio
+from http_clients import get_client
 import json
 import os
 from supabase_utils import supabase
 from bs4 import BeautifulSoup
+from scrape_cache import scrape_cache
+from supabase_batch import BatchWriter
+from supabase_query import Query, EXPLOITS
+from kev_state import kev_state, entry_hash
 from datetime import datetime
 
 def get_exploits():
     # Get the JSON from CISA
     try:
-        response = httpx.get("https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json")
+        response = get_client().get("https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json")
     except:
         return
     # Convert the JSON to a Python dictionary
     exploits = json.loads(response.text)
     return exploits
 
-def isolate_new_exploits(exploits):
-    try:
-        existing_exploits = supabase.table('exploits').select('cve, url').execute()
-    except Exception as error:
-        print(f'Failed to query existing exploits: {error}')
-        return exploits
-    if existing_exploits.data == None:
-        return exploits
-    existing_cve_ids = [exploit['cve'] for exploit in existing_exploits.data]
-    new_exploits = [exploit for exploit in exploits if exploit['cveID'] not in existing_cve_ids]
+def isolate_new_exploits(exploits, hashes=None):
+    # Return the catalog entries that are new or changed since the last sync, or None if there are none
+    if hashes is None:
+        hashes = {exploit['cveID']: entry_hash(exploit) for exploit in exploits}
+    known_hashes = kev_state.hashes()
+    existing_cve_ids = set()
+    if not known_hashes:
+        # No local sync state yet: entries already in Supabase count as synced
+        existing_cve_ids = set(get_list_of_supabase_exploits())
+    new_exploits = []
+    updated = 0
+    for exploit in exploits:
+        cve = exploit['cveID']
+        if cve in known_hashes:
+            if known_hashes[cve] == hashes[cve]:
+                continue
+            updated += 1
+        elif cve in existing_cve_ids:
+            continue
+        new_exploits.append(exploit)
     if len(new_exploits) == 0:
         return None
-    # Print the amount of new exploits
-    print(f"Found {len(new_exploits)} new exploits")
+    # Print the amount of new and updated exploits
+    print(f"Found {len(new_exploits) - updated} new exploits and {updated} updated exploits")
     return new_exploits
 
 # New exploits: ['CVE-2023-20198', 'CVE-2023-4966']
@@ -59,48 +74,34 @@ def format_json_for_supabase(exploits, catalog_version):
 
 def get_list_of_supabase_exploits():
     try:
-        response = supabase.table('exploits').select('cve').execute()
+        cve_ids = [exploit['cve'] for exploit in Query(supabase, EXPLOITS, 'cve').all()]
         print("Successfully queried exploits")
     except Exception as error:
         print(f'Failed to query exploits: {error}')
         return []
-    if response.data == None:
-        return []
-    return [exploit['cve'] for exploit in response.data]
+    return cve_ids
+
+async def stream_supabase_exploits(*columns, source=None):
+    # Yield exploits one page of rows at a time, in id order, so whole-table jobs run in constant memory
+    query = Query(supabase, EXPLOITS, *(columns or ('cve',)))
+    if source:
+        query.eq('source', source)
+    async for exploit in query.stream():
+        yield exploit
 
 def insert_or_update_exploits(exploits):
-    existing_cve_ids = get_list_of_supabase_exploits()
-    #Check if the exploits already exist in Supabase
-    #If they do, update them as a group
-    #If they don't, insert them as a group
-    exploits_to_insert = []
-    exploits_to_update = []
-    for exploit in exploits:
-        if exploit['cve'] in existing_cve_ids:
-            exploits_to_update.append(exploit)
-        else:
-            exploits_to_insert.append(exploit)
-    print(f"Amount of existing exploits: {len(existing_cve_ids)}")
-    print(f"New exploits: {[exploit['cve'] for exploit in exploits]}")
-    if exploits_to_insert:
-        try:
-            supabase.table('exploits').insert(exploits_to_insert).execute()
-            print("Successfully inserted exploits")
-        except Exception as error:
-            if error.code == 'PGRST204':
-                print(f"Failed to insert exploits because {error.message}")
-                print(f"Here is what we tried to insert{exploits_to_insert}")
-                print("There may be a new column in the exploits table that needs to be added to the Supabase table")
-                return
-            print(f'Failed to insert exploits: {error}')
-            return
-    if exploits_to_update:
-        try: 
-            supabase.table('exploits').update(exploits_to_update).execute()
-            print("Successfully updated exploits")
-        except Exception as error:
-            print(f'Failed to update exploits: {error}')
-            return
+    # Upsert on the CVE ID: new exploits are inserted and known ones updated,
+    # in chunks of SUPABASE_BATCH_SIZE rows per request. Returns the CVE IDs written.
+    if not exploits:
+        return set()
+    print(f"Upserting exploits: {[exploit['cve'] for exploit in exploits]}")
+    with BatchWriter(supabase, 'exploits', on_conflict='cve') as writer:
+        written = writer.add_many(exploits)
+        written += writer.flush()
+    print(writer.report())
+    if writer.rows_failed:
+        print("Some exploits failed to upsert; there may be a new column in the exploits table that needs to be added to the Supabase table")
+    return {row.get('cve') for row in written}
 
 async def get_cisa_exploits():
     # Get the exploits from CISA
@@ -109,33 +110,51 @@ async def get_cisa_exploits():
     if exploits is None:
         print("Failed to get exploits from CISA")
         return False
-    #Copy the catalogVersion field value
-    catalog_version = exploits['catalogVersion']
+    # Nothing to do if the catalog hasn't been republished since the last sync
+    published_version = exploits['catalogVersion']
+    if published_version == kev_state.catalog_version:
+        print(f"CISA catalog {published_version} is unchanged, skipping sync")
+        return True
     # Replace dots with dashes in the catalogVersion field value
-    catalog_version = catalog_version.replace('.', '-')
+    catalog_version = published_version.replace('.', '-')
     # Remove the outer parent object and isolate the child objects within vulnerabilities
     exploits = exploits['vulnerabilities']
-    # Isolate the new exploits
-    new_exploits = isolate_new_exploits(exploits)
+    # Hash the entries as CISA publishes them, before formatting adds hyperlinks and the catalog version
+    hashes = {exploit['cveID']: entry_hash(exploit) for exploit in exploits}
+    # Isolate the new and updated exploits
+    new_exploits = isolate_new_exploits(exploits, hashes)
     if new_exploits is None:
         print("No new exploits found")
+        kev_state.record(hashes)
+        kev_state.set_catalog_version(published_version)
         return True
     print("Isolated new exploits")
+    changed_cve_ids = {exploit['cveID'] for exploit in new_exploits}
     # Format the new exploits for Supabase
     formatted_exploits = format_json_for_supabase(new_exploits, catalog_version)
     print("Formatted new exploits for Supabase")
-    # Insert the exploits into Supabase
+    # Upsert the exploits into Supabase
     try:
-        insert_or_update_exploits(formatted_exploits)
-        return True
+        written_cve_ids = insert_or_update_exploits(formatted_exploits)
     except Exception as error:
         print(f'Failed to insert new exploits: {error}')
         return False
+    # Entries that failed to upsert keep their old hash, so the next sync retries them
+    kev_state.record({
+        cve: digest for cve, digest in hashes.items()
+        if cve not in changed_cve_ids or cve in written_cve_ids
+    })
+    if changed_cve_ids <= written_cve_ids:
+        kev_state.set_catalog_version(published_version)
+    return True
 
 def add_hyperlinks(url):
     # children of the class tag <td data-testid="vuln-hyperlinks-link-2"> are the hyperlinks
+    cached = scrape_cache.get(url, 'nvd_links')
+    if cached:
+        return cached['text'].split('\n')
     try:
-        response = httpx.get(url)
+        response = get_client().get(url)
     except Exception as error:
         print(f'Failed to get response from {url}: {error}')
         return
@@ -151,36 +170,39 @@ def add_hyperlinks(url):
     links = soup.select('td[data-testid^="vuln-hyperlinks-link-"] a')
     # Extract href attributes from the selected links
     links = [link['href'] for link in links]
+    if links:
+        scrape_cache.put(url, '\n'.join(links), 'nvd_links')
     return links
 
-def upload_hyperlinks():
+async def upload_hyperlinks():
     # Find all exploits that have a source of cisa and a url that contains https://nvd.nist.gov/vuln/detail/ and empty hyperlinks array
+    found = 0
     try:
-        response = supabase.table('exploits').select('*').eq('source', 'cisa').execute()
-        print("Successfully queried exploits")
+        async for exploit in stream_supabase_exploits('cve', 'url', 'hyperlinks', source='cisa'):
+            found += 1
+            print(f"Adding hyperlinks to exploit with cve {exploit['cve']}")
+            # Get the hyperlinks
+            # continue if exploit hyperlinks is not empty
+            if exploit['hyperlinks']:
+                print(f"Exploit with cve {exploit['cve']} already has hyperlinks")
+                continue
+            hyperlinks = await asyncio.to_thread(add_hyperlinks, exploit['url'])
+            if hyperlinks is None:
+                print(f"Failed to get hyperlinks for exploit with cve {exploit['cve']}")
+                continue
+            # Update the exploit with the hyperlinks
+            try:
+                await asyncio.to_thread(
+                    lambda: supabase.table('exploits').update({'hyperlinks': hyperlinks}).eq('id', exploit['id']).execute()
+                )
+                print(f"Successfully updated exploit with cve {exploit['cve']}")
+            except Exception as error:
+                print(f'Failed to update exploit with cve {exploit["cve"]}: {error}')
+                continue
     except Exception as error:
         print(f'Failed to query exploits: {error}')
         return
-    exploits = response.data
-    if exploits is None:
+    if not found:
         print("No exploits found")
         return
-    for exploit in exploits:
-        print(f"Adding hyperlinks to exploit with cve {exploit['cve']}")
-        # Get the hyperlinks
-        # continue if exploit hyperlinks is not empty
-        if exploit['hyperlinks']:
-            print(f"Exploit with cve {exploit['cve']} already has hyperlinks")
-            continue
-        hyperlinks = add_hyperlinks(exploit['url'])
-        if hyperlinks is None:
-            print(f"Failed to get hyperlinks for exploit with cve {exploit['cve']}")
-            continue
-        # Update the exploit with the hyperlinks
-        try:
-            supabase.table('exploits').update({'hyperlinks': hyperlinks}).eq('id', exploit['id']).execute()
-            print(f"Successfully updated exploit with cve {exploit['cve']}")
-        except Exception as error:
-            print(f'Failed to update exploit with cve {exploit["cve"]}: {error}')
-            continue
     print("Successfully added hyperlinks to exploits")
@@ -1,10 +1,11 @@
 from dotenv import load_dotenv
+import asyncio
 import os
 from supabase_utils import supabase, update_supabase_post
 from wp_utils import update_wp_post
 import logging
 import re
-from format_utils import ReadabilityMetrics, SeoMetrics
+from format_utils import ReadabilityMetrics, SeoMetrics, optimize_html
 import logging
 from source_fetcher import fetch_sources_from_query
 from gpt_utils import query_gpt, function_call_gpt, image_query_function
@@ -22,7 +23,7 @@ def update_post(post_info):
     update_supabase_post(post_info)
     update_wp_post(post_info)
 
-def test_seo_and_readability_optimization():
+async def test_seo_and_readability_optimization():
     # Pull a post from Supabase and run it through the SEO and Readability optimization functions
     # Assert that the result is what you expect
     post_info = supabase.table('posts').select('*').eq('id', 140).execute().data
@@ -34,7 +35,7 @@ def test_seo_and_readability_optimization():
         return
     post_info = post_info[0]
     print(f"Before readability optimization: {post_info['content']}")
-    post_info['content'] = readability_optimization(post_info['content'])
+    post_info['content'] = await readability_optimization(post_info['content'])
     print(f"After readability optimization: {post_info['content']}")
     post_info = seo_optimization(post_info, images)
     print(f"After SEO optimization: {post_info['content']}")
@@ -43,9 +44,14 @@ def test_seo_and_readability_optimization():
     update_post(post_info)
     #print("Successfully updated post.")
 
-def readability_optimization(content):
-    metrics = ReadabilityMetrics(content)
-    return metrics.optimize_readability()
+async def readability_optimization(content):
+    # Scoring is CPU-bound and runs in the parsing pool; the rewrite waits on GPT and runs in a thread
+    initial_score = await ReadabilityMetrics.score_html(content)
+    print(f"Initial Readability Score: {initial_score}")
+    optimized = await asyncio.to_thread(optimize_html, content)
+    final_score = await ReadabilityMetrics.score_html(optimized)
+    print(f"Final Readability Score: {final_score}")
+    return optimized
 
 def seo_optimization(post_info, images):
     seo_optimizer = SeoMetrics(post_info, images)
@@ -5,16 +5,19 @@ Enhanced scraping module that combines multiple scraping methods with intelligen
 import os
 import logging
 import asyncio
-from typing import Optional, Tuple, Dict, Any
-from bs4 import BeautifulSoup
-import httpx
-from playwright.async_api import async_playwright
+import time
+from typing import Optional, Tuple, Dict, Any, Awaitable, Callable, List
 from urllib.parse import urlparse
 import aiohttp
 from dotenv import load_dotenv
 import re
 import traceback
-from bs4.element import Tag
+from content_extractor import extract_main_text
+from parse_service import parsing_service
+from browser_pool import BrowserPool, browser_pool as shared_browser_pool
+from http_clients import get_async_client
+from scrape_cache import ARTICLE_TEXT, ScrapeCache, scrape_cache
+from scrape_strategy import ScrapeStrategyStats, scrape_strategy_stats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +26,9 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Run the two most promising scraping methods concurrently instead of one after the other
+SCRAPE_RACE_TOP_TWO = os.getenv('SCRAPE_RACE_TOP_TWO', 'false').lower() in ('true', '1', 't')
+
 class ScrapingMethod:
     DIRECT = "direct"
     RESIDENTIAL_PROXY = "residential"
@@ -31,8 +37,14 @@ class ScrapingMethod:
     STEALTH_BROWSER = "stealth"
 
 class EnhancedScraper:
-    def __init__(self):
+    def __init__(self, browser_pool: Optional[BrowserPool] = None, strategy_stats: Optional[ScrapeStrategyStats] = None,
+                 race_top_two: bool = SCRAPE_RACE_TOP_TWO, cache: Optional[ScrapeCache] = None):
         """Initialize the enhanced scraper with proxy configurations."""
+        # Browsers, per-domain method stats and the scrape cache are shared by every scraper unless given explicitly
+        self.browser_pool = browser_pool or shared_browser_pool
+        self.strategy_stats = strategy_stats or scrape_strategy_stats
+        self.scrape_cache = cache or scrape_cache
+        self.race_top_two = race_top_two
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
         
@@ -91,26 +103,26 @@ class EnhancedScraper:
     async def direct_scrape(self, url: str) -> Optional[str]:
         """Attempt direct scraping without proxy."""
         try:
-            async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
-                headers = {
-                    'User-Agent': self.user_agents[0],
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                }
-                self.logger.info(f"Attempting direct scrape of {url}")
-                response = await client.get(url, headers=headers)
-                self.logger.info(f"Direct scrape status code: {response.status_code}")
-                
-                if response.status_code == 200:
-                    content = self._clean_content(response.text)
-                    if content:
-                        self.logger.info(f"Direct scrape successful, content length: {len(content)}")
-                        return content
-                    else:
-                        self.logger.warning("Direct scrape returned empty content after cleaning")
+            client = get_async_client(verify=False)
+            headers = {
+                'User-Agent': self.user_agents[0],
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+            }
+            self.logger.info(f"Attempting direct scrape of {url}")
+            response = await client.get(url, headers=headers, timeout=30.0)
+            self.logger.info(f"Direct scrape status code: {response.status_code}")
+            
+            if response.status_code == 200:
+                content = await self._clean_content_async(response.text)
+                if content:
+                    self.logger.info(f"Direct scrape successful, content length: {len(content)}")
+                    return content
                 else:
-                    self.logger.warning(f"Direct scrape failed with status code: {response.status_code}")
-                    
+                    self.logger.warning("Direct scrape returned empty content after cleaning")
+            else:
+                self.logger.warning(f"Direct scrape failed with status code: {response.status_code}")
+                
         except Exception as e:
             self.logger.error(f"Direct scraping failed: {str(e)}\n{traceback.format_exc()}")
         return None
@@ -121,106 +133,87 @@ class EnhancedScraper:
             proxy_url = self.get_proxy_url(proxy_type)
             self.logger.info(f"Attempting {proxy_type} proxy scrape of {url}")
             
-            # Create client with proxy configuration
-            async with httpx.AsyncClient(
-                verify=False, 
-                timeout=30.0,
-                proxies=proxy_url
-            ) as client:
-                headers = {
-                    'User-Agent': self.user_agents[1],
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                }
-                response = await client.get(url, headers=headers)
-                self.logger.info(f"{proxy_type} proxy scrape status code: {response.status_code}")
-                
-                if response.status_code == 200:
-                    content = self._clean_content(response.text)
-                    if content:
-                        self.logger.info(f"{proxy_type} proxy scrape successful, content length: {len(content)}")
-                        return content
-                    else:
-                        self.logger.warning(f"{proxy_type} proxy scrape returned empty content after cleaning")
+            # Pooled client routed through this proxy
+            client = get_async_client(proxy=proxy_url, verify=False)
+            headers = {
+                'User-Agent': self.user_agents[1],
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+            }
+            response = await client.get(url, headers=headers, timeout=30.0)
+            self.logger.info(f"{proxy_type} proxy scrape status code: {response.status_code}")
+            
+            if response.status_code == 200:
+                content = await self._clean_content_async(response.text)
+                if content:
+                    self.logger.info(f"{proxy_type} proxy scrape successful, content length: {len(content)}")
+                    return content
                 else:
-                    self.logger.warning(f"{proxy_type} proxy scrape failed with status code: {response.status_code}")
-                    
+                    self.logger.warning(f"{proxy_type} proxy scrape returned empty content after cleaning")
+            else:
+                self.logger.warning(f"{proxy_type} proxy scrape failed with status code: {response.status_code}")
+                
         except Exception as e:
             self.logger.error(f"{proxy_type} proxy scraping failed: {str(e)}\n{traceback.format_exc()}")
         return None
 
     async def browser_scrape(self, url: str) -> Optional[str]:
-        """Scrape content using Playwright browser."""
+        """Scrape content using a page from the shared Playwright browser pool."""
         try:
             self.logger.info("Attempting browser scrape with Playwright")
             
-            # Launch browser with stealth mode
-            browser = await self.get_browser()
-            context = await browser.new_context(
+            async with self.browser_pool.page(
+                'chromium',
                 viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            
-            # Add extra headers
-            await context.set_extra_http_headers({
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Pragma': 'no-cache',
-                'Cache-Control': 'no-cache',
-            })
-
-            page = await context.new_page()
-            
-            # Enable request interception
-            await page.route("**/*", lambda route: route.continue_())
-            
-            try:
-                # Navigate with longer timeout and wait for network idle
-                self.logger.info("Navigating to page and waiting for load")
-                await page.goto(url, wait_until='networkidle', timeout=60000)
-                
-                # Wait for content to load
-                self.logger.info("Waiting for content selectors")
-                await page.wait_for_selector('article, .post-content, .articlebody', timeout=10000)
-                
-                # Take screenshot for debugging
-                await page.screenshot(path='debug_screenshot.png')
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                extra_http_headers={
+                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+                    'Accept-Language': 'en-US,en;q=0.5',
+                    'Accept-Encoding': 'gzip, deflate, br',
+                    'DNT': '1',
+                    'Connection': 'keep-alive',
+                    'Upgrade-Insecure-Requests': '1',
+                    'Sec-Fetch-Dest': 'document',
+                    'Sec-Fetch-Mode': 'navigate',
+                    'Sec-Fetch-Site': 'none',
+                    'Sec-Fetch-User': '?1',
+                    'Pragma': 'no-cache',
+                    'Cache-Control': 'no-cache',
+                }
+            ) as page:
+                # Enable request interception
+                await page.route("**/*", lambda route: route.continue_())
                 
-                # Save page source for debugging
-                content = await page.content()
-                with open('debug_page.html', 'w', encoding='utf-8') as f:
-                    f.write(content)
+                try:
+                    # Navigate with longer timeout and wait for network idle
+                    self.logger.info("Navigating to page and waiting for load")
+                    await page.goto(url, wait_until='networkidle', timeout=60000)
                     
-                # Extract content using JavaScript evaluation
-                article_content = await page.evaluate('''() => {
-                    const article = document.querySelector('article') || 
-                                  document.querySelector('.post-content') || 
-                                  document.querySelector('.articlebody');
-                    return article ? article.innerHTML : null;
-                }''')
-                
-                if not article_content:
-                    self.logger.warning("No article content found after JavaScript execution")
-                    return None
+                    # Wait for content to load
+                    self.logger.info("Waiting for content selectors")
+                    await page.wait_for_selector('article, .post-content, .articlebody', timeout=10000)
+                    
+                    # Extract content using JavaScript evaluation
+                    article_content = await page.evaluate('''() => {
+                        const article = document.querySelector('article') || 
+                                      document.querySelector('.post-content') || 
+                                      document.querySelector('.articlebody');
+                        return article ? article.innerHTML : null;
+                    }''')
                     
-                self.logger.info(f"Successfully extracted content with length: {len(article_content)}")
-                return article_content
+                    if not article_content:
+                        self.logger.warning("No article content found after JavaScript execution")
+                        return None
 
-            except Exception as e:
-                self.logger.error(f"Error during page navigation/content extraction: {str(e)}")
-                return None
-                
-            finally:
-                await page.close()
-                await context.close()
-                await browser.close()
+                    content = await self._clean_content_async(article_content)
+                    if not content:
+                        self.logger.warning("Browser scrape returned empty content after cleaning")
+                        return None
+                    self.logger.info(f"Successfully extracted content with length: {len(content)}")
+                    return content
+
+                except Exception as e:
+                    self.logger.error(f"Error during page navigation/content extraction: {str(e)}")
+                    return None
                 
         except Exception as e:
             self.logger.error(f"Browser scraping failed: {str(e)}")
@@ -233,111 +226,107 @@ class EnhancedScraper:
             return ""
             
         try:
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Remove unwanted elements
-            for element in soup.find_all(['script', 'style', 'nav', 'footer', 'iframe', 'header', 'aside', 'form']):
-                element.decompose()
-            
-            # Try multiple approaches to find the main content
-            main_content = None
-            
-            # 1. Try article-specific elements first
-            for selector in ['article', '.post-content', '.article-content', '.entry-content', '#content', '.blog-post', '.post']:
-                if selector.startswith('.'):
-                    main_content = soup.find(class_=selector[1:])
-                elif selector.startswith('#'):
-                    main_content = soup.find(id=selector[1:])
-                else:
-                    main_content = soup.find(selector)
-                    
-                if main_content:
-                    self.logger.info(f"Found main content using selector: {selector}")
-                    break
-            
-            # 2. If no specific article element found, try the largest text container
-            if not main_content:
-                # Find all potential content divs
-                content_divs = soup.find_all(['div', 'section', 'main'])
-                if content_divs:
-                    # Get the div with the most text content
-                    main_content = max(content_divs, key=lambda div: len(div.get_text(strip=True)))
-                    self.logger.info("Using largest text container as main content")
-            
-            # 3. If still no content, use the body
-            if not main_content:
-                main_content = soup.find('body') or soup
-                self.logger.info("Using body/entire document as main content")
+            text = extract_main_text(content)
+        except Exception as e:
+            self.logger.error(f"Content cleaning failed: {str(e)}\n{traceback.format_exc()}")
+            return ""
+        return self._report_cleaned(text)
+
+    async def _clean_content_async(self, content: str) -> str:
+        """Clean scraped content in the parsing pool so the event loop stays free."""
+        if not content:
+            self.logger.warning("Received empty content for cleaning")
+            return ""
             
-            if main_content:
-                # Extract text with better formatting preservation
-                paragraphs = []
-                if isinstance(main_content, Tag):  # Only process Tag objects, not NavigableString
-                    for elem in main_content.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']):
-                        text = elem.get_text(strip=True)
-                        if text:  # Only add non-empty paragraphs
-                            paragraphs.append(text)
-                else:
-                    # Handle NavigableString directly
-                    text = str(main_content).strip()
-                    if text:
-                        paragraphs.append(text)
-                
-                # Join paragraphs with proper spacing
-                text = '\n\n'.join(paragraphs)
-                
-                # Clean up whitespace while preserving paragraph breaks
-                text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces with single space
-                text = re.sub(r'\n\s*\n', '\n\n', text)  # Normalize paragraph breaks
-                text = text.strip()
-                
-                if text:
-                    self.logger.info(f"Successfully cleaned content, length: {len(text)}")
-                    self.logger.debug("First 200 characters of cleaned content:")
-                    self.logger.debug(text[:200] + "...")
-                    return text
-                else:
-                    self.logger.warning("Cleaning resulted in empty content")
-                    return ""
-            else:
-                self.logger.warning("No content elements found")
-                return ""
-                
+        try:
+            text = await parsing_service.run(extract_main_text, content)
         except Exception as e:
             self.logger.error(f"Content cleaning failed: {str(e)}\n{traceback.format_exc()}")
             return ""
+        return self._report_cleaned(text)
+
+    def _report_cleaned(self, text: str) -> str:
+        if text:
+            self.logger.info(f"Successfully cleaned content, length: {len(text)}")
+            self.logger.debug("First 200 characters of cleaned content:")
+            self.logger.debug(text[:200] + "...")
+            return text
+        self.logger.warning("Cleaning resulted in empty content")
+        return ""
+
+    def _scraping_methods(self) -> Dict[str, Callable[[str], Awaitable[Optional[str]]]]:
+        return {
+            ScrapingMethod.DIRECT: self.direct_scrape,
+            ScrapingMethod.SCRAPING_BROWSER: self.browser_scrape,
+            ScrapingMethod.RESIDENTIAL_PROXY: lambda url: self.proxy_scrape(url, ScrapingMethod.RESIDENTIAL_PROXY),
+            ScrapingMethod.DATACENTER_PROXY: lambda url: self.proxy_scrape(url, ScrapingMethod.DATACENTER_PROXY),
+        }
+
+    async def _try_method(self, url: str, method: str) -> Optional[str]:
+        """Run one scraping method and record its outcome for the URL's domain."""
+        start = time.monotonic()
+        # A method cancelled because another one won the race raises here and
+        # is not recorded, since it says nothing about the domain
+        content = await self._scraping_methods()[method](url)
+        success = bool(content and len(content.strip()) >= 100)
+        self.strategy_stats.record(url, method, success, time.monotonic() - start)
+        if success:
+            self.logger.info(f"{method} scraping successful")
+            return content
+        return None
+
+    async def _race(self, url: str, methods: List[str]) -> Optional[str]:
+        """Run several methods concurrently and return the first good result."""
+        tasks = [asyncio.create_task(self._try_method(url, method)) for method in methods]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                content = await finished
+                if content:
+                    return content
+            return None
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     async def scrape(self, url: str, max_retries: int = 3) -> Optional[str]:
         """
         Main scraping method that tries different approaches in sequence.
         Returns the first successful result.
+        
+        Methods are ordered per domain by their recorded success rate and
+        latency, so the cheapest method that usually works is tried first.
+        With SCRAPE_RACE_TOP_TWO enabled the two best methods run concurrently.
+        Results are kept in the local scrape cache.
         """
+        cached = self.scrape_cache.get(url, ARTICLE_TEXT)
+        if cached:
+            self.logger.info(f"Scrape cache hit for {url}")
+            return cached['text']
+        
+        content = await self._scrape_uncached(url, max_retries)
+        if content:
+            self.scrape_cache.put(url, content, ARTICLE_TEXT)
+        return content
+
+    async def _scrape_uncached(self, url: str, max_retries: int) -> Optional[str]:
         for attempt in range(max_retries):
             self.logger.info(f"Starting scraping attempt {attempt + 1} of {max_retries} for {url}")
             
-            # Try browser scraping first for JavaScript-heavy sites
-            content = await self.browser_scrape(url)
-            if content and len(content.strip()) >= 100:
-                self.logger.info("Browser scraping successful")
-                return content
+            methods = self.strategy_stats.rank(url, list(self._scraping_methods()))
+            self.logger.info(f"Scraping method order for {url}: {', '.join(methods)}")
             
-            # Try direct scraping
-            content = await self.direct_scrape(url)
-            if content and len(content.strip()) >= 100:
-                self.logger.info("Direct scraping successful")
-                return content
-                
-            # Try residential proxy
-            content = await self.proxy_scrape(url, ScrapingMethod.RESIDENTIAL_PROXY)
-            if content and len(content.strip()) >= 100:
-                self.logger.info("Residential proxy scraping successful")
-                return content
-                
-            # Try datacenter proxy
-            content = await self.proxy_scrape(url, ScrapingMethod.DATACENTER_PROXY)
-            if content and len(content.strip()) >= 100:
-                self.logger.info("Datacenter proxy scraping successful")
-                return content
+            if self.race_top_two and len(methods) > 1:
+                content = await self._race(url, methods[:2])
+                if content:
+                    return content
+                methods = methods[2:]
+            
+            for method in methods:
+                content = await self._try_method(url, method)
+                if content:
+                    return content
                 
             self.logger.warning(f"All scraping methods failed on attempt {attempt + 1}")
             if attempt < max_retries - 1:
@@ -348,25 +337,6 @@ class EnhancedScraper:
         self.logger.error(f"Failed to scrape {url} after {max_retries} attempts")
         return None
 
-    async def get_browser(self):
-        """Get a configured browser instance."""
-        try:
-            browser = await async_playwright().chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-accelerated-2d-canvas',
-                    '--disable-gpu',
-                    '--window-size=1920,1080',
-                ]
-            )
-            return browser
-        except Exception as e:
-            self.logger.error(f"Failed to launch browser: {str(e)}")
-            raise
-
 # Example usage
 async def main():
     scraper = EnhancedScraper()
@@ -1,4 +1,5 @@
 from supabase_utils import supabase
+from supabase_query import Query, EXPLOITS
 from extract_text import scrape_content
 
 starting_edb_id = 51667
@@ -7,21 +8,18 @@ url_base = "https://www.exploit-db.com/exploits/"
 def determine_latest_exploit():
     # Get the latest exploit
     print("Determining latest exploit")
-    response = supabase.table("exploits").select("*").order("edb_id").limit(1).execute()
-    latest_exploit = response.data[0] if response.data else None
+    latest_exploit = Query(supabase, EXPLOITS, "edb_id").not_null("edb_id").order("edb_id").first()
     return latest_exploit
 
 def determine_oldest_exploit():
     # Get the oldest exploit
     print("Determining oldest exploit")
-    response = supabase.table("exploits").select("*").order("edb_id" ).limit(1).execute()
-    oldest_exploit = response.data[0] if response.data else None
+    oldest_exploit = Query(supabase, EXPLOITS, "edb_id").not_null("edb_id").order("edb_id").first()
     return oldest_exploit
 
-def get_list_of_exploits():
-    # Get a list of all exploits
-    response = supabase.table("exploits").select("*").execute()
-    exploits = response.data
+def get_list_of_exploits(columns=("id", "cve", "edb_id", "source", "url")):
+    # Get a list of all exploits, with only the columns the caller needs
+    exploits = Query(supabase, EXPLOITS, *columns).all()
     return exploits
 
 def upload_exploit(content):
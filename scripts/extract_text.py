@@ -12,6 +12,10 @@ import pathlib
 import asyncio
 from playwright.async_api import async_playwright
 from stealth_browser import scrape_with_stealth
+from http_clients import get_async_client
+from content_extractor import extract_page_text
+from parse_service import parsing_service
+from scrape_cache import ARTICLE_TEXT, scrape_cache
 import tempfile
 from PyPDF2 import PdfReader
 import logging
@@ -43,7 +47,7 @@ async def download_pdf(url: str, client: httpx.AsyncClient) -> Optional[bytes]:
         Optional[bytes]: The PDF content as bytes if successful, None otherwise
     """
     try:
-        response = await client.get(url)
+        response = await client.get(url, timeout=30.0)
         response.raise_for_status()
         
         # Check if the response is actually a PDF
@@ -108,27 +112,27 @@ async def scrape_pdf(url: str) -> Optional[str]:
     Returns:
         Optional[str]: The extracted text if successful, None otherwise
     """
-    async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
-        try:
-            # Download the PDF
-            pdf_content = await download_pdf(url, client)
-            if not pdf_content:
-                logger.error(f"Failed to download PDF from {url}")
-                return None
-            
-            # Extract text from the PDF
-            text = extract_text_from_pdf(pdf_content)
-            if not text:
-                logger.error(f"Failed to extract text from PDF at {url}")
-                return None
-            
-            return text
-        except PDFExtractionError as e:
-            logger.error(f"PDF extraction error for {url}: {e}")
+    client = get_async_client(verify=False)
+    try:
+        # Download the PDF
+        pdf_content = await download_pdf(url, client)
+        if not pdf_content:
+            logger.error(f"Failed to download PDF from {url}")
             return None
-        except Exception as e:
-            logger.error(f"Unexpected error while scraping PDF from {url}: {e}")
+        
+        # Extract text from the PDF in the parsing pool, PyPDF2 is slow on large files
+        text = await parsing_service.run(extract_text_from_pdf, pdf_content)
+        if not text:
+            logger.error(f"Failed to extract text from PDF at {url}")
             return None
+        
+        return text
+    except PDFExtractionError as e:
+        logger.error(f"PDF extraction error for {url}: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error while scraping PDF from {url}: {e}")
+        return None
 
 async def fetch_with_scraping_browser(url):
     """Fetch content using Scraping Browser with Playwright."""
@@ -313,51 +317,35 @@ async def scrape_content(url: str, depth: int = 1, include_links: bool = True, i
     if not url.startswith(('http://', 'https://')):
         url = 'https://' + url
         
+    cached = scrape_cache.get(url, ARTICLE_TEXT)
+    if cached:
+        return cached['text']
+        
     try:
         # First try direct connection with a short timeout
-        async with httpx.AsyncClient(verify=False, timeout=10.0) as client:
-            try:
-                response = await client.get(url)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    # Remove script and style elements
-                    for script in soup(["script", "style"]):
-                        script.decompose()
-                    text = soup.get_text()
-                    # Clean up text
-                    lines = (line.strip() for line in text.splitlines())
-                    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                    text = ' '.join(chunk for chunk in chunks if chunk)
+        client = get_async_client(verify=False)
+        try:
+            response = await client.get(url, timeout=10.0)
+            if response.status_code == 200:
+                text = await parsing_service.run(extract_page_text, response.text)
+                if text:
+                    scrape_cache.put(url, text, ARTICLE_TEXT, html=response.text, metadata={'method': 'direct'})
                     return text
-            except Exception as e:
-                print(f"Direct connection failed: {e}")
-                
+        except Exception as e:
+            print(f"Direct connection failed: {e}")
+            
         # If direct connection fails, try with proxy
         content = await fetch_using_proxy(url)
         if content:
-            soup = BeautifulSoup(content, 'html.parser')
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            text = soup.get_text()
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+            text = await parsing_service.run(extract_page_text, content)
+            scrape_cache.put(url, text, ARTICLE_TEXT, metadata={'method': 'stealth'})
             return text
             
         # If both methods fail, try scraping browser as last resort
         content = await fetch_with_scraping_browser(url)
         if content:
-            soup = BeautifulSoup(content, 'html.parser')
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            text = soup.get_text()
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+            text = await parsing_service.run(extract_page_text, content)
+            scrape_cache.put(url, text, ARTICLE_TEXT, html=content, metadata={'method': 'scraping_browser'})
             return text
             
         print(f"Failed to fetch content from {url} using all available methods")
@@ -0,0 +1,89 @@
+"""
+Persistent on-disk cache for feed responses.
+
+Stores the ETag / Last-Modified validators and the parsed topics of every
+feed URL, so repeat polls can send conditional requests and skip parsing
+when the server answers 304 Not Modified.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from cache_config import FEED_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class FeedCache:
+    """Feed cache keyed by URL, one JSON file per feed."""
+
+    def __init__(self, cache_dir: str = FEED_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for a URL, or None if it was never stored."""
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable feed cache entry for {url}: {e}")
+            return None
+        return entry if entry.get('url') == url else None
+
+    def conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Headers turning a GET into a conditional request for a cached entry."""
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, topics: List[Dict[str, Any]], etag: Optional[str] = None,
+              last_modified: Optional[str] = None, content_hash: Optional[str] = None):
+        """Write the validators and parsed topics for a URL."""
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_hash': content_hash,
+            'fetched_at': time.time(),
+            'topics': topics,
+        }
+        path = self._path(url)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so readers never see a partial entry
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write feed cache entry for {url}: {e}")
+
+    def touch(self, url: str, entry: Dict[str, Any]):
+        """Record that a cached entry was revalidated."""
+        self.store(url, entry.get('topics', []), entry.get('etag'), entry.get('last_modified'), entry.get('content_hash'))
+
+    def clear(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+
+feed_cache = FeedCache()
@@ -6,30 +6,134 @@ import httpx
 import xml.etree.ElementTree as ET
 import json
 import gzip
-from datetime import datetime
+from datetime import datetime, timezone
+from dateutil import parser as date_parser
+import codecs
+import zlib
 import logging
 from bs4 import BeautifulSoup
 import io
+import hashlib
+from feed_cache import feed_cache
+from http_clients import get_async_client
 
 logger = logging.getLogger(__name__)
 
-async def fetch_feed_content(url, format='xml'):
-    """Fetch content from a feed URL."""
+async def _get(url, client=None, headers=None):
+    if client is None:
+        client = get_async_client(verify=False)
+    return await client.get(url, headers=headers, timeout=30.0)
+
+def _decode_feed(response, url, format):
+    if format == 'json':
+        if url.endswith('.gz'):
+            # Handle gzipped content
+            content = gzip.decompress(response.content)
+            return json.loads(content)
+        return response.json()
+    return response.text
+
+async def fetch_feed_content(url, format='xml', client=None):
+    """Fetch content from a feed URL.
+
+    Uses the shared pooled client unless a specific httpx.AsyncClient is passed.
+    """
     try:
         print(f"Attempting to fetch feed from {url} (format: {format})")
-        async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            print(f"Successfully fetched feed from {url}")
-            
-            if format == 'json':
-                if url.endswith('.gz'):
-                    # Handle gzipped content
-                    content = gzip.decompress(response.content)
-                    return json.loads(content)
-                return response.json()
-            else:
-                return response.text
+        response = await _get(url, client)
+        response.raise_for_status()
+        print(f"Successfully fetched feed from {url}")
+        return _decode_feed(response, url, format)
+    except httpx.HTTPError as e:
+        print(f"HTTP error fetching feed from {url}: {e}")
+        return None
+    except Exception as e:
+        print(f"Error fetching feed from {url}: {e.__class__.__name__}: {str(e)}")
+        return None
+
+def _refresh_accessed(topics):
+    now = datetime.now().isoformat()
+    return [{**topic, 'date_accessed': now} for topic in topics]
+
+async def _fetch_streaming(feed_config, client, cache, entry, headers, since):
+    url = feed_config['url']
+    received = {}
+
+    def on_response(response):
+        received['status'] = response.status_code
+        received['etag'] = response.headers.get('etag')
+        received['last_modified'] = response.headers.get('last-modified')
+        return response.status_code != 304
+
+    topics = [topic async for topic in stream_feed_topics(feed_config, client, since, headers, on_response)]
+
+    if received.get('status') == 304 and entry is not None:
+        print(f"Feed not modified since last fetch, using cached topics for {url}")
+        cache.hits += 1
+        cache.touch(url, entry)
+        return _refresh_accessed(entry.get('topics', []))
+
+    print(f"Streamed {len(topics)} topics from {url}")
+    if cache:
+        cache.misses += 1
+    # An empty result may be a parse failure; caching it with the response's
+    # validators would turn every later 304 into an empty feed
+    if cache and topics:
+        cache.store(url, topics, etag=received.get('etag'), last_modified=received.get('last_modified'))
+    return topics
+
+async def fetch_and_parse_feed(feed_config, client=None, cache=feed_cache, since=None):
+    """Fetch and parse a feed, using conditional requests against the feed cache.
+
+    Returns the cached topics without downloading or parsing anything when the
+    server answers 304, and skips parsing when the body is byte-identical to the
+    cached one. JSON feeds with a streaming parser are decoded incrementally,
+    skipping items published before `since`. Returns None if the feed could not
+    be fetched.
+    """
+    url = feed_config['url']
+    format = feed_config.get('format', 'xml')
+    entry = cache.get(url) if cache else None
+    headers = cache.conditional_headers(entry) if cache else {}
+
+    try:
+        if format == 'json' and feed_config.get('parser_type') in STREAMING_PARSERS:
+            print(f"Streaming feed from {url} (format: {format})")
+            return await _fetch_streaming(feed_config, client, cache, entry, headers, since)
+
+        print(f"Attempting to fetch feed from {url} (format: {format})")
+        response = await _get(url, client, headers)
+
+        if response.status_code == 304 and entry is not None:
+            print(f"Feed not modified since last fetch, using cached topics for {url}")
+            cache.hits += 1
+            cache.touch(url, entry)
+            return _refresh_accessed(entry.get('topics', []))
+
+        response.raise_for_status()
+        print(f"Successfully fetched feed from {url}")
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if entry is not None and entry.get('content_hash') == content_hash:
+            print(f"Feed content unchanged, using cached topics for {url}")
+            cache.hits += 1
+            cache.touch(url, entry)
+            return _refresh_accessed(entry.get('topics', []))
+
+        if cache:
+            cache.misses += 1
+        topics = await parse_feed(_decode_feed(response, url, format), feed_config) or []
+        if not topics and response.content.strip():
+            print(f"No topics parsed from non-empty feed {url}, not caching it")
+        elif cache:
+            cache.store(
+                url,
+                topics,
+                etag=response.headers.get('etag'),
+                last_modified=response.headers.get('last-modified'),
+                content_hash=content_hash
+            )
+        return topics
     except httpx.HTTPError as e:
         print(f"HTTP error fetching feed from {url}: {e}")
         return None
@@ -71,28 +175,47 @@ def parse_rss_feed(content, feed_config):
         logger.error(f"Error parsing RSS feed from {feed_config['name']}: {e}")
         return []
 
+def _cisa_kev_topic(vuln, feed_config):
+    return {
+        'name': f"CISA KEV: {vuln.get('vulnerabilityName')}",
+        'url': f"https://www.cisa.gov/known-exploited-vulnerabilities-catalog",
+        'description': (f"CVE: {vuln.get('cveID')} - "
+                      f"Vendor: {vuln.get('vendorProject')} - "
+                      f"Product: {vuln.get('product')} - "
+                      f"Required Action: {vuln.get('requiredAction')}"),
+        'date_published': vuln.get('dateAdded'),
+        'provider': feed_config['name'],
+        'category': feed_config['category'],
+        'date_accessed': datetime.now().isoformat()
+    }
+
+def _nvd_topic(item, feed_config):
+    cve = item.get('cve', {})
+    impact = item.get('impact', {})
+    
+    # Get CVSS v3 score if available, otherwise try v2
+    cvss_data = (impact.get('baseMetricV3', {}).get('cvssV3', {}) or 
+                impact.get('baseMetricV2', {}).get('cvssV2', {}))
+    
+    description = cve.get('description', {}).get('description_data', [{}])[0].get('value', '')
+    
+    return {
+        'name': f"CVE: {cve.get('CVE_data_meta', {}).get('ID')}",
+        'url': f"https://nvd.nist.gov/vuln/detail/{cve.get('CVE_data_meta', {}).get('ID')}",
+        'description': (f"{description}\n"
+                      f"CVSS Score: {cvss_data.get('baseScore', 'N/A')} "
+                      f"({cvss_data.get('severity', 'N/A')})"),
+        'date_published': item.get('publishedDate'),
+        'provider': feed_config['name'],
+        'category': feed_config['category'],
+        'date_accessed': datetime.now().isoformat()
+    }
+
 def parse_cisa_kev(content, feed_config):
     """Parse CISA Known Exploited Vulnerabilities JSON feed."""
     try:
         vulnerabilities = content.get('vulnerabilities', [])
-        topics = []
-        
-        for vuln in vulnerabilities:
-            topic = {
-                'name': f"CISA KEV: {vuln.get('vulnerabilityName')}",
-                'url': f"https://www.cisa.gov/known-exploited-vulnerabilities-catalog",
-                'description': (f"CVE: {vuln.get('cveID')} - "
-                              f"Vendor: {vuln.get('vendorProject')} - "
-                              f"Product: {vuln.get('product')} - "
-                              f"Required Action: {vuln.get('requiredAction')}"),
-                'date_published': vuln.get('dateAdded'),
-                'provider': feed_config['name'],
-                'category': feed_config['category'],
-                'date_accessed': datetime.now().isoformat()
-            }
-            topics.append(topic)
-            
-        return topics
+        return [_cisa_kev_topic(vuln, feed_config) for vuln in vulnerabilities]
     except Exception as e:
         logger.error(f"Error parsing CISA KEV feed: {e}")
         return []
@@ -101,36 +224,145 @@ def parse_nvd_feed(content, feed_config):
     """Parse NVD JSON feed."""
     try:
         cve_items = content.get('CVE_Items', [])
-        topics = []
-        
-        for item in cve_items:
-            cve = item.get('cve', {})
-            impact = item.get('impact', {})
-            
-            # Get CVSS v3 score if available, otherwise try v2
-            cvss_data = (impact.get('baseMetricV3', {}).get('cvssV3', {}) or 
-                        impact.get('baseMetricV2', {}).get('cvssV2', {}))
-            
-            description = cve.get('description', {}).get('description_data', [{}])[0].get('value', '')
-            
-            topic = {
-                'name': f"CVE: {cve.get('CVE_data_meta', {}).get('ID')}",
-                'url': f"https://nvd.nist.gov/vuln/detail/{cve.get('CVE_data_meta', {}).get('ID')}",
-                'description': (f"{description}\n"
-                              f"CVSS Score: {cvss_data.get('baseScore', 'N/A')} "
-                              f"({cvss_data.get('severity', 'N/A')})"),
-                'date_published': item.get('publishedDate'),
-                'provider': feed_config['name'],
-                'category': feed_config['category'],
-                'date_accessed': datetime.now().isoformat()
-            }
-            topics.append(topic)
-            
-        return topics
+        return [_nvd_topic(item, feed_config) for item in cve_items]
     except Exception as e:
         logger.error(f"Error parsing NVD feed: {e}")
         return []
 
+# Streaming parsers for large JSON feeds: parser_type -> (array key, date field, topic builder)
+STREAMING_PARSERS = {
+    'cisa_kev': ('vulnerabilities', 'dateAdded', _cisa_kev_topic),
+    'nvd': ('CVE_Items', 'publishedDate', _nvd_topic),
+}
+
+class JSONArrayStream:
+    """
+    Incrementally decode the items of one array inside a JSON document.
+
+    Bytes are fed in chunks (optionally gzip-compressed) and every complete
+    array item is returned as soon as it has been received, so only one item
+    and the undecoded tail of the current chunk are held in memory. The array
+    is located by the first occurrence of its key, which holds for the KEV
+    and NVD feeds where the array follows a handful of scalar header fields.
+    """
+
+    def __init__(self, key, gzipped=False):
+        self._marker = json.dumps(key)
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._inflater = zlib.decompressobj(zlib.MAX_WBITS | 16) if gzipped else None
+        self._buffer = ''
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk):
+        """Feed raw bytes, returning the array items completed by this chunk."""
+        if self.done:
+            return []
+        if self._inflater is not None:
+            chunk = self._inflater.decompress(chunk)
+        self._buffer += self._text_decoder.decode(chunk)
+        return self._drain()
+
+    def _drain(self):
+        items = []
+        if not self._in_array:
+            start = self._buffer.find(self._marker)
+            if start == -1:
+                # Keep just enough of the tail to match a marker split across chunks
+                self._buffer = self._buffer[-len(self._marker):]
+                return items
+            bracket = self._buffer.find('[', start + len(self._marker))
+            if bracket == -1:
+                self._buffer = self._buffer[start:]
+                return items
+            self._buffer = self._buffer[bracket + 1:]
+            self._in_array = True
+
+        pos = 0
+        length = len(self._buffer)
+        while pos < length:
+            char = self._buffer[pos]
+            if char in ' \t\r\n,':
+                pos += 1
+                continue
+            if char == ']':
+                self.done = True
+                pos = length
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                # The item is incomplete, wait for the next chunk
+                break
+            items.append(item)
+            pos = end
+        self._buffer = self._buffer[pos:]
+        return items
+
+def _item_is_recent(item, date_field, since):
+    if since is None:
+        return True
+    value = item.get(date_field)
+    if not value:
+        return True
+    try:
+        published = date_parser.parse(value)
+    except (ValueError, TypeError, OverflowError):
+        return True
+    if published.tzinfo is None:
+        published = published.replace(tzinfo=timezone.utc)
+    return published >= since
+
+def iter_feed_topics(chunks, feed_config, since=None, gzipped=False):
+    """
+    Yield topics from an iterable of raw JSON feed chunks without decoding the whole feed.
+
+    Args:
+        chunks: Iterable of bytes, e.g. a file read in blocks
+        feed_config: Feed configuration with a parser_type from STREAMING_PARSERS
+        since: Optional timezone-aware datetime, older items are skipped before
+            a topic is built for them
+        gzipped: Whether the chunks are gzip-compressed
+    """
+    key, date_field, build_topic = STREAMING_PARSERS[feed_config['parser_type']]
+    stream = JSONArrayStream(key, gzipped=gzipped)
+    for chunk in chunks:
+        for item in stream.feed(chunk):
+            if _item_is_recent(item, date_field, since):
+                yield build_topic(item, feed_config)
+        if stream.done:
+            break
+
+async def stream_feed_topics(feed_config, client=None, since=None, headers=None, on_response=None):
+    """
+    Download a large JSON feed and yield its topics while the body is still arriving.
+
+    Args:
+        feed_config: Feed configuration with a parser_type from STREAMING_PARSERS
+        client: Optional httpx.AsyncClient, defaults to the shared pooled client
+        since: Optional timezone-aware datetime cutoff for item dates
+        headers: Optional extra request headers (e.g. conditional request headers)
+        on_response: Optional callback receiving the response before the body is read;
+            returning False stops the stream (used to honour 304 responses)
+    """
+    url = feed_config['url']
+    key, date_field, build_topic = STREAMING_PARSERS[feed_config['parser_type']]
+    if client is None:
+        client = get_async_client(verify=False)
+    async with client.stream('GET', url, headers=headers, timeout=30.0) as response:
+        if on_response is not None and on_response(response) is False:
+            return
+        response.raise_for_status()
+        encoding = response.headers.get('content-encoding', '')
+        stream = JSONArrayStream(key, gzipped=url.endswith('.gz') and 'gzip' not in encoding)
+        async for chunk in response.aiter_bytes():
+            for item in stream.feed(chunk):
+                if _item_is_recent(item, date_field, since):
+                    yield build_topic(item, feed_config)
+            if stream.done:
+                break
+
 async def parse_feed(content, feed_config):
     """Parse feed content based on feed type."""
     if feed_config.get('format') == 'json':
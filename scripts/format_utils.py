@@ -3,6 +3,7 @@ import math
 import re
 import os
 from gpt_utils import query_gpt
+from parse_service import parsing_service
 
 class ReadabilityMetrics:
     class TrieNode:
@@ -54,6 +55,11 @@ class ReadabilityMetrics:
             self.trie.insert(word)
         self.paragraphs = self.soup.find_all('p')
 
+    @classmethod
+    async def score_html(cls, html):
+        """Compute the readability score of an HTML document in the parsing pool."""
+        return await parsing_service.run(readability_score, html)
+
     def sanitize_text(self, text):
         # Remove unwanted characters from text, convert to lowercase, and remove spaces.
         return re.sub(r'[^\w\s]', '', text).lower().replace(" ", "")
@@ -108,26 +114,6 @@ class ReadabilityMetrics:
         # Update the text content after optimization using the entire parsed HTML
         self.text = str(self.soup)
 
-    def optimize_readability(self):
-        """
-        Optimize the content for readability.
-        Return the improved content or the original.
-        """
-        initial_score = self.readability_score()
-        print(f"Initial Readability Score: {initial_score}")
-        #print(f"self.text: {self.text}")
-        self.optimize()
-
-        final_score = self.readability_score()
-        print(f"Final Readability Score: {final_score}")
-
-        # If the final score is worse than the initial score or if there's no improvement, return the original content
-        if final_score <= initial_score:
-            return self.text
-
-        # Otherwise, return the optimized content
-        return self.text
-
     def rank_paragraphs(self):
         if not self.paragraphs:
             return []
@@ -271,6 +257,16 @@ class ReadabilityMetrics:
                 if self.passive_voice_percentage() < 10:
                     break
     
+def readability_score(html):
+    # Module-level so the parsing pool can pickle it
+    return ReadabilityMetrics(html).readability_score()
+
+def optimize_html(html):
+    # Rewrites paragraphs and sentences through GPT; returns the optimized HTML
+    metrics = ReadabilityMetrics(html)
+    metrics.optimize()
+    return metrics.text
+
 class SeoMetrics:
     def __init__(self, post_info, images):
         self.post_info = post_info
@@ -398,7 +394,7 @@ class SeoMetrics:
     def rewrite_seo_title(self):
         prompt = f"Rewrite the SEO title to include the keyphrase \"{self.keyword}\". The current SEO title is: {self.seo_title}"
         response_machine_prompt = "Follow the instructions to rewrite a short SEO title."
-        rewritten_seo_title = query_gpt(prompt, response_machine_prompt, model='gpt-3.5-turbo')
+        rewritten_seo_title = query_gpt(prompt, response_machine_prompt, model='gpt-3.5-turbo', cache=True)
         if rewritten_seo_title:
             self.seo_title = rewritten_seo_title  # Save the updated value
         else:
@@ -419,7 +415,7 @@ class SeoMetrics:
         response_machine_prompt = "Follow the instructions to rewrite the meta description."
 
         # Query GPT
-        rewritten_meta_description = query_gpt(prompt, response_machine_prompt, model='gpt-3.5-turbo')
+        rewritten_meta_description = query_gpt(prompt, response_machine_prompt, model='gpt-3.5-turbo', cache=True)
         
         # Define a helper function to check if the meta description fits the requirements
         def is_meta_valid(meta):
@@ -460,7 +456,7 @@ class SeoMetrics:
         response_machine_prompt = "Follow the instructions to rewrite the first paragraph. maintain an active voice, keep any previous HTML syntax, don't use sentences longer than 20 words, don't make the introduction too long, and use appropriate transition words."
         
         # Query GPT to rewrite the first paragraph
-        rewritten_first_paragraph = query_gpt(prompt, response_machine_prompt, model='gpt-3.5-turbo')
+        rewritten_first_paragraph = query_gpt(prompt, response_machine_prompt, model='gpt-3.5-turbo', cache=True)
         
         # Ensure the rewritten paragraph is surrounded by <p> tags
         if not rewritten_first_paragraph.startswith('<p>'):
@@ -11,6 +11,7 @@ from topic_generator import get_latest_topics
 from inspect import isawaitable
 from topic_evaluation import filter_topics_structured
 from scripts.supabase_utils import supabase
+from topic_index import topic_index, TopicIndex
 
 # Load environment variables
 load_dotenv()
@@ -21,8 +22,13 @@ def fetch_and_process_xml(url):
     etree = ET.ElementTree(ET.fromstring(data))
     return etree.findall("./channel/item")
 
-async def filter_new_topics(topics, existing_topics, use_structured_output: bool = True):
-    """Filter out topics that already exist in the database based on URL."""
+async def filter_new_topics(topics, existing_topics=None, use_structured_output: bool = True):
+    """Filter out topics that already exist in the database based on URL or title.
+
+    Existing topics are looked up in the local topic index; pass existing_topics
+    to check against an explicit list of topic rows instead.
+    """
+    topics_list = None
     try:
         if use_structured_output:
             try:
@@ -38,23 +44,12 @@ async def filter_new_topics(topics, existing_topics, use_structured_output: bool
                 print("Falling back to traditional approach")
                 
         # Traditional filtering approach (fallback)
-        existing_urls = set()
-        url_to_topic = {}
-        for topic in existing_topics:
-            url = topic.get('url')
-            if not url:
-                continue
-            url = url.split('?')[0].rstrip('/')
-            if 'CVE-2024-57609' in url:
-                continue
-            existing_urls.add(url)
-            url_to_topic[url] = topic
-            
-        print(f"Found {len(existing_urls)} existing URLs")
-        print("First 5 existing URLs:")
-        for url in list(existing_urls)[:5]:
-            topic = url_to_topic[url]
-            print(f"  - {url} (ID={topic.get('id')}, Name={topic.get('name', 'Unknown')})")
+        if existing_topics is None:
+            index = topic_index
+        else:
+            index = TopicIndex(':memory:')
+            index.add_many(existing_topics)
+        print(f"Checking against {len(index)} existing topics")
         
         filtered_topics = []
         topics_list = topics if isinstance(topics, list) else await topics
@@ -68,14 +63,15 @@ async def filter_new_topics(topics, existing_topics, use_structured_output: bool
             url = url.split('?')[0].rstrip('/')
             print(f"\nChecking URL: {url}")
             
-            if url in existing_urls:
-                matching_topic = url_to_topic.get(url)
-                if matching_topic:
-                    print(f"Found matching URL in database: {url}")
-                    print(f"Existing topic: ID={matching_topic.get('id')}, Name={matching_topic.get('name', 'Unknown')}")
-                else:
-                    print(f"Found matching URL in database but no topic info: {url}")
-                continue
+            if 'CVE-2024-57609' not in url:
+                matching_id = index.find_url(url)
+                if matching_id is not None:
+                    print(f"Found matching URL in database: {url} (existing topic ID={matching_id})")
+                    continue
+                matching_id = index.find_title(topic.get('name'))
+                if matching_id is not None:
+                    print(f"Found matching title in database: {topic.get('name')} (existing topic ID={matching_id})")
+                    continue
                 
             if any(pattern in url.lower() for pattern in [
                 '/search/label/',
@@ -131,9 +127,9 @@ async def generate_topics(supabase, amount_of_topics: int = 1, use_structured_ou
     print("Starting topic generation...")
     
     try:
-        # Get existing topics from database
-        existing_topics = supabase.table("topics").select("*").execute()
-        print(f"Found {len(existing_topics.data)} existing topics")
+        # Bring the local topic index up to date with the database
+        synced = topic_index.sync(supabase)
+        print(f"Synced {synced} new topics into the topic index ({len(topic_index)} indexed)")
         
         # Get the maximum ID from Supabase
         max_id_result = supabase.table('topics').select('id').order('id', desc=True).limit(1).execute()
@@ -150,7 +146,7 @@ async def generate_topics(supabase, amount_of_topics: int = 1, use_structured_ou
         print(f"Generated {len(topics)} potential topics")
         
         # Filter out existing topics using either the new or traditional approach
-        filtered_topics = await filter_new_topics(topics, existing_topics.data, use_structured_output)
+        filtered_topics = await filter_new_topics(topics, use_structured_output=use_structured_output)
         
         # Assign IDs to new topics
         for i, topic in enumerate(filtered_topics):
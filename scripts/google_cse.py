@@ -1,5 +1,5 @@
 import os
-import httpx
+from http_clients import get_client
 from dotenv import load_dotenv
 import logging
 from datetime import datetime
@@ -52,7 +52,7 @@ def fetch_sources_from_google_cse(query, num_results=10):
     # First attempt with site restriction
     try:
         print("Making request to Google CSE API with site restriction...")
-        response = httpx.get(endpoint, params=params, timeout=30.0)
+        response = get_client().get(endpoint, params=params, timeout=30.0)
         response.raise_for_status()
         search_result = response.json()
         print(f"Search info (with site restriction): {search_result.get('searchInformation', {})}")
@@ -67,7 +67,7 @@ def fetch_sources_from_google_cse(query, num_results=10):
         params.pop('siteSearchFilter')
         try:
             print("Making request to Google CSE API without site restriction...")
-            response = httpx.get(endpoint, params=params, timeout=30.0)
+            response = get_client().get(endpoint, params=params, timeout=30.0)
             response.raise_for_status()
             search_result = response.json()
             print(f"Search info (without site restriction): {search_result.get('searchInformation', {})}")
@@ -1,27 +1,18 @@
 import json
 import logging
 import os
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_random_exponential,
-    retry_if_exception_type
-)
+from functools import lru_cache
 import openai
-from openai import OpenAI
 import tiktoken
 from PIL import Image, ImageOps
 from io import BytesIO
 from pydantic import BaseModel
 from typing import TypeVar, Type, Optional, Dict, Any, List, Union
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
+from llm_cache import llm_cache, make_cache_key
+from openai_client import openai_manager
 
 
-client = OpenAI(
-    api_key=os.getenv('OPENAI_API_KEY'),
-    organization=os.getenv('OPENAI_ORGANIZATION')
-)
-
 # Set your OpenAI API key and organization
 openai.api_key = os.getenv('OPENAI_API_KEY')
 openai.organization = os.getenv('OPENAI_ORGANIZATION')
@@ -29,19 +20,15 @@ openai.organization = os.getenv('OPENAI_ORGANIZATION')
 model = os.getenv('FUNCTION_CALL_MODEL')
 summarization_model = os.getenv('SUMMARIZATION_MODEL')
 
-# Define the retry behavior
-@retry(
-    retry=retry_if_exception_type(BaseException),
-    wait=wait_random_exponential(multiplier=1, max=60),
-    stop=stop_after_attempt(10)
-)
-def _api_call_with_backoff(*args, **kwargs):
-    return client.chat.completions.create(*args, **kwargs)
-
-def function_call_gpt(user_prompt, system_prompt, model=model, functions=[], function_call_mode="auto"):
+def function_call_gpt(user_prompt, system_prompt, model=model, functions=[], function_call_mode="auto", cache=False):
     function_call_mode = {"name": f"{functions[0]['name']}"}
+    if cache:
+        cache_key = make_cache_key(model, system_prompt, user_prompt, functions)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
     try:
-        response = _api_call_with_backoff(
+        response = openai_manager.chat_sync(
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -50,7 +37,10 @@ def function_call_gpt(user_prompt, system_prompt, model=model, functions=[], fun
             functions=functions,
             function_call=function_call_mode
         )
-        return json.loads(response.choices[0].message.function_call.arguments)
+        arguments = json.loads(response.choices[0].message.function_call.arguments)
+        if cache:
+            llm_cache.put(cache_key, model, arguments)
+        return arguments
     except Exception as err:
         logging.error(err)
         print(f"Parameters: {functions}")
@@ -59,7 +49,7 @@ def function_call_gpt(user_prompt, system_prompt, model=model, functions=[], fun
 def query_dalle(prompt, mode="create", size="1792x1024", image=None, mask=None, n=1):
     if mode == 'create':
         try:
-            response = client.images.generate(
+            response = openai_manager.sync_client.images.generate(
                 model = "dall-e-3",
                 prompt = prompt,
                 n=n,
@@ -72,7 +62,7 @@ def query_dalle(prompt, mode="create", size="1792x1024", image=None, mask=None,
             print(f"Error: {err}")
     elif mode == 'edit':
         try:
-            response = client.images.edit(
+            response = openai_manager.sync_client.images.edit(
                 prompt = prompt,
                 image = image,
                 n = n,
@@ -95,7 +85,7 @@ def list_available_models(filter_prefix=None):
         list: Sorted list of model IDs
     """
     try:
-        response = client.models.list()
+        response = openai_manager.sync_client.models.list()
         models = []
         
         # Convert single prefix to list for consistent handling
@@ -127,7 +117,7 @@ def list_available_models(filter_prefix=None):
         logging.error(f"Failed to list models: {err}")
         return []
 
-def query_gpt(user_prompt, system_prompt, model=summarization_model):
+def query_gpt(user_prompt, system_prompt, model=summarization_model, cache=False):
     """
     Query GPT model with the given prompts.
     
@@ -135,6 +125,7 @@ def query_gpt(user_prompt, system_prompt, model=summarization_model):
         user_prompt (str): The user's input prompt
         system_prompt (str): The system behavior prompt
         model (str): The model to use for the query
+        cache (bool): Reuse a stored response for the same model and prompts
         
     Returns:
         str: The model's response
@@ -148,19 +139,20 @@ def query_gpt(user_prompt, system_prompt, model=summarization_model):
     if not user_prompt or not system_prompt:
         raise ValueError("User prompt and system prompt cannot be empty or None")
     
+    if cache:
+        cache_key = make_cache_key(model, system_prompt, user_prompt)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
     # Validate API key
     api_key = os.getenv('OPENAI_API_KEY')
     if not api_key:
         raise ValueError("OpenAI API key is not set")
     
-    # Create a new client instance for each call to ensure we're using the current API key
-    client = OpenAI(
-        api_key=api_key,
-        organization=os.getenv('OPENAI_ORGANIZATION')
-    )
-        
     try:
-        response = client.chat.completions.create(
+        # The shared client is rebuilt if the API key in the environment changes
+        response = openai_manager.chat_sync(
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -170,7 +162,10 @@ def query_gpt(user_prompt, system_prompt, model=summarization_model):
         if not response.choices:
             raise Exception("No response received from the model")
             
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        if cache:
+            llm_cache.put(cache_key, model, content)
+        return content
     except openai.AuthenticationError as err:
         logging.error(f"Authentication error in query_gpt: {err}")
         raise
@@ -181,13 +176,52 @@ def query_gpt(user_prompt, system_prompt, model=summarization_model):
         logging.error(f"Unexpected error in query_gpt: {err}")
         raise
 
+# Threads used by tiktoken when encoding batches of documents
+TOKEN_COUNT_THREADS = int(os.getenv('TOKEN_COUNT_THREADS', '8'))
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """
+    Tokenizer for a model, loaded once per process.
+
+    Accepts model names ('gpt-4') as well as encoding names ('cl100k_base');
+    unknown models fall back to cl100k_base.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        try:
+            return tiktoken.get_encoding(model)
+        except ValueError:
+            return tiktoken.get_encoding('cl100k_base')
+
 def tokenizer(string: str, encoding_name: str) -> int:
-    encoding = tiktoken.encoding_for_model(encoding_name)
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
+    # encode_ordinary treats special-token text in scraped pages as plain text
+    return len(get_encoding(encoding_name).encode_ordinary(string))
+
+def count_tokens_batch(texts: List[str], model: str = 'gpt-4', num_threads: int = TOKEN_COUNT_THREADS) -> List[int]:
+    """Token counts of many texts, encoded in parallel by tiktoken's thread pool."""
+    if not texts:
+        return []
+    encoded = get_encoding(model).encode_ordinary_batch(list(texts), num_threads=num_threads)
+    return [len(tokens) for tokens in encoded]
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = 'gpt-4') -> str:
+    """Cut text to at most max_tokens tokens."""
+    # A token covers at least one byte, so short texts need no encoding
+    if len(text.encode('utf-8')) <= max_tokens:
+        return text
+    encoding = get_encoding(model)
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
 
 def model_optimizer(text, model):
-    token_quantity = tokenizer(text, model)
+    # Below 4096 bytes the text is certainly below 4096 tokens, which is all the smallest tier needs to know
+    token_quantity = len(text.encode('utf-8'))
+    if token_quantity >= 4096:
+        token_quantity = tokenizer(text, model)
     if model.startswith('gpt-4'):
         if token_quantity <= 4096:
             return 'gpt-4-1106-preview'
@@ -323,7 +357,8 @@ source_remover_function = [
         
 T = TypeVar('T', bound=BaseModel)
 
-def structured_output_gpt(prompt: str, model_class: Type[T], system_prompt: Optional[str] = None) -> Optional[T]:
+def structured_output_gpt(prompt: str, model_class: Type[T], system_prompt: Optional[str] = None,
+                          cache: bool = False) -> Optional[T]:
     """
     Query GPT model with structured output using Pydantic models.
     
@@ -331,6 +366,7 @@ def structured_output_gpt(prompt: str, model_class: Type[T], system_prompt: Opti
         prompt (str): The user's input prompt
         model_class (Type[T]): The Pydantic model class to structure the output
         system_prompt (Optional[str]): Optional system behavior prompt
+        cache (bool): Reuse a stored response for the same prompts and output schema
         
     Returns:
         Optional[T]: The structured response, or None if parsing fails
@@ -349,27 +385,35 @@ def structured_output_gpt(prompt: str, model_class: Type[T], system_prompt: Opti
     # Add user prompt with explicit JSON request
     messages.append({"role": "user", "content": f"{prompt}\nPlease provide your response in JSON format that matches the expected structure."})
     
+    structured_model = "gpt-4-1106-preview"  # Use a specific model that supports JSON output
+    cache_key = make_cache_key(structured_model, messages[0]['content'], messages[1]['content'],
+                               model_class.model_json_schema())
+    content = llm_cache.get(cache_key) if cache else None
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-1106-preview",  # Use a specific model that supports JSON output
-            messages=messages,
-            response_format={"type": "json_object"}
-        )
-        
-        if not response.choices:
-            print("No response received from the model")
-            return None
+        if content is None:
+            response = openai_manager.chat_sync(
+                model=structured_model,
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
             
-        content = response.choices[0].message.content
-        if not content:
-            print("Empty content received from the model")
-            return None
+            if not response.choices:
+                print("No response received from the model")
+                return None
+                
+            content = response.choices[0].message.content
+            if not content:
+                print("Empty content received from the model")
+                return None
             
         try:
             # Parse the JSON string into a dictionary
             data = json.loads(content)
             # Create a Pydantic model instance from the dictionary
-            return model_class(**data)
+            result = model_class(**data)
+            if cache:
+                llm_cache.put(cache_key, structured_model, content)
+            return result
         except (json.JSONDecodeError, ValueError) as e:
             print(f"Error parsing model response: {e}")
             print(f"Raw content: {content}")
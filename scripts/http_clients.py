@@ -0,0 +1,222 @@
+"""
+Shared, pooled HTTP clients.
+
+Creating an httpx client per request throws away its connection pool, so
+every call paid a new TCP and TLS handshake. The clients handed out here are
+long-lived and keep connections alive, speak HTTP/2 when the `h2` package is
+installed, cap the number of concurrent requests per host, and are cached per
+proxy and TLS-verification setting.
+
+Use get_async_client() in coroutines and get_client() in synchronous code.
+Callers must not close the returned clients; call close_clients() or
+aclose_clients() on shutdown instead.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '30'))
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', '20'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+# Concurrent requests allowed to a single host
+HTTP_MAX_PER_HOST = int(os.getenv('HTTP_MAX_PER_HOST', '6'))
+# HTTP/2 needs the optional `h2` package
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'true').lower() in ('true', '1', 't') \
+    and importlib.util.find_spec('h2') is not None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _host_key(request: httpx.Request) -> Tuple[bytes, str, Optional[int]]:
+    return request.url.raw_scheme, request.url.host, request.url.port
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+def _once(release):
+    done = False
+
+    def wrapper():
+        nonlocal done
+        if not done:
+            done = True
+            release()
+    return wrapper
+
+
+class HostLimitedTransport(httpx.BaseTransport):
+    """Sync transport allowing at most `per_host` open responses per host."""
+
+    def __init__(self, transport: httpx.BaseTransport, per_host: int = HTTP_MAX_PER_HOST):
+        self._transport = transport
+        self._per_host = per_host
+        self._lock = threading.Lock()
+        self._semaphores: Dict[tuple, threading.BoundedSemaphore] = {}
+
+    def _semaphore(self, request):
+        with self._lock:
+            return self._semaphores.setdefault(_host_key(request), threading.BoundedSemaphore(self._per_host))
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphore(request)
+        semaphore.acquire()
+        release = _once(semaphore.release)
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        if isinstance(response.stream, httpx.ByteStream):
+            # Body already in memory, nothing left to read from the connection
+            release()
+            return response
+        # The slot is held until the body has been read or the response closed
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncHostLimitedTransport(httpx.AsyncBaseTransport):
+    """Async transport allowing at most `per_host` open responses per host."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, per_host: int = HTTP_MAX_PER_HOST):
+        self._transport = transport
+        self._per_host = per_host
+        self._semaphores: Dict[tuple, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphores.setdefault(_host_key(request), asyncio.Semaphore(self._per_host))
+        await semaphore.acquire()
+        release = _once(semaphore.release)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        if isinstance(response.stream, httpx.ByteStream):
+            # Body already in memory, nothing left to read from the connection
+            release()
+            return response
+        # The slot is held until the body has been read or the response closed
+        response.stream = _AsyncReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class HTTPClientRegistry:
+    """Cache of pooled clients keyed by proxy and TLS verification."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[Optional[str], bool], httpx.Client] = {}
+        # Async clients are bound to the event loop they were first used on
+        self._async_clients: Dict[Tuple[asyncio.AbstractEventLoop, Optional[str], bool], httpx.AsyncClient] = {}
+
+    def get_client(self, proxy: Optional[str] = None, verify: bool = True) -> httpx.Client:
+        key = (proxy, verify)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None or client.is_closed:
+                transport = httpx.HTTPTransport(verify=verify, http2=HTTP2_ENABLED, limits=_limits(),
+                                                proxy=httpx.Proxy(proxy) if proxy else None)
+                client = httpx.Client(transport=HostLimitedTransport(transport), timeout=HTTP_TIMEOUT)
+                self._clients[key] = client
+            return client
+
+    def get_async_client(self, proxy: Optional[str] = None, verify: bool = True) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        key = (loop, proxy, verify)
+        with self._lock:
+            # Clients of loops that have finished (e.g. an earlier asyncio.run) can't be reused
+            for stale in [k for k in self._async_clients if k[0].is_closed()]:
+                del self._async_clients[stale]
+            client = self._async_clients.get(key)
+            if client is None or client.is_closed:
+                transport = httpx.AsyncHTTPTransport(verify=verify, http2=HTTP2_ENABLED, limits=_limits(),
+                                                     proxy=httpx.Proxy(proxy) if proxy else None)
+                client = httpx.AsyncClient(transport=AsyncHostLimitedTransport(transport), timeout=HTTP_TIMEOUT)
+                self._async_clients[key] = client
+            return client
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [k for k in self._async_clients if k[0] is loop]
+            clients = [self._async_clients.pop(k) for k in keys]
+        for client in clients:
+            await client.aclose()
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_client(proxy: Optional[str] = None, verify: bool = True) -> httpx.Client:
+    """Shared synchronous client, optionally routed through a proxy."""
+    return http_clients.get_client(proxy, verify)
+
+
+def get_async_client(proxy: Optional[str] = None, verify: bool = True) -> httpx.AsyncClient:
+    """Shared asynchronous client for the running event loop, optionally routed through a proxy."""
+    return http_clients.get_async_client(proxy, verify)
+
+
+def close_clients():
+    http_clients.close()
+
+
+async def aclose_clients():
+    await http_clients.aclose()
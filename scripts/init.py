@@ -7,10 +7,20 @@ from gpt_utils import list_available_models as list_models, query_dalle, generat
 from generate_topics import generate_topics, filter_new_topics
 from supabase_utils import supabase, store_post_info, delete_topic, get_a_source_from_supabase
 from utils import inspect_all_methods
-from source_fetcher import gather_sources, create_factsheets_for_sources, create_factsheet, search_related_sources
+from source_fetcher import gather_sources, create_factsheets_for_sources, create_factsheet
 from post_synthesis import post_synthesis, post_completion
 from content_optimization import test_seo_and_readability_optimization
 from extract_text import test_scraping_site
+from pipeline import TopicPipeline
+from topic_index import topic_index
+from topic_vectors import topic_vectors
+from browser_pool import browser_pool
+from parse_service import parsing_service
+from scrape_cache import scrape_cache
+from llm_cache import llm_cache
+from openai_client import openai_manager
+from http_clients import aclose_clients
+from supabase_batch import BatchWriter
 import asyncio
 from cisa import get_cisa_exploits
 # Load environment variables
@@ -24,6 +34,15 @@ MIN_SOURCES = 3
 exploit_fetcher_activated = False
 debug = False
 synthesize_factsheets = True
+# Staged pipeline: overlap scraping, factsheets, synthesis and publishing across topics
+pipeline_mode = os.getenv('PIPELINE_MODE', 'false').lower() == 'true'
+PIPELINE_WORKERS = {
+    'scrape': int(os.getenv('PIPELINE_SCRAPE_WORKERS', 3)),
+    'factsheet': int(os.getenv('PIPELINE_FACTSHEET_WORKERS', 2)),
+    'synthesis': int(os.getenv('PIPELINE_SYNTHESIS_WORKERS', 2)),
+    'publish': int(os.getenv('PIPELINE_PUBLISH_WORKERS', 1)),
+}
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 5))
 
 def test_update_posts_with_new_html():
     # Second argument is the starting date (the 1st of november 2023)
@@ -42,22 +61,37 @@ async def test_create_factsheet():
     factsheet = await create_factsheet(source, 'The Millenium Rat')
     print(f"Factsheet: {factsheet}")
 
-async def process_topic(topic):
-    """Process a single topic."""
+TOPIC_COLUMNS = ('id', 'name', 'description', 'date_accessed', 'date_published', 'provider', 'url')
+
+async def create_topics(topics):
+    """Insert topics in bulk and index them. Returns the topics that were stored."""
+    if not topics:
+        return []
+    rows = [{column: topic[column] for column in TOPIC_COLUMNS} for topic in topics]
+    # Plain inserts: a clash with an existing topic id must fail, not overwrite it.
+    # A rejected chunk is retried in halves so only the offending topics are lost.
+    writer = BatchWriter(supabase, 'topics', isolate_failures=True)
+    written = await asyncio.to_thread(writer.add_many, rows)
+    written += await asyncio.to_thread(writer.flush)
+    if writer.rows_failed:
+        print(f"Failed to create {writer.rows_failed} topics in Supabase")
+    print(writer.report())
+    written_ids = {row.get('id') for row in written}
+    created = [topic for topic in topics if topic['id'] in written_ids]
+    if not created:
+        return []
+    topic_index.add_many(created)
     try:
-        response = supabase.table("topics").insert([{
-            'id': topic['id'],
-            'name': topic['name'],
-            'description': topic['description'],
-            'date_accessed': topic['date_accessed'],
-            'date_published': topic['date_published'],
-            'provider': topic['provider'],
-            'url': topic['url']
-        }]).execute()
-        print(f"Successfully created topic: {topic['name']} (ID: {topic['id']})")
+        await asyncio.to_thread(topic_vectors.add_topics, created)
     except Exception as e:
-        print(f"Failed to create topic in Supabase: {e}")
-        return
+        print(f"Failed to store topic vectors: {e}")
+    for topic in created:
+        print(f"Successfully created topic: {topic['name']} (ID: {topic['id']})")
+    return created
+
+async def process_topic(topic):
+    """Process a single topic."""
+    return await create_topics([topic])
 
 async def fetch_cisa_exploits():
     # Upload new cisa exploits
@@ -69,15 +103,80 @@ async def fetch_cisa_exploits():
     else:
         print(f"Got CISA exploits in {time.time() - start_time:.2f} seconds")
 
+async def scrape_stage(topic):
+    """Gather the sources of a created topic. Returns None if no sources were found."""
+    print(f"\nGathering sources for topic: {topic['name']} (ID: {topic['id']})...")
+    sources = await gather_sources(supabase, topic, MIN_SOURCES)
+    if not sources:
+        print(f"No sources found for topic {topic['id']}")
+        return None
+    print(f"Found {len(sources)} sources for topic {topic['id']}")
+
+    if len(sources) < MIN_SOURCES:
+        print(f"Warning: Could only gather {len(sources)} sources for topic {topic['id']}, wanted {MIN_SOURCES}")
+    return topic
+
+async def factsheet_stage(topic):
+    """Create and aggregate the factsheets for a topic's sources."""
+    print(f"\nCreating factsheets for topic: {topic['name']} (ID: {topic['id']})...")
+    factsheet, external_source_info = await create_factsheets_for_sources(topic)
+    if not factsheet:
+        print(f"Failed to create factsheet for topic {topic['id']}")
+        return None
+    print(f"Successfully created factsheet for topic {topic['id']}")
+    return topic
+
+async def synthesis_stage(topic):
+    """Generate the post content for a topic. Returns (topic, post_info)."""
+    print(f"\nCreating post for topic: {topic['name']} (ID: {topic['id']})...")
+    try:
+        # The WordPress and GPT helpers are synchronous, keep them off the event loop
+        categories = await asyncio.to_thread(fetch_categories)
+        tags = await asyncio.to_thread(fetch_tags)
+        post_info = await asyncio.to_thread(post_synthesis, topic, categories, tags)
+    except Exception as e:
+        print(f"Error creating post: {e}")
+        print(f"Error details: ", e.__class__.__name__)
+        return None
+    if not post_info:
+        print(f"No post generated for topic {topic['id']}")
+        return None
+    post_info['topic_id'] = topic['id']
+    return topic, post_info
+
+async def publish_stage(post):
+    """Store the generated post info in Supabase."""
+    topic, post_info = post
+    try:
+        await asyncio.to_thread(store_post_info, supabase, post_info)
+        print("Successfully stored post info in Supabase")
+    except Exception as e:
+        print(f"Failed to store post info in Supabase: {e}")
+        return None
+    return topic
+
+async def run_topic_pipeline(topics):
+    """Process topics through the staged pipeline so stages overlap across topics."""
+    pipeline = TopicPipeline()
+    pipeline.add_stage('scrape', scrape_stage, PIPELINE_WORKERS['scrape'], PIPELINE_QUEUE_SIZE)
+    if synthesize_factsheets:
+        pipeline.add_stage('factsheet', factsheet_stage, PIPELINE_WORKERS['factsheet'], PIPELINE_QUEUE_SIZE)
+        pipeline.add_stage('synthesis', synthesis_stage, PIPELINE_WORKERS['synthesis'], PIPELINE_QUEUE_SIZE)
+        pipeline.add_stage('publish', publish_stage, PIPELINE_WORKERS['publish'], PIPELINE_QUEUE_SIZE)
+    print(f"Running pipeline for {len(topics)} topics")
+    results = await pipeline.run(topics)
+    print(pipeline.report())
+    return results
+
 async def main(amount_of_topics=1):
     """Main function to generate and process topics."""
-    # Get existing topics first
-    print("Fetching existing topics from database...")
+    # Bring the local topic index up to date with the database
+    print("Syncing topic index with database...")
     try:
-        existing_topics = supabase.table("topics").select("*").execute()
-        print(f"Found {len(existing_topics.data)} existing topics")
+        synced = topic_index.sync(supabase)
+        print(f"Synced {synced} new topics ({len(topic_index)} indexed)")
     except Exception as e:
-        print(f"Failed to fetch existing topics: {e}")
+        print(f"Failed to sync topic index: {e}")
         return
 
     # Get the maximum ID from Supabase
@@ -96,7 +195,7 @@ async def main(amount_of_topics=1):
         return
 
     # Filter out existing topics
-    filtered_topics = await filter_new_topics(topics, existing_topics.data)
+    filtered_topics = await filter_new_topics(topics)
     print(f"Found {len(filtered_topics)} new topics")
 
     # Assign IDs to new topics
@@ -107,78 +206,38 @@ async def main(amount_of_topics=1):
     topics_to_process = filtered_topics[:amount_of_topics]
     print(f"Using {len(topics_to_process)} topics after limiting to requested amount")
 
-    # Process each topic
-    for topic in topics_to_process:
-        # First create the topic
-        await process_topic(topic)
-        
-        print(f"\nGathering sources for topic: {topic['name']} (ID: {topic['id']})...")
-        # Then gather sources
-        sources = await gather_sources(supabase, topic, MIN_SOURCES)
-        if not sources:
-            print(f"No sources found for topic {topic['id']}")
-            continue
-        print(f"Found {len(sources)} sources for topic {topic['id']}")
-        
-        if len(sources) < MIN_SOURCES:
-            print(f"Looking for additional sources for topic: {topic['name']}")
-            additional_sources = search_related_sources(topic['name'])
-            if additional_sources:
-                for source in additional_sources:
-                    if len(sources) >= MIN_SOURCES:
-                        break
-                    try:
-                        content = await scrape_content(source['url'])
-                        if content:
-                            source_record = {
-                                'topic_id': topic['id'],
-                                'url': source['url'],
-                                'content': content,
-                                'date_accessed': datetime.now().isoformat(),
-                                'external_source': True
-                            }
-                            response = supabase.table('sources').insert(source_record).execute()
-                            if response.data:
-                                sources.extend(response.data)
-                                print(f"Added additional source: {source['url']}")
-                    except Exception as e:
-                        print(f"Error adding additional source {source['url']}: {e}")
-                        continue
-        
-        if len(sources) < MIN_SOURCES:
-            print(f"Warning: Could only gather {len(sources)} sources for topic {topic['id']}, wanted {MIN_SOURCES}")
-        
-        if synthesize_factsheets:
-            print(f"\nCreating factsheets for topic: {topic['name']} (ID: {topic['id']})...")
-            # Create factsheets from sources
-            factsheet, external_source_info = await create_factsheets_for_sources(topic)
-            if factsheet:
-                print(f"Successfully created factsheet for topic {topic['id']}")
-                
-                # Create and publish post
-                print(f"\nCreating post for topic: {topic['name']} (ID: {topic['id']})...")
-                try:
-                    # Fetch categories and tags
-                    categories = fetch_categories()
-                    tags = fetch_tags()
-                    
-                    # Generate post content
-                    post_info = post_synthesis(topic, categories, tags)
-                    
-                    # Add topic_id to post_info
-                    post_info['topic_id'] = topic['id']
-                    
-                    # Store post info in Supabase
-                    try:
-                        store_post_info(supabase, post_info)
-                        print("Successfully stored post info in Supabase")
-                    except Exception as e:
-                        print(f"Failed to store post info in Supabase: {e}")
-                except Exception as e:
-                    print(f"Error creating post: {e}")
-                    print(f"Error details: ", e.__class__.__name__)
-            else:
-                print(f"Failed to create factsheet for topic {topic['id']}")
+    # Create all topics in one bulk write before processing them
+    topics_to_process = await create_topics(topics_to_process)
+
+    try:
+        if pipeline_mode:
+            await run_topic_pipeline(topics_to_process)
+            return
+
+        # Process each topic
+        for topic in topics_to_process:
+            # First gather the topic's sources
+            topic = await scrape_stage(topic)
+            if topic is None or not synthesize_factsheets:
+                continue
+            topic = await factsheet_stage(topic)
+            if topic is None:
+                continue
+            post = await synthesis_stage(topic)
+            if post is None:
+                continue
+            await publish_stage(post)
+    finally:
+        # Shut down the browsers and parsing workers shared by all scrapers
+        await browser_pool.close()
+        parsing_service.shutdown()
+        print(f"Scrape cache: {scrape_cache.hits} hits, {scrape_cache.misses} misses")
+        print(f"LLM cache: {llm_cache.hits} hits, {llm_cache.misses} misses")
+        await openai_manager.aclose()
+        await aclose_clients()
+        for model_name, model_stats in openai_manager.stats().items():
+            print(f"OpenAI {model_name}: {model_stats['requests']} calls, {model_stats['retries']} retries, "
+                  f"avg queue wait {model_stats['avg_queue_wait']:.2f}s, avg latency {model_stats['avg_latency']:.2f}s")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+Local state of the CISA Known Exploited Vulnerabilities sync.
+
+The KEV catalog is republished in full on every change. Keeping the last
+synced catalogVersion and a content hash of every entry here lets the sync
+skip an unchanged catalog outright and, when it has changed, upsert only the
+entries that are new or were edited, without reading the exploits table.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional
+from cache_config import KEV_STATE_PATH
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+def entry_hash(entry: Dict[str, Any]) -> str:
+    """Hash of a catalog entry's content, independent of key order."""
+    data = json.dumps(entry, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    cve TEXT PRIMARY KEY,
+    hash TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class KevState(SQLiteStore):
+    """SQLite-backed catalog version and per-CVE content hashes."""
+
+    def __init__(self, path: str = KEV_STATE_PATH):
+        super().__init__(path, _SCHEMA)
+
+    @property
+    def catalog_version(self) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'catalog_version'").fetchone()
+        return row[0] if row else None
+
+    def set_catalog_version(self, version: str):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('catalog_version', ?)",
+                (version,)
+            )
+
+    def hashes(self) -> Dict[str, str]:
+        """Content hash of every synced CVE."""
+        with self._lock:
+            return dict(self.conn.execute("SELECT cve, hash FROM entries"))
+
+    def record(self, hashes: Dict[str, str]):
+        """Store the hashes of entries that are now in Supabase."""
+        if not hashes:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entries (cve, hash) VALUES (?, ?)",
+                hashes.items()
+            )
+
+    def clear(self):
+        """Forget all state, forcing the next sync to compare against Supabase."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.execute("DELETE FROM meta")
+
+
+kev_state = KevState()
@@ -0,0 +1,127 @@
+"""
+Local cache of LLM responses.
+
+Responses are keyed by a hash of everything that determines them: the model,
+the system and user prompts and, for function calls and structured output,
+the schema. Re-running a topic after a crash then re-uses the factsheets,
+aggregations and SEO rewrites it already paid for. Caching is opt-in per
+call site (cache=True in gpt_utils), since some prompts are retried on
+purpose to get a different answer. Entries expire after LLM_CACHE_TTL_HOURS
+and the least recently used ones are evicted beyond LLM_CACHE_MAX_MB.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+from cache_config import LLM_CACHE_PATH
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() in ('true', '1', 't')
+LLM_CACHE_TTL_HOURS = float(os.getenv('LLM_CACHE_TTL_HOURS', '168'))
+LLM_CACHE_MAX_MB = float(os.getenv('LLM_CACHE_MAX_MB', '64'))
+
+
+def make_cache_key(model: str, system_prompt: Optional[str], user_prompt: str, schema: Any = None) -> str:
+    """Hash of a request; schema is any JSON-serializable function or output definition."""
+    payload = json.dumps([model, system_prompt, user_prompt, schema], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+class LLMCache(SQLiteStore):
+    """SQLite-backed LLM response cache with TTL and LRU eviction."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_hours: float = LLM_CACHE_TTL_HOURS,
+                 max_mb: float = LLM_CACHE_MAX_MB, enabled: bool = LLM_CACHE_ENABLED):
+        super().__init__(path, _SCHEMA)
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._model_hits: Dict[str, int] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached response for a key, or None."""
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    "SELECT model, response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or time.time() - row[2] > self.ttl:
+                    self.misses += 1
+                    return None
+                with self.conn:
+                    self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self.hits += 1
+                self._model_hits[row[0]] = self._model_hits.get(row[0], 0) + 1
+                return json.loads(row[1])
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry {key}: {e}")
+            return None
+
+    def put(self, key: str, model: str, response: Any):
+        """Store a JSON-serializable response."""
+        if not self.enabled or response is None:
+            return
+        now = time.time()
+        try:
+            data = json.dumps(response)
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model or '', data, len(data.encode('utf-8')), now, now)
+                )
+                self._evict(now)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Failed to write LLM cache entry {key}: {e}")
+
+    def _evict(self, now: float):
+        # Expired entries first, then least recently used until under the size limit
+        self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if excess <= 0:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            excess -= size
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'hits_by_model': dict(self._model_hits),
+        }
+
+
+llm_cache = LLMCache()
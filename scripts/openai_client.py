@@ -0,0 +1,434 @@
+"""
+Shared, rate-limited access to the OpenAI API.
+
+Every chat call from the pipeline goes through one manager that owns the
+sync and async clients, so connections are reused instead of a client being
+built per call. Calls are paced by per-model token buckets for requests and
+tokens per minute, limited to LLM_MAX_CONCURRENCY in flight, and identical
+requests already in flight are coalesced into one. Only errors worth
+retrying (rate limits, timeouts, connection failures, 5xx) are retried, with
+exponential backoff that honours Retry-After. stats() separates the time
+calls spent queued for capacity from the API latency itself.
+
+Per-model limits come from OPENAI_MODEL_LIMITS, a JSON object such as
+{"gpt-4o-mini": {"rpm": 5000, "tpm": 2000000}}; other models use
+OPENAI_RPM_LIMIT and OPENAI_TPM_LIMIT.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+logger = logging.getLogger(__name__)
+
+OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', '500'))
+OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', '200000'))
+OPENAI_MODEL_LIMITS: Dict[str, Dict[str, int]] = json.loads(os.getenv('OPENAI_MODEL_LIMITS', '{}') or '{}')
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '5'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '6'))
+OPENAI_BACKOFF_MAX = float(os.getenv('OPENAI_BACKOFF_MAX', '60'))
+# Completion tokens assumed when a call sets no max_tokens; corrected from the reported usage
+OPENAI_RESPONSE_TOKENS_ESTIMATE = int(os.getenv('OPENAI_RESPONSE_TOKENS_ESTIMATE', '1000'))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+# Result of a coalesced call whose owner was cancelled; its waiters retry
+_OWNER_CANCELLED = object()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an API error is transient and worth another attempt."""
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """Rough token cost of a chat request: ~4 characters per prompt token plus the expected completion."""
+    prompt_chars = sum(len(str(message.get('content') or '')) for message in request.get('messages', []))
+    for key in ('functions', 'tools'):
+        if request.get(key):
+            prompt_chars += len(json.dumps(request[key], default=str))
+    completion = request.get('max_tokens') or request.get('max_completion_tokens') or OPENAI_RESPONSE_TOKENS_ESTIMATE
+    return prompt_chars // 4 + completion
+
+
+def _request_key(kind: str, request: Dict[str, Any]) -> str:
+    payload = json.dumps([kind, request], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RateBucket:
+    """Token bucket refilled continuously at `per_minute`, usable from threads and coroutines."""
+
+    def __init__(self, per_minute: int, clock: Callable[[], float] = time.monotonic):
+        self.per_minute = max(1, per_minute)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._available = float(self.per_minute)
+        self._updated = clock()
+
+    def _take(self, amount: float) -> float:
+        """Take `amount` if available and return 0, otherwise return the seconds to wait."""
+        # A request larger than the bucket waits for a full bucket
+        amount = min(amount, self.per_minute)
+        with self._lock:
+            now = self._clock()
+            self._available = min(self.per_minute, self._available + (now - self._updated) * self.per_minute / 60)
+            self._updated = now
+            if self._available >= amount:
+                self._available -= amount
+                return 0.0
+            return (amount - self._available) * 60 / self.per_minute
+
+    def adjust(self, delta: float):
+        """Charge (positive) or refund (negative) the difference between estimated and actual use."""
+        with self._lock:
+            self._available = min(self.per_minute, self._available - delta)
+
+    async def acquire(self, amount: float):
+        while True:
+            wait = self._take(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, amount: float):
+        while True:
+            wait = self._take(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class ModelMetrics:
+    """Counters for one model."""
+
+    def __init__(self):
+        self.requests = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self.tokens = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, queue_wait: float, latency: float, tokens: int):
+        self.requests += 1
+        self.tokens += tokens
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'retries': self.retries,
+            'failures': self.failures,
+            'tokens': self.tokens,
+            'avg_queue_wait': self.queue_wait_total / self.requests if self.requests else 0.0,
+            'max_queue_wait': self.queue_wait_max,
+            'avg_latency': self.latency_total / self.requests if self.requests else 0.0,
+            'max_latency': self.latency_max,
+        }
+
+
+class OpenAIClientManager:
+    """
+    Owns the OpenAI clients and paces every chat call made through it.
+
+    Use `await manager.chat(model=..., messages=...)` in coroutines and
+    `manager.chat_sync(...)` in blocking code; both share the same limits.
+    `parse`/`parse_sync` do the same for structured-output calls.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = OPENAI_MAX_RETRIES,
+                 rpm_limit: int = OPENAI_RPM_LIMIT, tpm_limit: int = OPENAI_TPM_LIMIT,
+                 model_limits: Optional[Dict[str, Dict[str, int]]] = None,
+                 sync_factory: Optional[Callable[[], Any]] = None,
+                 async_factory: Optional[Callable[[], Any]] = None,
+                 backoff_max: float = OPENAI_BACKOFF_MAX):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.model_limits = OPENAI_MODEL_LIMITS if model_limits is None else model_limits
+        self.backoff_max = backoff_max
+        self._sync_factory = sync_factory
+        self._async_factory = async_factory
+
+        self._lock = threading.Lock()
+        self._sync_client = None
+        self._sync_client_key: Optional[Tuple[Optional[str], Optional[str]]] = None
+        # Async clients and primitives are bound to the event loop they were created on
+        self._async_clients: Dict[asyncio.AbstractEventLoop, Any] = {}
+        self._async_slots: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self._sync_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._buckets: Dict[str, Tuple[RateBucket, RateBucket]] = {}
+        self._inflight: Dict[str, Any] = {}
+        self._metrics: Dict[str, ModelMetrics] = {}
+
+    # Clients
+
+    @property
+    def sync_client(self):
+        """Shared blocking client, rebuilt if the API key in the environment changes."""
+        if self._sync_factory is not None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = self._sync_factory()
+                return self._sync_client
+        key = (os.getenv('OPENAI_API_KEY'), os.getenv('OPENAI_ORGANIZATION'))
+        with self._lock:
+            if self._sync_client is None or self._sync_client_key != key:
+                # Retries are handled here, not by the SDK
+                self._sync_client = OpenAI(api_key=key[0], organization=key[1], max_retries=0)
+                self._sync_client_key = key
+            return self._sync_client
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for stale in [l for l in self._async_clients if l.is_closed()]:
+                del self._async_clients[stale]
+                self._async_slots.pop(stale, None)
+            client = self._async_clients.get(loop)
+            if client is None:
+                if self._async_factory is not None:
+                    client = self._async_factory()
+                else:
+                    client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'),
+                                         organization=os.getenv('OPENAI_ORGANIZATION'), max_retries=0)
+                self._async_clients[loop] = client
+            return client
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._async_slots.get(loop)
+            if semaphore is None:
+                semaphore = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+            return semaphore
+
+    # Limits and metrics
+
+    def _limits_for(self, model: str) -> Dict[str, int]:
+        limits = self.model_limits.get(model)
+        if limits is None:
+            # Dated snapshots (gpt-4o-mini-2024-07-18) share their base model's limits
+            for name in sorted(self.model_limits, key=len, reverse=True):
+                if model.startswith(f"{name}-"):
+                    limits = self.model_limits[name]
+                    break
+        limits = limits or {}
+        return {'rpm': limits.get('rpm', self.rpm_limit), 'tpm': limits.get('tpm', self.tpm_limit)}
+
+    def _buckets_for(self, model: str) -> Tuple[RateBucket, RateBucket]:
+        with self._lock:
+            buckets = self._buckets.get(model)
+            if buckets is None:
+                limits = self._limits_for(model)
+                buckets = self._buckets[model] = (RateBucket(limits['rpm']), RateBucket(limits['tpm']))
+            return buckets
+
+    def _metrics_for(self, model: str) -> ModelMetrics:
+        with self._lock:
+            return self._metrics.setdefault(model, ModelMetrics())
+
+    def _settle(self, model: str, estimate: int, response) -> int:
+        usage = getattr(response, 'usage', None)
+        used = getattr(usage, 'total_tokens', None) if usage is not None else None
+        if not isinstance(used, int):
+            return estimate
+        self._buckets_for(model)[1].adjust(used - estimate)
+        return used
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return min(self.backoff_max, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {model: metrics.as_dict() for model, metrics in self._metrics.items()}
+
+    # Async calls
+
+    async def _call(self, kind: str, request: Dict[str, Any]):
+        model = request.get('model') or ''
+        metrics = self._metrics_for(model)
+        rpm, tpm = self._buckets_for(model)
+        estimate = estimate_tokens(request)
+        queued = time.monotonic()
+        async with self._async_semaphore():
+            await rpm.acquire(1)
+            await tpm.acquire(estimate)
+            started = time.monotonic()
+            client = self.async_client()
+            create = client.beta.chat.completions.parse if kind == 'parse' else client.chat.completions.create
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await create(**request)
+                    break
+                except Exception as e:
+                    if not is_retryable(e) or attempt == self.max_retries:
+                        metrics.failures += 1
+                        raise
+                    metrics.retries += 1
+                    delay = self._backoff(attempt, e)
+                    logger.warning(f"Retrying {model} call in {delay:.1f}s after {type(e).__name__}: {e}")
+                    await asyncio.sleep(delay)
+                    await rpm.acquire(1)
+        metrics.record(started - queued, time.monotonic() - started, self._settle(model, estimate, response))
+        return response
+
+    async def _coalesced(self, kind: str, request: Dict[str, Any]):
+        key = _request_key(kind, request)
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                pending = self._inflight.get(key)
+                owner = pending is None or pending[0] is not loop
+                if owner:
+                    future = loop.create_future()
+                    self._inflight[key] = (loop, future)
+            if owner:
+                break
+            self._metrics_for(request.get('model') or '').coalesced += 1
+            # A CancelledError here always means this caller was cancelled
+            response = await asyncio.shield(pending[1])
+            if response is _OWNER_CANCELLED:
+                # The call's owner was cancelled, not this caller: make the call ourselves
+                continue
+            return response
+        try:
+            response = await self._call(kind, request)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                # Waiters can't tell a cancelled shared future from their own
+                # cancellation before Python 3.11, so tell them explicitly
+                future.set_result(_OWNER_CANCELLED)
+            else:
+                future.set_exception(e)
+                # Nobody else may be waiting; don't warn about an unretrieved exception
+                future.exception()
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                if self._inflight.get(key, (None, None))[1] is future:
+                    del self._inflight[key]
+
+    async def chat(self, **request):
+        """Rate-limited `chat.completions.create`; identical concurrent requests share one call."""
+        return await self._coalesced('chat', request)
+
+    async def parse(self, **request):
+        """Rate-limited `beta.chat.completions.parse` for structured output."""
+        return await self._coalesced('parse', request)
+
+    # Blocking calls
+
+    def _call_sync(self, kind: str, request: Dict[str, Any]):
+        model = request.get('model') or ''
+        metrics = self._metrics_for(model)
+        rpm, tpm = self._buckets_for(model)
+        estimate = estimate_tokens(request)
+        queued = time.monotonic()
+        with self._sync_slots:
+            rpm.acquire_sync(1)
+            tpm.acquire_sync(estimate)
+            started = time.monotonic()
+            client = self.sync_client
+            create = client.beta.chat.completions.parse if kind == 'parse' else client.chat.completions.create
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = create(**request)
+                    break
+                except Exception as e:
+                    if not is_retryable(e) or attempt == self.max_retries:
+                        metrics.failures += 1
+                        raise
+                    metrics.retries += 1
+                    delay = self._backoff(attempt, e)
+                    logger.warning(f"Retrying {model} call in {delay:.1f}s after {type(e).__name__}: {e}")
+                    time.sleep(delay)
+                    rpm.acquire_sync(1)
+        metrics.record(started - queued, time.monotonic() - started, self._settle(model, estimate, response))
+        return response
+
+    def _coalesced_sync(self, kind: str, request: Dict[str, Any]):
+        key = _request_key(f"sync-{kind}", request)
+        with self._lock:
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._inflight[key] = (None, future)
+        if not owner:
+            self._metrics_for(request.get('model') or '').coalesced += 1
+            return pending[1].result()
+        try:
+            response = self._call_sync(kind, request)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def chat_sync(self, **request):
+        """Blocking counterpart of chat()."""
+        return self._coalesced_sync('chat', request)
+
+    def parse_sync(self, **request):
+        """Blocking counterpart of parse()."""
+        return self._coalesced_sync('parse', request)
+
+    async def run_in_thread(self, func: Callable[..., Any], *args, **kwargs):
+        """Run a blocking helper built on chat_sync (e.g. gpt_utils.query_gpt) without blocking the event loop."""
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def aclose(self):
+        """Close the async client of the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.pop(loop, None)
+            self._async_slots.pop(loop, None)
+        if client is not None and hasattr(client, 'close'):
+            await client.close()
+
+
+openai_manager = OpenAIClientManager()
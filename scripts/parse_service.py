@@ -0,0 +1,71 @@
+"""
+Executor-backed service for CPU-bound parsing.
+
+HTML cleaning, PDF text extraction and readability scoring are pure CPU work;
+run inline they block the event loop and stall every other scrape and API
+call in flight. Coroutines submit that work here instead and await the
+result from a process pool sized to the machine's cores.
+
+PARSE_EXECUTOR selects the backend: 'process' (default), 'thread', or 'sync'
+to run inline, e.g. in tests. Submitted functions and their arguments must be
+picklable for the process backend, so pass module-level functions.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+PARSE_EXECUTOR = os.getenv('PARSE_EXECUTOR', 'process').lower()
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', os.cpu_count() or 1))
+
+
+class ParsingService:
+    """Run CPU-bound functions off the event loop."""
+
+    def __init__(self, workers: int = PARSE_WORKERS, mode: str = PARSE_EXECUTOR):
+        self.workers = max(1, workers)
+        self.mode = mode
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == 'thread':
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='parse')
+                else:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _discard_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the pool and return its result."""
+        if self.mode == 'sync':
+            return func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        call = partial(func, *args, **kwargs)
+        try:
+            return await loop.run_in_executor(self._get_executor(), call)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); retry once in a fresh pool
+            logger.warning(f"Parsing pool broke while running {getattr(func, '__name__', func)}, restarting it")
+            self._discard_executor()
+            return await loop.run_in_executor(self._get_executor(), call)
+
+    def shutdown(self):
+        self._discard_executor()
+
+
+parsing_service = ParsingService()
@@ -0,0 +1,166 @@
+"""
+Staged asyncio pipeline for processing several topics at once.
+
+Each stage owns a bounded queue and a pool of worker tasks, so a slow stage
+(e.g. LLM synthesis) applies back-pressure to the stage before it while the
+other stages keep working on the next topics.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Marker telling a worker that its stage has no more input
+_STOP = object()
+
+
+class PipelineStage:
+    """A single pipeline stage with its own worker pool and run statistics."""
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Any]], workers: int = 1, queue_size: int = 10):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+
+        # Run statistics
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def record_queue_depth(self, depth: int):
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._depth_total += depth
+        self._depth_samples += 1
+
+    @property
+    def average_queue_depth(self) -> float:
+        return self._depth_total / self._depth_samples if self._depth_samples else 0.0
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Items completed per minute while the stage was active."""
+        return self.processed / self.elapsed * 60 if self.elapsed else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Fraction of the available worker time spent inside the handler."""
+        capacity = self.elapsed * self.workers
+        return self.busy_time / capacity if capacity else 0.0
+
+
+class TopicPipeline:
+    """
+    Run items through a chain of async stages concurrently.
+
+    A handler receives the output of the previous stage. Returning None drops
+    the item (e.g. a topic without sources), raising counts it as failed; in
+    both cases the item does not reach later stages.
+    """
+
+    def __init__(self):
+        self.stages: List[PipelineStage] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def add_stage(self, name: str, handler: Callable[[Any], Awaitable[Any]], workers: int = 1, queue_size: int = 10) -> "TopicPipeline":
+        self.stages.append(PipelineStage(name, handler, workers, queue_size))
+        return self
+
+    async def _put(self, queue: asyncio.Queue, stage: PipelineStage, item):
+        await queue.put(item)
+        stage.record_queue_depth(queue.qsize())
+
+    async def _worker(self, index: int, queues: List[asyncio.Queue], results: list):
+        stage = self.stages[index]
+        inbox = queues[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            item = await inbox.get()
+            if item is _STOP:
+                break
+
+            start = time.monotonic()
+            try:
+                output = await stage.handler(item)
+            except Exception as e:
+                stage.failed += 1
+                logger.error(f"Pipeline stage '{stage.name}' failed: {e.__class__.__name__}: {e}")
+                continue
+            finally:
+                stage.busy_time += time.monotonic() - start
+
+            if output is None:
+                stage.dropped += 1
+                continue
+
+            stage.processed += 1
+            if next_stage is not None:
+                await self._put(queues[index + 1], next_stage, output)
+            else:
+                results.append(output)
+
+    async def run(self, items: Iterable[Any]) -> list:
+        """Feed items through every stage and return the outputs of the last one."""
+        if not self.stages:
+            return list(items)
+
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results: list = []
+        self.started_at = time.monotonic()
+
+        workers = []
+        for index, stage in enumerate(self.stages):
+            stage.started_at = self.started_at
+            workers.append([
+                asyncio.create_task(self._worker(index, queues, results))
+                for _ in range(stage.workers)
+            ])
+
+        try:
+            for item in items:
+                await self._put(queues[0], self.stages[0], item)
+
+            # Shut the stages down in order so every item drains downstream
+            for index, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    await queues[index].put(_STOP)
+                await asyncio.gather(*workers[index])
+                stage.finished_at = time.monotonic()
+        finally:
+            for task in (task for stage_tasks in workers for task in stage_tasks):
+                if not task.done():
+                    task.cancel()
+
+        self.finished_at = time.monotonic()
+        return results
+
+    def report(self) -> str:
+        """Per-stage throughput and queue depth summary for the last run."""
+        total = (self.finished_at or 0.0) - (self.started_at or 0.0)
+        lines = [
+            f"Pipeline finished in {total:.2f} seconds",
+            f"{'stage':<12}{'workers':>8}{'done':>6}{'dropped':>9}{'failed':>8}{'per min':>9}{'busy':>7}{'max q':>7}{'avg q':>7}",
+        ]
+        for stage in self.stages:
+            lines.append(
+                f"{stage.name:<12}{stage.workers:>8}{stage.processed:>6}{stage.dropped:>9}{stage.failed:>8}"
+                f"{stage.throughput:>9.2f}{stage.utilization:>7.0%}{stage.max_queue_depth:>7}{stage.average_queue_depth:>7.1f}"
+            )
+        return "\n".join(lines)
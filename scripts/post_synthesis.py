@@ -323,7 +323,7 @@ def post_completion(post_info, functions):
     instructions = "With this information, complete all of the missing fields in the JSON object (or optimize any that could be better for SEO) using the WordPressPostFieldCompletion function."
     json_str = json.dumps(post_info)
     model = os.getenv('FUNCTION_CALL_MODEL')
-    response = function_call_gpt(json_str, instructions, model, functions)
+    response = function_call_gpt(json_str, instructions, model, functions, cache=True)
     
     # Parse the response and update post_info
     if isinstance(response, dict):
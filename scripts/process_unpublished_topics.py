@@ -1,5 +1,5 @@
 import asyncio
-from supabase_utils import get_topics_without_posts, store_post_info
+from supabase_utils import stream_topics_without_posts, store_post_info
 from wp_utils import fetch_categories, fetch_tags
 from post_synthesis import post_synthesis
 from source_fetcher import gather_sources
@@ -7,16 +7,11 @@ from scripts.supabase_utils import supabase
 
 async def process_unpublished_topics():
     """Process all topics that don't have associated posts."""
-    # Get topics without posts
-    topics = get_topics_without_posts()
-    print(f"\nFound {len(topics)} topics without posts")
-    
-    if not topics:
-        print("No topics to process")
-        return
-        
-    # Process each topic
-    for topic in topics:
+    # Stream topics without posts; paging by id means topics that get a post
+    # while we work don't shift the pages still to come
+    processed = 0
+    async for topic in stream_topics_without_posts():
+        processed += 1
         print(f"\nProcessing topic: {topic['name']} (ID: {topic['id']})...")
         
         try:
@@ -51,5 +46,10 @@ async def process_unpublished_topics():
             print(f"Error processing topic {topic['id']}: {e}")
             continue
 
+    if not processed:
+        print("No topics to process")
+        return
+    print(f"\nProcessed {processed} topics without posts")
+
 if __name__ == "__main__":
     asyncio.run(process_unpublished_topics()) 
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Token-budget packing of facts for aggregation prompts.
+
+Source factsheets about the same topic repeat each other heavily, and raw
+source content can be far larger than the model's context window. The packer
+splits the input into individual facts, merges duplicates and near-duplicates,
+ranks what is left and keeps the best facts that fit the token budget of the
+target model, in their original order.
+"""
+
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+from gpt_utils import count_tokens_batch
+
+logger = logging.getLogger(__name__)
+
+# Context windows of the models used for aggregation
+MODEL_CONTEXT_TOKENS: Dict[str, int] = {
+    'gpt-3.5-turbo': 4096,
+    'gpt-3.5-turbo-16k': 16384,
+    'gpt-4': 8192,
+    'gpt-4-1106-preview': 128000,
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+# Tokens kept free for the model's answer
+AGGREGATION_RESPONSE_TOKENS = int(os.getenv('AGGREGATION_RESPONSE_TOKENS', '2000'))
+# Optional hard cap on the facts sent per aggregation, whatever the model
+AGGREGATION_TOKEN_BUDGET = int(os.getenv('AGGREGATION_TOKEN_BUDGET', '0'))
+# Word overlap above which two facts count as the same fact
+NEAR_DUPLICATE_SIMILARITY = 0.8
+
+_BULLET = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s*')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(])')
+_WORD = re.compile(r'[a-z0-9]+(?:[-.][a-z0-9]+)*')
+_CVE = re.compile(r'CVE-\d{4}-\d{4,}', re.I)
+_NUMBER = re.compile(r'\d')
+_LETTER = re.compile(r'[A-Za-z]')
+
+# Shorter fragments are dropped unless they carry a figure or identifier
+MIN_FACT_LENGTH = 20
+
+
+def context_tokens(model: str) -> int:
+    """Context window of a model, matching dated variants by prefix (e.g. gpt-4o-mini-2024-07-18)."""
+    for name in sorted(MODEL_CONTEXT_TOKENS, key=len, reverse=True):
+        if model == name or model.startswith(f"{name}-"):
+            return MODEL_CONTEXT_TOKENS[name]
+    return DEFAULT_CONTEXT_TOKENS
+
+
+def prompt_budget(model: str, fixed_tokens: int = 0) -> int:
+    """Tokens left for packed facts once the rest of the prompt and the answer are accounted for."""
+    budget = context_tokens(model) - AGGREGATION_RESPONSE_TOKENS - fixed_tokens
+    if AGGREGATION_TOKEN_BUDGET:
+        budget = min(budget, AGGREGATION_TOKEN_BUDGET)
+    return max(budget, 0)
+
+
+def _is_fact(sentence: str) -> bool:
+    if len(sentence) >= MIN_FACT_LENGTH:
+        return True
+    # Short facts such as "CVSS 9.1 critical." are often the key ones
+    return bool(_NUMBER.search(sentence) and _LETTER.search(sentence))
+
+
+def split_facts(text: str) -> List[str]:
+    """Split a factsheet or article into individual facts: bullet lines, then sentences."""
+    facts = []
+    for line in text.splitlines():
+        line = _BULLET.sub('', line).strip()
+        if not line:
+            continue
+        for sentence in _SENTENCE_END.split(line):
+            sentence = sentence.strip()
+            if _is_fact(sentence):
+                facts.append(sentence)
+    return facts
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(_WORD.findall(text.lower()))
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Fact:
+    __slots__ = ('text', 'words', 'position', 'support', 'score')
+
+    def __init__(self, text: str, words: frozenset, position: int):
+        self.text = text
+        self.words = words
+        self.position = position
+        self.support = 1
+        self.score = 0.0
+
+
+def dedupe_facts(facts: Iterable[str]) -> List[_Fact]:
+    """Merge identical and near-identical facts, counting how often each was stated."""
+    kept: List[_Fact] = []
+    by_words: Dict[frozenset, _Fact] = {}
+    for position, text in enumerate(facts):
+        words = _words(text)
+        if not words:
+            continue
+        match = by_words.get(words)
+        if match is None:
+            match = next((fact for fact in kept if _similarity(fact.words, words) >= NEAR_DUPLICATE_SIMILARITY), None)
+        if match is not None:
+            match.support += 1
+            # Keep the most detailed wording
+            if len(text) > len(match.text):
+                match.text = text
+            continue
+        fact = _Fact(text, words, position)
+        kept.append(fact)
+        by_words[words] = fact
+    return kept
+
+
+def _score(fact: _Fact, topic_words: frozenset) -> float:
+    score = float(fact.support)
+    if topic_words:
+        score += 2 * len(fact.words & topic_words) / len(topic_words)
+    # Identifiers and figures are what a writer can't reconstruct later
+    score += len(_CVE.findall(fact.text))
+    if _NUMBER.search(fact.text):
+        score += 0.5
+    return score
+
+
+def pack_facts(texts: Iterable[str], budget_tokens: int, topic_name: Optional[str] = None,
+               model: str = 'gpt-4') -> str:
+    """
+    Select the best facts from factsheets or source texts within a token budget.
+
+    Args:
+        texts: Factsheets or source content, most authoritative first
+        budget_tokens: Maximum tokens of the packed facts
+        topic_name: Facts mentioning the topic's words rank higher
+        model: Model whose tokenizer counts the budget
+
+    Returns:
+        str: The kept facts, one per line, in their original order
+    """
+    facts = dedupe_facts(fact for text in texts if text for fact in split_facts(str(text)))
+    if not facts:
+        return ""
+    topic_words = _words(topic_name or '')
+    for fact in facts:
+        fact.score = _score(fact, topic_words)
+
+    # Each fact costs its own tokens plus the newline joining it
+    costs = count_tokens_batch([fact.text for fact in facts], model)
+    selected, used = [], 0
+    for fact, cost in sorted(zip(facts, costs), key=lambda pair: (-pair[0].score, pair[0].position)):
+        if used + cost + 1 > budget_tokens:
+            continue
+        selected.append(fact)
+        used += cost + 1
+
+    dropped = len(facts) - len(selected)
+    if dropped:
+        logger.info(f"Packed {len(selected)} of {len(facts)} facts into {used}/{budget_tokens} tokens")
+    return '\n'.join(fact.text for fact in sorted(selected, key=lambda fact: fact.position))
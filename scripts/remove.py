@@ -91,7 +91,7 @@ async def delete_topic_and_related(topic_id):
     
     # First delete related sources
     try:
-        sources = supabase.table("sources").select("*").eq("topic_id", topic_id).execute()
+        sources = supabase.table("sources").select("id").eq("topic_id", topic_id).execute()
         if sources.data:
             print(f"Found {len(sources.data)} related sources")
             supabase.table("sources").delete().eq("topic_id", topic_id).execute()
@@ -101,7 +101,7 @@ async def delete_topic_and_related(topic_id):
     
     # Then delete the topic itself
     try:
-        topic = supabase.table("topics").select("*").eq("id", topic_id).execute()
+        topic = supabase.table("topics").select("id").eq("id", topic_id).execute()
         if topic.data:
             supabase.table("topics").delete().eq("id", topic_id).execute()
             print(f"Deleted topic {topic_id}")
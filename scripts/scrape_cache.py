@@ -0,0 +1,212 @@
+"""
+Local cache of scraped pages shared by every fetch path.
+
+Entries map a URL (and the kind of extraction that produced them) to the
+cleaned text, optionally the raw HTML, and fetch metadata. Every scraper stores
+a page's readable text under the same kind, ARTICLE_TEXT, so a page fetched by
+one path is a hit for all the others. Bodies are stored zlib-compressed and
+content-addressed, so identical pages reached through different URLs are kept
+once. Entries expire after SCRAPE_CACHE_TTL_HOURS and, once the cache grows
+beyond SCRAPE_CACHE_MAX_MB, expired and least recently used entries are
+evicted until it is back under EVICT_TO of the limit.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, Optional
+from cache_config import SCRAPE_CACHE_PATH
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_CACHE_ENABLED = os.getenv('SCRAPE_CACHE_ENABLED', 'true').lower() in ('true', '1', 't')
+SCRAPE_CACHE_TTL_HOURS = float(os.getenv('SCRAPE_CACHE_TTL_HOURS', '24'))
+SCRAPE_CACHE_MAX_MB = float(os.getenv('SCRAPE_CACHE_MAX_MB', '256'))
+
+# Kind of the readable text of a page, shared by every scraper
+ARTICLE_TEXT = 'text'
+# Eviction frees space down to this fraction of the limit, so a full cache
+# isn't swept again on the very next write
+EVICT_TO = 0.9
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    html_hash TEXT,
+    metadata TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (url, kind)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_text_hash ON entries (text_hash);
+CREATE INDEX IF NOT EXISTS entries_html_hash ON entries (html_hash);
+"""
+
+
+class ScrapeCache(SQLiteStore):
+    """SQLite-backed scrape cache with TTL and LRU eviction."""
+
+    def __init__(self, path: str = SCRAPE_CACHE_PATH, ttl_hours: float = SCRAPE_CACHE_TTL_HOURS,
+                 max_mb: float = SCRAPE_CACHE_MAX_MB, enabled: bool = SCRAPE_CACHE_ENABLED):
+        super().__init__(path, _SCHEMA)
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        # Compressed size of all blobs, read once and then kept up to date
+        self._total: Optional[int] = None
+
+    def _total_size(self) -> int:
+        if self._total is None:
+            self._total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        return self._total
+
+    def _put_blob(self, value: str) -> str:
+        data = value.encode('utf-8')
+        key = _hash(data)
+        compressed = zlib.compress(data, 6)
+        total = self._total_size()
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO blobs (hash, data, size) VALUES (?, ?, ?)",
+            (key, compressed, len(compressed))
+        )
+        if cursor.rowcount > 0:
+            self._total = total + len(compressed)
+        return key
+
+    def _get_blob(self, key: Optional[str]) -> Optional[str]:
+        if not key:
+            return None
+        row = self.conn.execute("SELECT data FROM blobs WHERE hash = ?", (key,)).fetchone()
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    def get(self, url: str, kind: str = ARTICLE_TEXT) -> Optional[Dict[str, Any]]:
+        """
+        Return a fresh cached scrape of a URL, or None.
+
+        Returns:
+            Dict with 'text', 'html' (or None), 'metadata' and 'fetched_at'
+        """
+        if not self.enabled or not url:
+            return None
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    "SELECT text_hash, html_hash, metadata, fetched_at FROM entries WHERE url = ? AND kind = ?",
+                    (url, kind)
+                ).fetchone()
+                if row is None or time.time() - row[3] > self.ttl:
+                    self.misses += 1
+                    return None
+                text = self._get_blob(row[0])
+                if text is None:
+                    self.misses += 1
+                    return None
+                with self.conn:
+                    self.conn.execute(
+                        "UPDATE entries SET accessed_at = ? WHERE url = ? AND kind = ?",
+                        (time.time(), url, kind)
+                    )
+                self.hits += 1
+                return {
+                    'text': text,
+                    'html': self._get_blob(row[1]),
+                    'metadata': json.loads(row[2]) if row[2] else {},
+                    'fetched_at': row[3],
+                }
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            logger.warning(f"Ignoring unreadable scrape cache entry for {url}: {e}")
+            return None
+
+    def put(self, url: str, text: str, kind: str = ARTICLE_TEXT, html: Optional[str] = None,
+            metadata: Optional[Dict[str, Any]] = None):
+        """Store the result of scraping a URL."""
+        if not self.enabled or not url or not text:
+            return
+        now = time.time()
+        try:
+            with self._lock, self.conn:
+                text_hash = self._put_blob(text)
+                html_hash = self._put_blob(html) if html else None
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO entries (url, kind, text_hash, html_hash, metadata, fetched_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, kind, text_hash, html_hash, json.dumps(metadata or {}), now, now)
+                )
+                if self._total > self.max_bytes:
+                    self._evict(now)
+        except sqlite3.Error as e:
+            # The transaction was rolled back, so the running total may be off
+            self._total = None
+            logger.warning(f"Failed to write scrape cache entry for {url}: {e}")
+
+    def _evict(self, now: float):
+        # Expired entries and the blobs nothing refers to any more first, then
+        # least recently used entries until under the low-water mark
+        self.conn.execute("DELETE FROM entries WHERE fetched_at < ?", (now - self.ttl,))
+        self._drop_orphans()
+        target = int(self.max_bytes * EVICT_TO)
+        while self._total > target:
+            oldest = self.conn.execute(
+                "SELECT url, kind, text_hash, html_hash FROM entries ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if oldest is None:
+                break
+            url, kind, *hashes = oldest
+            self.conn.execute("DELETE FROM entries WHERE url = ? AND kind = ?", (url, kind))
+            for key in filter(None, hashes):
+                if self.conn.execute(
+                    "SELECT 1 FROM entries WHERE text_hash = ? OR html_hash = ? LIMIT 1", (key, key)
+                ).fetchone() is None:
+                    row = self.conn.execute("SELECT size FROM blobs WHERE hash = ?", (key,)).fetchone()
+                    self.conn.execute("DELETE FROM blobs WHERE hash = ?", (key,))
+                    self._total -= row[0] if row else 0
+
+    def _drop_orphans(self):
+        self.conn.execute("""
+            DELETE FROM blobs WHERE hash NOT IN (
+                SELECT text_hash FROM entries
+                UNION SELECT html_hash FROM entries WHERE html_hash IS NOT NULL
+            )
+        """)
+        self._total = None
+        self._total_size()
+
+    def invalidate(self, url: str):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._drop_orphans()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        super().close()
+        self._total = None
+
+
+scrape_cache = ScrapeCache()
@@ -0,0 +1,116 @@
+"""
+Per-domain statistics for choosing a scraping method.
+
+Records whether each method (direct request, proxies, browser) succeeded for
+a domain and how long it took, and ranks the methods by expected cost so the
+cheapest one that historically works is tried first.
+"""
+
+import logging
+import sqlite3
+import time
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+from cache_config import SCRAPE_STATS_PATH
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Relative cost of one attempt, roughly in seconds of work. Unknown domains
+# are tried in this order.
+METHOD_COSTS = {
+    'direct': 1.0,
+    'datacenter': 2.0,
+    'residential': 3.0,
+    'browser': 8.0,
+}
+
+
+def domain_of(url: str) -> str:
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS method_stats (
+    domain TEXT NOT NULL,
+    method TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    total_latency REAL NOT NULL DEFAULT 0,
+    updated_at REAL,
+    PRIMARY KEY (domain, method)
+)
+"""
+
+
+class ScrapeStrategyStats(SQLiteStore):
+    """SQLite-backed success and latency counters per (domain, method)."""
+
+    def __init__(self, path: str = SCRAPE_STATS_PATH):
+        super().__init__(path, _SCHEMA)
+
+    def record(self, url: str, method: str, success: bool, latency: float):
+        """Record the outcome of one scraping attempt."""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute("""
+                    INSERT INTO method_stats (domain, method, attempts, successes, total_latency, updated_at)
+                    VALUES (?, ?, 1, ?, ?, ?)
+                    ON CONFLICT (domain, method) DO UPDATE SET
+                        attempts = attempts + 1,
+                        successes = successes + excluded.successes,
+                        total_latency = total_latency + excluded.total_latency,
+                        updated_at = excluded.updated_at
+                """, (domain_of(url), method, int(success), latency, time.time()))
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to record scrape stats for {url}: {e}")
+
+    def get(self, url: str) -> Dict[str, Dict[str, float]]:
+        """Stats per method for the domain of a URL."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT method, attempts, successes, total_latency FROM method_stats WHERE domain = ?",
+                (domain_of(url),)
+            ).fetchall()
+        return {
+            method: {'attempts': attempts, 'successes': successes, 'total_latency': total_latency}
+            for method, attempts, successes, total_latency in rows
+        }
+
+    def expected_cost(self, method: str, stats: Optional[Dict[str, float]]) -> float:
+        """
+        Expected cost of getting content with a method: the cost of one attempt
+        divided by its (smoothed) success rate.
+        """
+        base = METHOD_COSTS.get(method, max(METHOD_COSTS.values()))
+        if not stats or not stats['attempts']:
+            return base
+        success_rate = (stats['successes'] + 1) / (stats['attempts'] + 2)
+        latency = stats['total_latency'] / stats['attempts']
+        return (base + latency) / success_rate
+
+    def rank(self, url: str, methods: Sequence[str]) -> List[str]:
+        """Order methods for the domain of a URL, cheapest successful method first."""
+        try:
+            stats = self.get(url)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read scrape stats for {url}: {e}")
+            stats = {}
+
+        def key(method):
+            method_stats = stats.get(method)
+            # Methods that have worked on this domain come first, then untried
+            # ones, then methods that have only ever failed
+            if method_stats and method_stats['successes']:
+                tier = 0
+            elif not method_stats or not method_stats['attempts']:
+                tier = 1
+            else:
+                tier = 2
+            return tier, self.expected_cost(method, method_stats)
+
+        return sorted(methods, key=key)
+
+
+scrape_strategy_stats = ScrapeStrategyStats()
@@ -4,15 +4,22 @@ from dotenv import load_dotenv
 from datetime import datetime
 import logging
 from supabase_utils import supabase
+from http_clients import get_client
 import re
 import json
 import asyncio
-from gpt_utils import query_gpt, function_call_gpt, tokenizer, source_remover_function, generate_factsheet_user_prompt
+import math
+from gpt_utils import (
+    query_gpt, function_call_gpt, tokenizer, source_remover_function, generate_factsheet_user_prompt,
+    get_encoding, truncate_to_tokens
+)
+from openai_client import openai_manager
+from supabase_batch import BatchWriter
+from supabase_query import Query, SOURCES
+from prompt_packer import pack_facts, prompt_budget
 import prompts
 from google_cse import fetch_sources_from_google_cse
 from enum import Enum
-from openai import OpenAI
-import tiktoken
 from thn_scraper import scrape_thn_article
 from enhanced_scraper import EnhancedScraper
 
@@ -21,6 +28,17 @@ load_dotenv()
 
 bing_api_key = os.getenv('BING_SEARCH_KEY')
 summarization_model = os.getenv('SUMMARIZATION_MODEL', 'gpt-4o-mini-2024-07-18')
+# Content above this many tokens is summarized in chunks (map) and then merged (reduce)
+FACTSHEET_MAX_TOKENS = int(os.getenv('FACTSHEET_MAX_TOKENS', 14000))
+FACTSHEET_CHUNK_TOKENS = int(os.getenv('FACTSHEET_CHUNK_TOKENS', 6000))
+# Model merging the source factsheets of a topic
+AGGREGATION_MODEL = os.getenv('AGGREGATION_MODEL', 'gpt-3.5-turbo-16k')
+
+FACTSHEET_INSTRUCTIONS = (
+    "Create a factsheet with new or distinct information from this article that isn't covered in the previous facts. "
+    "Focus on technical details, impact, and actionable information. "
+    "If this is a CVE, include the CVE ID, CVSS score, affected systems, and mitigation steps if available."
+)
 
 class SourceFetchStrategy(Enum):
     BING = "bing"
@@ -28,6 +46,10 @@ class SourceFetchStrategy(Enum):
 
 DEFAULT_FETCH_STRATEGY = os.getenv('DEFAULT_SOURCE_FETCH_STRATEGY', SourceFetchStrategy.BING.value)
 
+# Scrape additional source candidates concurrently instead of one at a time
+PARALLEL_SOURCE_SCRAPING = os.getenv('PARALLEL_SOURCE_SCRAPING', 'true').lower() in ('true', '1', 't')
+SOURCE_SCRAPE_CONCURRENCY = int(os.getenv('SOURCE_SCRAPE_CONCURRENCY', 3))
+
 # NEW HELPER METHOD:
 # -----------------------------------------------------------------
 # This method fetches and merges all previous facts for the same topic,
@@ -48,6 +70,64 @@ def gather_existing_facts_for_topic(topic_id):
             combined_facts.append(factsheet_text)
     return "\n".join(combined_facts)
 
+def split_by_token_offsets(encoding, token_ids, chunk_tokens):
+    """
+    Split already-encoded text into chunks of at most `chunk_tokens` tokens.
+
+    Chunks are cut at token offsets, moved back to the end of a sentence when
+    one falls in the last fifth of the chunk.
+    """
+    text, offsets = encoding.decode_with_offsets(token_ids)
+    chunks = []
+    start = 0
+    while start < len(token_ids):
+        end = min(start + chunk_tokens, len(token_ids))
+        if end < len(token_ids):
+            floor = start + chunk_tokens * 4 // 5
+            for i in range(end, floor, -1):
+                if text[offsets[i] - 1] in '.!?':
+                    end = i
+                    break
+        chunk = text[offsets[start]:offsets[end] if end < len(token_ids) else len(text)].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end
+    return chunks
+
+async def map_reduce_factsheet(chunks, topic_name, existing_facts, system_prompt):
+    """
+    Summarize long content: extract facts from every chunk concurrently, then
+    merge them into one factsheet against the previous facts.
+    """
+    async def map_chunk(i, chunk):
+        chunk_prompt = (
+            f"Article Title: {topic_name}\n\n"
+            f"Part {i + 1} of {len(chunks)} of the article:\n{chunk}\n\n"
+            f"List every fact in this part of the article. "
+            f"Focus on technical details, impact, affected systems, CVE IDs, CVSS scores and mitigations."
+        )
+        return await openai_manager.run_in_thread(
+            query_gpt, chunk_prompt, system_prompt, model=summarization_model, cache=True
+        )
+
+    partial_facts = await asyncio.gather(*(map_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+    partial_facts = [facts for facts in partial_facts if facts]
+    if not partial_facts:
+        return None
+    if len(partial_facts) == 1:
+        return partial_facts[0]
+
+    combined = "\n\n".join(partial_facts)
+    reduce_prompt = (
+        f"Article Title: {topic_name}\n\n"
+        f"Previous Facts:\n{existing_facts}\n\n"
+        f"Facts extracted from {len(partial_facts)} parts of the article:\n{combined}\n\n"
+        f"Merge these into a single factsheet without repeating facts. {FACTSHEET_INSTRUCTIONS}"
+    )
+    return await openai_manager.run_in_thread(
+        query_gpt, reduce_prompt, system_prompt, model=summarization_model, cache=True
+    )
+
 # CHANGED create_factsheet (targeted edits only):
 # -----------------------------------------------------------------
 async def create_factsheet(source, topic_name):
@@ -60,8 +140,9 @@ async def create_factsheet(source, topic_name):
         
     # Then check if any other source with the same URL has a factsheet
     try:
-        response = supabase.table('sources').select('*').eq('url', source['url']).execute()
-        existing_sources = response.data
+        existing_sources = await asyncio.to_thread(
+            lambda: Query(supabase, SOURCES, 'id', 'factsheet').eq('url', source['url']).not_null('factsheet').limit(1).all()
+        )
         
         if existing_sources:
             for existing_source in existing_sources:
@@ -83,9 +164,6 @@ async def create_factsheet(source, topic_name):
         print(f"Error checking for existing sources: {e}")
     
     try:
-        # Initialize OpenAI client
-        client = OpenAI()
-        
         # Prepare the prompts
         system_prompt = """You are an expert at extracting and summarizing key information from cybersecurity articles.
         Create a comprehensive factsheet that includes:
@@ -97,10 +175,11 @@ async def create_factsheet(source, topic_name):
         Format the output as a clear, bulleted list."""
         
         # Get existing facts if any
-        existing_facts = gather_existing_facts_for_topic(source['topic_id'])
+        existing_facts = await asyncio.to_thread(gather_existing_facts_for_topic, source['topic_id'])
         
         # Clean and prepare content
-        content = source.get('content', '')
+        # Sources read without their content fetch it here
+        content = await asyncio.to_thread(source.get, 'content', '')
         if not content:
             print(f"Warning: No content found for source {source.get('id')}")
             return None
@@ -109,70 +188,28 @@ async def create_factsheet(source, topic_name):
         content = re.sub(r'\s+', ' ', content)
         content = re.sub(r'\n\s*\n', '\n\n', content)
         
-        user_prompt = (
-            f"Article Title: {topic_name}\n\n"
-            f"Previous Facts:\n{existing_facts}\n\n"
-            f"New Article Content:\n{content}\n\n"
-            f"Create a factsheet with new or distinct information from this article that isn't covered in the previous facts. "
-            f"Focus on technical details, impact, and actionable information. "
-            f"If this is a CVE, include the CVE ID, CVSS score, affected systems, and mitigation steps if available."
-        )
-        
         print("DEBUG: Making API call for source", source.get('id'))
         print(f"DEBUG: Using model: {summarization_model}")
         
-        # Split content if it's too long
-        max_tokens = 14000  # Adjust based on your model's context window
-        encoding = tiktoken.encoding_for_model("gpt-4")  # Use appropriate encoding for the model
-        content_tokens = len(encoding.encode(content))
+        # Tokenize once; long content is summarized chunk by chunk
+        encoding = get_encoding("gpt-4")  # Use appropriate encoding for the model
+        content_token_ids = encoding.encode_ordinary(content)
+        content_tokens = len(content_token_ids)
         
-        if content_tokens > max_tokens:
+        if content_tokens > FACTSHEET_MAX_TOKENS:
             print(f"Warning: Content too long ({content_tokens} tokens), splitting into chunks")
-            chunks = []
-            current_chunk = []
-            current_length = 0
-            
-            # Split content into sentences
-            sentences = re.split(r'(?<=[.!?])\s+', content)
-            current_chunk = []
-            current_tokens = 0
-            
-            for sentence in sentences:
-                sentence_tokens = len(encoding.encode(sentence))
-                if current_tokens + sentence_tokens <= max_tokens:
-                    current_chunk.append(sentence)
-                    current_tokens += sentence_tokens
-                else:
-                    chunks.append(' '.join(current_chunk))
-                    current_chunk = [sentence]
-                    current_tokens = sentence_tokens
-                    
-            if current_chunk:
-                chunks.append(' '.join(current_chunk))
-                
-            # Process each chunk
-            all_facts = []
-            for i, chunk in enumerate(chunks):
-                chunk_prompt = f"{user_prompt}\n\nProcessing Part {i+1} of {len(chunks)}:\n{chunk}"
-                response = client.chat.completions.create(
-                    model=summarization_model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": chunk_prompt}
-                    ]
-                )
-                all_facts.append(response.choices[0].message.content)
-            
-            facts = "\n".join(all_facts)
+            chunks = split_by_token_offsets(encoding, content_token_ids, FACTSHEET_CHUNK_TOKENS)
+            facts = await map_reduce_factsheet(chunks, topic_name, existing_facts, system_prompt)
         else:
-            response = client.chat.completions.create(
-                model=summarization_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
+            user_prompt = (
+                f"Article Title: {topic_name}\n\n"
+                f"Previous Facts:\n{existing_facts}\n\n"
+                f"New Article Content:\n{content}\n\n"
+                f"{FACTSHEET_INSTRUCTIONS}"
+            )
+            facts = await openai_manager.run_in_thread(
+                query_gpt, user_prompt, system_prompt, model=summarization_model, cache=True
             )
-            facts = response.choices[0].message.content
         
         print("DEBUG: API call completed for source", source.get('id'))
         
@@ -202,9 +239,11 @@ async def update_source_factsheet(source_id, facts_json):
 # CHANGED create_factsheets_for_sources (only small changes noted):
 # -----------------------------------------------------------------
 async def create_factsheets_for_sources(topic):
-    related_sources = get_related_sources(topic['id'])
+    # Supabase and the aggregation call block, so they run in threads to keep the event loop free
+    related_sources = await asyncio.to_thread(get_related_sources, topic['id'])
     print(f"DEBUG: Found {len(related_sources)} related sources for topic {topic['id']}")
-    combined_factsheet = ""
+    # Kept apart so the packer never reads the end of one factsheet and the start of the next as one fact
+    factsheets_to_combine = []
     external_source_info = []
     
     # Create tasks for each source's factsheet
@@ -217,13 +256,11 @@ async def create_factsheets_for_sources(topic):
     
     print(f"DEBUG: Created {len(tasks)} factsheet tasks")
     
-    # Use asyncio.gather to run tasks concurrently and get results
-    factsheets = []
-    for task in tasks:
-        if asyncio.iscoroutine(task):
-            factsheets.append(await task)
-        else:
-            factsheets.append(task)
+    # Run the factsheet calls concurrently; the OpenAI client manager paces them against the rate limits
+    async def resolve(task):
+        return await task if asyncio.iscoroutine(task) else task
+
+    factsheets = await asyncio.gather(*(resolve(task) for task in tasks))
     
     # Process the results
     for idx, source_factsheet in enumerate(factsheets):
@@ -238,27 +275,41 @@ async def create_factsheets_for_sources(topic):
                 "factsheet": source_factsheet
             })
         else:
-            combined_factsheet += str(source_factsheet)
+            factsheets_to_combine.append(str(source_factsheet))
     
-    if combined_factsheet:
-        combined_factsheet = aggregate_factsheets(topic, combined_factsheet)
+    if factsheets_to_combine:
+        combined_factsheet = await asyncio.to_thread(aggregate_factsheets, topic, factsheets_to_combine)
     else:
         print(f"Sources: {related_sources}")
         print("No factsheets to aggregate")
         return None, None
     
     if external_source_info:
-        update_external_source_info(topic['id'], external_source_info)
+        await asyncio.to_thread(update_external_source_info, topic['id'], external_source_info)
     
     return combined_factsheet, external_source_info
 
 
-def aggregate_factsheets(topic, combined_factsheet):
+def pack_aggregation_prompt(topic_name, texts, model=AGGREGATION_MODEL):
+    """Build the aggregation user prompt from the best facts of `texts` that fit the model's context."""
+    system_prompt = prompts.combined_factsheet_system_prompt
+    fixed_tokens = tokenizer(system_prompt + generate_factsheet_user_prompt(topic_name, ''), model)
+    budget = prompt_budget(model, fixed_tokens)
+    packed = pack_facts(texts, budget, topic_name, model)
+    if not packed:
+        # Nothing splits into facts (e.g. JSON factsheets); send the raw text within budget
+        packed = truncate_to_tokens('\n'.join(str(text) for text in texts if text), budget, model)
+    return generate_factsheet_user_prompt(topic_name, packed)
+
+def aggregate_factsheets(topic, factsheets):
+    """Combine a topic's factsheets, given as a list (or one string), into its factsheet."""
+    if isinstance(factsheets, str):
+        factsheets = [factsheets]
     try:
-        if combined_factsheet:
+        if any(factsheets):
             system_prompt = prompts.combined_factsheet_system_prompt
-            user_prompt = generate_factsheet_user_prompt(topic['name'], combined_factsheet)
-            facts = query_gpt(user_prompt, system_prompt, model='gpt-3.5-turbo-16k')
+            user_prompt = pack_aggregation_prompt(topic['name'], factsheets)
+            facts = query_gpt(user_prompt, system_prompt, model=AGGREGATION_MODEL, cache=True)
             facts_json = json.dumps(facts)
             supabase.table('topics').update({"factsheet": facts_json}).eq('id', topic['id']).execute()
             return facts
@@ -269,26 +320,31 @@ def aggregate_factsheets(topic, combined_factsheet):
 
 def aggregate_factsheets_from_topic(topic):
     try:
-        response = supabase.table('sources').select('*').eq('topic_id', topic['id']).execute()
+        response = supabase.table('sources').select('factsheet, content').eq('topic_id', topic['id']).execute()
         related_sources = response.data or []
     except Exception as e:
         print(f'Failed to get related sources for topic {topic["id"]}', e)
         return
     if related_sources:
-        system_prompt = "You are an expert at summarizing topics while being able to maintain every single detail. You utilize a lossless compression algorithm to keep the factual details together"
-        user_prompt = f"When you make a factsheet, keep each fact together in a sentence so each fact is separated by a period. Try to chunk together information that is related to {topic['name']}. Now give the factsheet for the following information: {related_sources} "
+        system_prompt = prompts.combined_factsheet_system_prompt
+        # Factsheets are already condensed; raw content only stands in for sources without one
+        texts = [source['factsheet'] for source in related_sources if source.get('factsheet')]
+        texts += [source['content'] for source in related_sources if not source.get('factsheet') and source.get('content')]
+        user_prompt = pack_aggregation_prompt(topic['name'], texts)
         try:
-            facts = query_gpt(user_prompt, system_prompt, model='gpt-3.5-turbo-16k')
+            facts = query_gpt(user_prompt, system_prompt, model=AGGREGATION_MODEL, cache=True)
             facts_json = json.dumps(facts)
             supabase.table('topics').update({"factsheet": facts_json}).eq('id', topic['id']).execute()
             return facts
         except Exception as gpt3_error:
             logging.error(f'Failed to synthesize factsheets from topic {topic["id"]}', gpt3_error)
 
-def get_related_sources(topic_id):
+# Source columns used by the factsheet stage; content is fetched per source when needed
+SOURCE_COLUMNS = ('id', 'topic_id', 'url', 'factsheet', 'external_source')
+
+def get_related_sources(topic_id, columns=SOURCE_COLUMNS):
     try:
-        response = supabase.table('sources').select('*').eq('topic_id', topic_id).execute()
-        return response.data or []
+        return Query(supabase, SOURCES, *columns).eq('topic_id', topic_id).all()
     except Exception as e:
         print(f'Failed to get related sources for topic {topic_id}', e)
         return []
@@ -382,7 +438,7 @@ def fetch_sources_from_bing(query):
     headers = {'Ocp-Apim-Subscription-Key': bing_api_key}
     logging.info(f"Querying Bing API with query: {query}")
     try:
-        response = httpx.get(endpoint, headers=headers, params=params)
+        response = get_client().get(endpoint, headers=headers, params=params)
         response.raise_for_status()
     except httpx.RequestError as e:
         logging.error(f"Failed to get response from Bing API: {str(e)}")
@@ -407,6 +463,9 @@ def fetch_sources_from_bing(query):
     return related_sources
 
 def check_if_content_exceeds_limit(content):
+    # A token covers at least one byte, so shorter content can't exceed the limit
+    if len(content.encode('utf-8')) < 16384:
+        return False
     token_quantity = tokenizer(content, 'gpt-3.5-turbo-16k')
     if token_quantity >= 16384:
         logging.warning(f"Source content exceeds the limit: {token_quantity}")
@@ -442,13 +501,63 @@ async def gather_and_store_sources(supabase, url, topic_id, date_accessed, depth
     # We'll focus on the main content for now
     return accumulated_sources
 
+async def scrape_first_sources(scrape, candidates, needed, accept, concurrency=SOURCE_SCRAPE_CONCURRENCY):
+    """
+    Scrape candidate sources concurrently until enough good ones have arrived.
+
+    Args:
+        scrape: Coroutine function taking a URL and returning its content or None
+        candidates: Source dicts with a 'url', in order of preference
+        needed: Number of accepted sources to stop at
+        accept: Callback receiving (source, content) for each good scrape as it
+            completes; returns whether the source was kept
+        concurrency: Maximum number of scrapes running at once
+
+    Returns:
+        int: Number of accepted sources. Scrapes still running or waiting when
+        the target is reached are cancelled.
+    """
+    if needed <= 0 or not candidates:
+        return 0
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def scrape_candidate(source):
+        async with semaphore:
+            print(f"Using enhanced scraper for additional source: {source['url']}")
+            try:
+                return source, await scrape(source['url'])
+            except Exception as e:
+                print(f"Error scraping additional source {source['url']}: {e}")
+                return source, None
+
+    tasks = [asyncio.create_task(scrape_candidate(source)) for source in candidates]
+    accepted = 0
+    try:
+        for finished in asyncio.as_completed(tasks):
+            source, content = await finished
+            if content and len(content.strip()) >= 100 and accept(source, content):
+                accepted += 1
+                if accepted >= needed:
+                    break
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"Cancelled {len(pending)} remaining source scrapes")
+            await asyncio.gather(*pending, return_exceptions=True)
+    return accepted
+
 async def gather_sources(supabase, topic, MIN_SOURCES=2, overload=False, depth=2, fetch_strategy=None):
     """Gather sources for a topic."""
     print(f"Processing topic URL: {topic['url']}")
+    all_sources = []
     
     try:
         # Get existing sources first
         existing_sources = get_related_sources(topic['id'])
+        all_sources = list(existing_sources)
         existing_urls = set(source['url'] for source in existing_sources)
         
         if existing_sources:
@@ -491,69 +600,90 @@ async def gather_sources(supabase, topic, MIN_SOURCES=2, overload=False, depth=2
                 'external_source': False
             }
             
-            # Insert into database if URL not already present
+            # Insert into database right away if URL not already present
             if topic['url'] not in existing_urls:
-                response = supabase.table('sources').insert(source_record).execute()
+                response = await asyncio.to_thread(
+                    lambda: supabase.table('sources').insert(source_record).execute()
+                )
                 if response.data:
-                    accumulated_sources = response.data
+                    all_sources.extend(response.data)
                     existing_urls.add(topic['url'])
                     print(f"Successfully stored source from {topic['url']}")
                 else:
                     print(f"Failed to store source from {topic['url']}")
-                    accumulated_sources = []
             else:
                 print(f"Source {topic['url']} already exists, skipping...")
-                accumulated_sources = []
                 
         except Exception as e:
             print(f"Error processing source {topic['url']}: {e}")
-            accumulated_sources = []
             
-        # Combine existing and new sources
-        all_sources = existing_sources + accumulated_sources
         print(f"Total sources gathered: {len(all_sources)}")
         
         # If we don't have enough sources, try to find more using search
         if len(all_sources) < MIN_SOURCES:
             print(f"Looking for additional sources for topic: {topic['name']}")
-            additional_sources = search_related_sources(topic['name'])
-            if additional_sources:
-                for source in additional_sources:
-                    if len(all_sources) >= MIN_SOURCES:
+            additional_sources = await asyncio.to_thread(search_related_sources, topic['name'])
+            candidates = []
+            for source in additional_sources or []:
+                # Skip if URL already exists
+                if source['url'] in existing_urls:
+                    print(f"Source {source['url']} already exists, skipping...")
+                    continue
+                candidates.append(source)
+
+            # Additional sources are inserted together; a rejected row is isolated
+            # by retrying the insert in halves instead of failing the whole batch
+            writer = BatchWriter(supabase, 'sources', flush_seconds=math.inf, isolate_failures=True)
+            # URLs whose scrape was used or came back unusable; cancelled ones may be tried again
+            scraped = set()
+
+            async def scrape(url):
+                content = await scraper.scrape(url)
+                if not content or len(content.strip()) < 100:
+                    scraped.add(url)
+                return content
+
+            def store_additional_source(source, content):
+                scraped.add(source['url'])
+                source_record = {
+                    'topic_id': topic['id'],
+                    'url': source['url'],
+                    'content': content,
+                    'date_accessed': datetime.now().isoformat(),
+                    'external_source': True
+                }
+                writer.add(source_record)
+                existing_urls.add(source['url'])
+                print(f"Added additional source: {source['url']}")
+                return True
+
+            concurrency = SOURCE_SCRAPE_CONCURRENCY if PARALLEL_SOURCE_SCRAPING else 1
+            try:
+                while candidates and len(all_sources) < MIN_SOURCES:
+                    tried = len(scraped)
+                    await scrape_first_sources(
+                        scrape, candidates, MIN_SOURCES - len(all_sources),
+                        store_additional_source, concurrency
+                    )
+                    all_sources.extend(await asyncio.to_thread(writer.flush))
+                    # Rows that failed to insert leave us short; try the candidates not scraped yet
+                    candidates = [source for source in candidates if source['url'] not in scraped]
+                    if len(scraped) == tried:
                         break
-                        
-                    # Skip if URL already exists
-                    if source['url'] in existing_urls:
-                        print(f"Source {source['url']} already exists, skipping...")
-                        continue
-                        
-                    try:
-                        # Use enhanced scraper for additional sources
-                        print(f"Using enhanced scraper for additional source: {source['url']}")
-                        content = await scraper.scrape(source['url'])
-                        
-                        if content and len(content.strip()) >= 100:
-                            source_record = {
-                                'topic_id': topic['id'],
-                                'url': source['url'],
-                                'content': content,
-                                'date_accessed': datetime.now().isoformat(),
-                                'external_source': True
-                            }
-                            response = supabase.table('sources').insert(source_record).execute()
-                            if response.data:
-                                all_sources.extend(response.data)
-                                existing_urls.add(source['url'])
-                                print(f"Added additional source: {source['url']}")
-                    except Exception as e:
-                        print(f"Error adding additional source {source['url']}: {e}")
-                        continue
-                
+            finally:
+                # Never lose sources already scraped, even if gathering failed part way
+                if writer.pending:
+                    all_sources.extend(await asyncio.to_thread(writer.flush))
+                if writer.requests:
+                    print(writer.report())
+
+        if len(all_sources) < MIN_SOURCES:
+            print(f"Only stored {len(all_sources)} of {MIN_SOURCES} sources for topic {topic['id']}")
         return all_sources
         
     except Exception as e:
         print(f"Error gathering sources: {e}")
-        return existing_sources
+        return all_sources
 
 def search_related_sources(query, offset=0, fetch_strategy=None):
     """Search for related sources, filtering out irrelevant ones."""
@@ -653,7 +783,7 @@ def search_related_articles(topic):
     params = {'q': topic['title'], 'mkt': mkt, 'count': 5}
     headers = {'Ocp-Apim-Subscription-Key': bing_api_key}
     print("Querying Bing API with topic: " + str(topic))
-    response = httpx.get(endpoint, headers=headers, params=params)
+    response = get_client().get(endpoint, headers=headers, params=params)
     response.raise_for_status()
     news_result = response.json()
     
@@ -0,0 +1,35 @@
+"""
+Base class of the SQLite-backed local caches and indexes.
+
+Each store opens its database on first use, creating the directory and the
+store's schema, and shares the one connection between threads behind a lock.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+
+class SQLiteStore:
+    """Lazily opened SQLite database with its schema, shared across threads."""
+
+    def __init__(self, path: str, schema: str):
+        self.path = path
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(self.schema)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -1,9 +1,10 @@
 import asyncio
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from playwright_stealth import stealth_async
 import logging
 from bs4 import BeautifulSoup
 import random
+from browser_pool import browser_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,18 +31,12 @@ async def scrape_with_stealth(url, max_retries=3):
     """
     logging.info(f"Attempt 1: Navigating to {url}")
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                args=['--disable-blink-features=AutomationControlled']
-            )
-            context = await browser.new_context(
-                user_agent=random.choice(USER_AGENTS),
-                viewport={'width': 1920, 'height': 1080},
-                java_script_enabled=True
-            )
-            
-            page = await context.new_page()
-            
+        async with browser_pool.page(
+            'chromium',
+            user_agent=random.choice(USER_AGENTS),
+            viewport={'width': 1920, 'height': 1080},
+            java_script_enabled=True
+        ) as page:
             try:
                 # Navigate to the page and wait for content to load
                 await page.goto(url, wait_until='networkidle', timeout=30000)
@@ -95,7 +90,6 @@ async def scrape_with_stealth(url, max_retries=3):
                         .join('\\n\\n');
                 }""")
                 
-                await browser.close()
                 logging.info(f"Successfully scraped content from {url}")
                 return title, text
                 
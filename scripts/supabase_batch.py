@@ -0,0 +1,150 @@
+"""
+Batched writes to Supabase.
+
+Inserting or updating one row per request makes ingest cost one round trip
+per row. A BatchWriter buffers rows for one table and sends them as chunked
+bulk inserts, or upserts when a conflict column is given. The buffer is
+flushed when it reaches SUPABASE_BATCH_SIZE rows, when the oldest buffered
+row is older than SUPABASE_FLUSH_SECONDS (checked as rows are added), on
+flush(), and when a `with` block exits. With isolate_failures, a chunk that
+is rejected is retried in halves, so one bad row doesn't cost the others.
+
+    with BatchWriter(supabase, 'exploits', on_conflict='cve') as writer:
+        writer.add_many(rows)
+    print(writer.report())
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_BATCH_SIZE = int(os.getenv('SUPABASE_BATCH_SIZE', '500'))
+SUPABASE_FLUSH_SECONDS = float(os.getenv('SUPABASE_FLUSH_SECONDS', '5'))
+
+
+def chunked(rows: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(rows), max(1, size)):
+        yield rows[start:start + size]
+
+
+class BatchWriter:
+    """Buffers rows for one table and writes them in chunks."""
+
+    def __init__(self, client, table: str, on_conflict: Optional[str] = None,
+                 batch_size: int = SUPABASE_BATCH_SIZE, flush_seconds: float = SUPABASE_FLUSH_SECONDS,
+                 isolate_failures: bool = False):
+        self.client = client
+        self.table = table
+        self.on_conflict = on_conflict
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.isolate_failures = isolate_failures
+        self._lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._oldest: Optional[float] = None
+
+        # Statistics
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.requests = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def add(self, row: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Buffer a row; returns the rows written if this triggered a flush."""
+        return self.add_many([row])
+
+    def add_many(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            for row in rows:
+                if not self._buffer:
+                    self._oldest = time.monotonic()
+                self._buffer.append(row)
+            due = len(self._buffer) >= self.batch_size or (
+                self._oldest is not None and time.monotonic() - self._oldest >= self.flush_seconds
+            )
+        return self.flush() if due else []
+
+    def _write(self, chunk: List[Dict[str, Any]]):
+        query = self.client.table(self.table)
+        if self.on_conflict:
+            return query.upsert(chunk, on_conflict=self.on_conflict).execute()
+        return query.insert(chunk).execute()
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """
+        Write every buffered row.
+
+        Returns:
+            The rows returned by Supabase. A chunk that fails is logged and
+            counted in rows_failed; the remaining chunks are still written.
+        """
+        with self._lock:
+            rows, self._buffer, self._oldest = self._buffer, [], None
+        written = []
+        for chunk in chunked(rows, self.batch_size):
+            self._write_chunk(chunk, written)
+        return written
+
+    def _write_chunk(self, chunk: List[Dict[str, Any]], written: List[Dict[str, Any]]):
+        start = time.monotonic()
+        response, error = None, None
+        try:
+            response = self._write(chunk)
+        except Exception as e:
+            error = e
+        self.requests += 1
+        self.seconds += time.monotonic() - start
+        if error is not None:
+            if self.isolate_failures and len(chunk) > 1:
+                logger.warning(f"Failed to write {len(chunk)} rows to {self.table}, retrying in halves: {error}")
+                middle = len(chunk) // 2
+                self._write_chunk(chunk[:middle], written)
+                self._write_chunk(chunk[middle:], written)
+                return
+            self.rows_failed += len(chunk)
+            logger.error(f"Failed to write {len(chunk)} rows to {self.table}: {error}")
+            return
+        self.rows_written += len(chunk)
+        written.extend(getattr(response, 'data', None) or [])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'table': self.table,
+            'rows': self.rows_written,
+            'failed': self.rows_failed,
+            'requests': self.requests,
+            'seconds': self.seconds,
+            'rows_per_sec': self.rows_written / self.seconds if self.seconds else 0.0,
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        failed = f", {stats['failed']} failed" if stats['failed'] else ""
+        return (f"Wrote {stats['rows']} rows to {self.table} in {stats['requests']} requests "
+                f"({stats['rows_per_sec']:.0f} rows/sec{failed})")
+
+
+def bulk_upsert(client, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None,
+                batch_size: int = SUPABASE_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Write rows in chunks in one call; see BatchWriter."""
+    writer = BatchWriter(client, table, on_conflict=on_conflict, batch_size=batch_size)
+    written = writer.add_many(rows)
+    written += writer.flush()
+    if rows:
+        logger.info(writer.report())
+    return written
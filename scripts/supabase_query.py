@@ -0,0 +1,224 @@
+"""
+Column-projected, paginated reads from Supabase.
+
+`select('*')` sends every column over the wire, including article text and
+factsheets that most callers never look at. A Query names the columns its
+caller uses and filters on the server. Large text columns listed as lazy on
+the Table are left out unless asked for and are fetched for a row the first
+time they are read. Results are read in pages of SUPABASE_PAGE_SIZE rows, so
+PostgREST's row cap (1000 by default) never cuts a result short.
+
+Pages follow the table key (`id > last id`) rather than row offsets, so rows
+that are added or removed while a job works through a table never shift a
+page. stream() hands rows to an async consumer one page at a time, fetching
+the next page while the current one is processed, so maintenance jobs over
+whole tables run in constant memory.
+
+    sources = Query(supabase, SOURCES, 'id', 'url', 'factsheet').eq('topic_id', 7).all()
+    sources[0]['content']  # fetched now, with one request
+
+    async for post in Query(supabase, POSTS, 'id', 'link').stream():
+        ...
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from table_structures import post_table
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_PAGE_SIZE = int(os.getenv('SUPABASE_PAGE_SIZE', '1000'))
+# Fetch the next page of a stream while the caller processes the current one
+SUPABASE_PREFETCH = os.getenv('SUPABASE_PREFETCH', 'true').lower() in ('true', '1', 't')
+
+
+@dataclass(frozen=True)
+class Table:
+    """A Supabase table: its key, its large columns and, when known, all of its columns."""
+    name: str
+    key: str = 'id'
+    lazy: Tuple[str, ...] = ()
+    columns: Optional[FrozenSet[str]] = None
+
+    def check(self, columns):
+        if self.columns is None:
+            return
+        unknown = [column for column in columns if column != '*' and column not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns for {self.name}: {', '.join(unknown)}")
+
+
+SOURCES = Table('sources', lazy=('content',), columns=frozenset({
+    'id', 'topic_id', 'url', 'content', 'factsheet', 'date_accessed', 'external_source',
+}))
+POSTS = Table('posts', lazy=('content',), columns=frozenset(post_table))
+EXPLOITS = Table('exploits')
+TOPICS = Table('topics', lazy=('factsheet', 'external_source_info'))
+
+
+class Row(dict):
+    """A result row; lazy columns that were not selected are fetched on first access."""
+
+    __slots__ = ('_client', '_table')
+
+    def __init__(self, data: Dict[str, Any], client, table: Table):
+        super().__init__(data)
+        self._client = client
+        self._table = table
+
+    def __missing__(self, column):
+        key = self._table.key
+        if column not in self._table.lazy or key not in self:
+            raise KeyError(column)
+        response = self._client.table(self._table.name).select(column).eq(key, self[key]).limit(1).execute()
+        value = response.data[0].get(column) if response.data else None
+        self[column] = value
+        return value
+
+    def get(self, column, default=None):
+        try:
+            return self[column]
+        except KeyError:
+            return default
+
+
+class Query:
+    """A read of named columns from one table, built like a PostgREST query."""
+
+    def __init__(self, client, table: Table, *columns: str, page_size: int = SUPABASE_PAGE_SIZE):
+        if not columns:
+            raise ValueError(f"Name the columns to read from {table.name}")
+        table.check(columns)
+        # Rows need their key to fetch lazy columns and to page
+        if table.key not in columns and '*' not in columns:
+            columns = (table.key,) + columns
+        self.client = client
+        self.table = table
+        self.columns = columns
+        self.page_size = max(1, page_size)
+        self._filters: List[Callable] = []
+        self._order: Optional[Tuple[str, bool]] = None
+        self._limit: Optional[int] = None
+
+    def _filter(self, apply: Callable) -> 'Query':
+        self._filters.append(apply)
+        return self
+
+    def eq(self, column: str, value) -> 'Query':
+        return self._filter(lambda query: query.eq(column, value))
+
+    def gte(self, column: str, value) -> 'Query':
+        return self._filter(lambda query: query.gte(column, value))
+
+    def lt(self, column: str, value) -> 'Query':
+        return self._filter(lambda query: query.lt(column, value))
+
+    def in_(self, column: str, values) -> 'Query':
+        return self._filter(lambda query: query.in_(column, list(values)))
+
+    def is_null(self, column: str) -> 'Query':
+        return self._filter(lambda query: query.is_(column, 'null'))
+
+    def not_null(self, column: str) -> 'Query':
+        return self._filter(lambda query: query.not_.is_(column, 'null'))
+
+    def order(self, column: str, desc: bool = False) -> 'Query':
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count: int) -> 'Query':
+        self._limit = count
+        return self
+
+    def _build(self):
+        query = self.client.table(self.table.name).select(', '.join(self.columns))
+        for apply in self._filters:
+            query = apply(query)
+        # Pages are only consistent over a fixed order
+        column, desc = self._order or (self.table.key, False)
+        return query.order(column, desc=desc)
+
+    def _keyset(self) -> Optional[bool]:
+        """Whether pages run by descending key, or None if the order isn't by key."""
+        column, desc = self._order or (self.table.key, False)
+        return desc if column == self.table.key else None
+
+    def _next_size(self, fetched: int) -> int:
+        return self.page_size if self._limit is None else min(self.page_size, self._limit - fetched)
+
+    def _fetch_page(self, last, fetched: int, size: int) -> List[Dict[str, Any]]:
+        query = self._build()
+        desc = self._keyset()
+        if desc is None:
+            query = query.range(fetched, fetched + size - 1)
+        else:
+            if last is not None:
+                query = query.lt(self.table.key, last) if desc else query.gt(self.table.key, last)
+            query = query.limit(size)
+        return query.execute().data or []
+
+    def pages(self) -> Iterator[List[Row]]:
+        """Yield the result a page at a time."""
+        last, fetched = None, 0
+        while True:
+            size = self._next_size(fetched)
+            if size <= 0:
+                return
+            data = self._fetch_page(last, fetched, size)
+            if data:
+                yield [Row(row, self.client, self.table) for row in data]
+                last = data[-1][self.table.key]
+            fetched += len(data)
+            if len(data) < size:
+                return
+
+    async def stream_pages(self, prefetch: bool = SUPABASE_PREFETCH) -> AsyncIterator[List[Row]]:
+        """Yield the result a page at a time without blocking the event loop."""
+        if self._keyset() is None:
+            raise ValueError(f"Streams of {self.table.name} must be ordered by {self.table.key}")
+        last, fetched = None, 0
+        task = None
+        try:
+            while True:
+                size = self._next_size(fetched)
+                if size <= 0:
+                    return
+                if task is None:
+                    task = asyncio.ensure_future(asyncio.to_thread(self._fetch_page, last, fetched, size))
+                data, task = await task, None
+                if not data:
+                    return
+                fetched += len(data)
+                last = data[-1][self.table.key]
+                more = len(data) == size
+                if more and prefetch and self._next_size(fetched) > 0:
+                    task = asyncio.ensure_future(
+                        asyncio.to_thread(self._fetch_page, last, fetched, self._next_size(fetched))
+                    )
+                yield [Row(row, self.client, self.table) for row in data]
+                if not more:
+                    return
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def stream(self, prefetch: bool = SUPABASE_PREFETCH) -> AsyncIterator[Row]:
+        """Yield the result row by row, holding at most two pages in memory."""
+        async for page in self.stream_pages(prefetch):
+            for row in page:
+                yield row
+
+    def all(self) -> List[Row]:
+        return [row for page in self.pages() for row in page]
+
+    def first(self) -> Optional[Row]:
+        limit, self._limit = self._limit, 1
+        try:
+            rows = self.all()
+        finally:
+            self._limit = limit
+        return rows[0] if rows else None
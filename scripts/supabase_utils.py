@@ -1,4 +1,5 @@
 from supabase import create_client, Client
+import asyncio
 import os
 from dotenv import load_dotenv
 import logging
@@ -6,6 +7,9 @@ from scripts.wp_utils import get_all_images_from_wp, fetch_from_wp_api
 from datetime import datetime
 from scripts.table_structures import image_table, post_table
 from urllib.parse import urlparse
+from topic_index import topic_index
+from topic_previews import topic_previews
+from supabase_query import Query, POSTS, TOPICS
 
 # Load .env file
 load_dotenv()
@@ -54,17 +58,18 @@ def update_supabase_table(data, table_name, validation_structure):
         print(f"Data: {clean_data}")
         return
 
-def update_supabase_images_with_wp_images():
+async def update_supabase_images_with_wp_images():
     # Assume you only have access to post URL to identify the post
-    posts = get_all_posts_from_supabase()
-    print(f"Found {len(posts)} posts in Supabase.")
-    # Get the first 2 posts for testing purposes
-    for post in posts:
+    # Posts are streamed a page at a time, so memory stays flat however many posts there are
+    processed = 0
+    async for post in stream_posts_from_supabase():
+        processed += 1
+        image_info = {}
         try:
-            wp_post = get_post_by_url(post['link'])
+            wp_post = await asyncio.to_thread(get_post_by_url, post['link'])
             #print(f"Processing Supabase post {post['id']} with link: {post['link']}")
             #print(f"WordPress post fetched with ID: {wp_post['id']} and link: {wp_post['link']}")
-            image_info = get_image_info_by_wp_post(wp_post)
+            image_info = await asyncio.to_thread(get_image_info_by_wp_post, wp_post)
             #print("Found image in WordPress.")
             # Extracting only the filename without its extension
             if image_info is None:
@@ -77,10 +82,11 @@ def update_supabase_images_with_wp_images():
             image_info['topic_id'] = post.get('topic_id')
             image_info['post_id'] = post.get('id')
             print(f"Upserting image with id {image_info['origin_id']} in Supabase.")
-            upsert_supabase_image_using_origin_id(image_info)
+            await asyncio.to_thread(upsert_supabase_image_using_origin_id, image_info)
         except Exception as e:
-            print(f"Error processing post {post['id']} with origin_id {image_info.get('origin_id', 'unknown')}: {e}")
+            print(f"Error processing post {post['id']} with origin_id {(image_info or {}).get('origin_id', 'unknown')}: {e}")
             continue
+    print(f"Processed {processed} posts in Supabase.")
 
 def update_supabase_image(image_info):
     update_supabase_table(image_info, "images", image_table)
@@ -88,13 +94,20 @@ def update_supabase_image(image_info):
 def update_supabase_post(post_info):
     update_supabase_table(post_info, "posts", post_table)
 
-def get_all_posts_from_supabase():
+def get_all_posts_from_supabase(columns=('id', 'link', 'topic_id')):
     try:
-        response = supabase.table("posts").select("*").execute()
-        return response.data
+        return Query(supabase, POSTS, *columns).all()
     except Exception as e:
         print(f"Failed to get posts from Supabase: {e}")
         return None
+
+async def stream_posts_from_supabase(columns=('id', 'link', 'topic_id')):
+    """Yield posts one page of rows at a time, in id order."""
+    try:
+        async for post in Query(supabase, POSTS, *columns).stream():
+            yield post
+    except Exception as e:
+        print(f"Failed to stream posts from Supabase: {e}")
     
 def get_post_by_url(url):
     # Remove trailing slash if it exists
@@ -155,8 +168,7 @@ def get_image_info_by_wp_post(wp_post):
 def update_links():
     BASE_URL = 'https://cybernow.info/'
     try:
-        posts = supabase.table('posts').select('id, slug, link').execute()
-        posts = posts.data
+        posts = Query(supabase, POSTS, 'id', 'slug', 'link').all()
         
         # Filter out posts without slugs or with already correct links
         posts_to_update = [
@@ -168,17 +180,16 @@ def update_links():
             logging.info("No posts need link updates.")
             return
         
-        # Prepare data for bulk upsert
-        bulk_data = [
-            {'id': post['id'], 'link': f"{BASE_URL}{post['slug']}/"} 
-            for post in posts_to_update
-        ]
-
-        # Perform the bulk upsert
-        for data in bulk_data:
-            supabase.table('posts').update(data).eq('id', data['id']).execute()
+        # Update only the link of the posts that need it, leaving the rest of each row alone
+        updated = 0
+        for post in posts_to_update:
+            try:
+                supabase.table('posts').update({'link': f"{BASE_URL}{post['slug']}/"}).eq('id', post['id']).execute()
+                updated += 1
+            except Exception as e:
+                logging.error(f"Failed to update link of post {post['id']}: {e}")
 
-        logging.info(f"Updated links for {len(bulk_data)} posts.")
+        logging.info(f"Updated links for {updated} of {len(posts_to_update)} posts.")
 
     except Exception as e:
         logging.error(f"Failed to update links: {e}")
@@ -263,6 +274,8 @@ async def delete_topic(topic_id):
     except Exception as e:
         print(f"Failed to delete topic: {e}")
         return
+    topic_index.remove(topic_id)
+    topic_previews.remove(topic_id)
     print(f"Successfully deleted topic with ID {topic_id} and all related sources.")
 
 def get_a_source_from_supabase(id):
@@ -319,24 +332,30 @@ def delete_supabase_images_not_in_file_name_list(supabase_images, wp_image_file_
             print(f"Image with id {image['id']} is in WordPress. Continuing...")
             continue
 
+def topics_without_posts_query():
+    # Using a left join to find topics without posts, newest first
+    return Query(supabase, TOPICS, "*", "posts!left(id)") \
+        .is_null("posts.id") \
+        .order("id", desc=True)
+
+def _without_join(item):
+    # Filter out the join data and return just the topic
+    return {k: v for k, v in item.items() if k != "posts"}
+
 def get_topics_without_posts():
     """Get topics that don't have associated posts in the posts table."""
     try:
-        # Using a left join to find topics without posts
-        response = supabase.table("topics") \
-            .select("*, posts!left(id)") \
-            .is_("posts.id", "null") \
-            .order("id", desc=True) \
-            .execute()
-        
-        # Filter out the join data and return just the topics
-        topics = []
-        for item in response.data:
-            topic = {k: v for k, v in item.items() if k != "posts"}
-            topics.append(topic)
-            
+        topics = [_without_join(item) for item in topics_without_posts_query().all()]
         print(f"Found {len(topics)} topics without posts")
         return topics
     except Exception as e:
         print(f"Failed to get topics without posts: {e}")
-        return []
\ No newline at end of file
+        return []
+
+async def stream_topics_without_posts():
+    """Yield topics that don't have associated posts, one page of rows at a time."""
+    try:
+        async for item in topics_without_posts_query().stream():
+            yield _without_join(item)
+    except Exception as e:
+        print(f"Failed to stream topics without posts: {e}")
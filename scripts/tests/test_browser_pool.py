@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+
+from browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def new_page(self):
+        return object()
+
+    async def close(self):
+        self.browser.open_contexts -= 1
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.open_contexts = 0
+        self.max_open_contexts = 0
+
+    def is_connected(self):
+        return self.connected and not self.closed
+
+    async def new_context(self, **options):
+        self.open_contexts += 1
+        self.max_open_contexts = max(self.max_open_contexts, self.open_contexts)
+        return FakeContext(self)
+
+    async def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    launched = []
+
+    async def launcher(engine):
+        await asyncio.sleep(0)
+        browser = FakeBrowser()
+        launched.append((engine, browser))
+        return browser
+
+    return BrowserPool(launcher=launcher, **kwargs), launched
+
+
+@pytest.mark.asyncio
+async def test_pool_limits_browsers_and_contexts():
+    pool, launched = make_pool(size=2, contexts_per_browser=2, max_pages=10, recycle_after=100)
+    active = 0
+    peak = 0
+
+    async def use():
+        nonlocal active, peak
+        async with pool.page('chromium'):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(use() for _ in range(10)))
+
+    assert len(launched) == 2
+    assert peak == 4
+    assert all(browser.max_open_contexts <= 2 and browser.open_contexts == 0 for _, browser in launched)
+
+    await pool.close()
+    assert all(browser.closed for _, browser in launched)
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_and_replaces_browsers():
+    pool, launched = make_pool(size=1, contexts_per_browser=1, max_pages=1, recycle_after=2)
+
+    for _ in range(3):
+        async with pool.page('firefox'):
+            pass
+    # The first browser was closed after two pages, a second one served the third
+    assert len(launched) == 2
+    assert launched[0][1].closed and not launched[1][1].closed
+
+    launched[1][1].connected = False
+    async with pool.page('firefox'):
+        pass
+    assert len(launched) == 3
+    assert pool.stats()['replaced'] == 1
+    assert all(engine == 'firefox' for engine, _ in launched)
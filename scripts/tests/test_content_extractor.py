@@ -0,0 +1,47 @@
+import pathlib
+
+from content_extractor import extract_main_text, extract_page_text
+
+ARTICLE = " ".join(["Attackers exploited the flaw to gain remote code execution on exposed servers."] * 3)
+
+PAGE = f"""
+<html><head><title>t</title><script>var x = 'ignored';</script></head>
+<body>
+  <nav><a href="/">Home</a><a href="/news">News</a></nav>
+  <div class="sidebar">
+    <p><a href="/1">A long related story link that should not be picked as content</a></p>
+    <p><a href="/2">Another long related story link that should not be picked either</a></p>
+  </div>
+  <div class="post-body">
+    <h1>Critical flaw patched</h1>
+    <p>{ARTICLE}</p>
+    <p>{ARTICLE}</p>
+    <ul><li><p>Update to version 9.19.1 immediately.</p></li></ul>
+  </div>
+  <footer><p>Copyright notice with enough characters to count as a paragraph.</p></footer>
+</body></html>
+"""
+
+
+def test_picks_article_container():
+    text = extract_main_text(PAGE)
+    paragraphs = text.split('\n\n')
+
+    assert paragraphs[0] == 'Critical flaw patched'
+    assert paragraphs.count(ARTICLE) == 2
+    # Nested blocks are emitted once
+    assert paragraphs.count('Update to version 9.19.1 immediately.') == 1
+    assert 'related story' not in text and 'Copyright' not in text and 'ignored' not in text
+
+
+def test_page_text_falls_back_to_whole_document():
+    listing = '<html><body><div><a href="/a">Story one</a> <span>Story two</span></div></body></html>'
+    assert extract_page_text(listing) == 'Story one Story two'
+    assert extract_main_text('') == ''
+
+
+def test_saved_page():
+    page = pathlib.Path(__file__).parent.parent.parent / 'debug_page.html'
+    text = extract_main_text(page.read_text(encoding='utf-8'))
+    assert 'CVE-2023-41724' in text
+    assert len(text) > 1000
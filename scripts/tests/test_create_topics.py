@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import init
+
+
+class FakeTopics:
+    """Supabase stand-in whose topics table rejects any insert containing a taken id."""
+
+    def __init__(self, taken):
+        self.taken = set(taken)
+        self.stored = []
+
+    def table(self, name):
+        table = MagicMock()
+
+        def insert(rows):
+            query = MagicMock()
+            if any(row['id'] in self.taken for row in rows):
+                query.execute.side_effect = RuntimeError("duplicate key value violates unique constraint")
+            else:
+                self.stored.extend(rows)
+                query.execute.return_value = MagicMock(data=list(rows))
+            return query
+        table.insert.side_effect = insert
+        return table
+
+
+def topic(topic_id):
+    return {'id': topic_id, 'name': f'Topic {topic_id}', 'description': '', 'date_accessed': None,
+            'date_published': None, 'provider': 'test', 'url': f'https://example.com/{topic_id}'}
+
+
+@pytest.mark.asyncio
+async def test_one_colliding_topic_does_not_drop_the_rest(monkeypatch):
+    supabase = FakeTopics(taken={2})
+    index, vectors = MagicMock(), MagicMock()
+    monkeypatch.setattr(init, 'supabase', supabase)
+    monkeypatch.setattr(init, 'topic_index', index)
+    monkeypatch.setattr(init, 'topic_vectors', vectors)
+
+    created = await init.create_topics([topic(1), topic(2), topic(3)])
+
+    assert [t['id'] for t in created] == [1, 3]
+    assert [row['id'] for row in supabase.stored] == [1, 3]
+    index.add_many.assert_called_once_with(created)
+    vectors.add_topics.assert_called_once_with(created)
@@ -131,7 +131,7 @@ async def test_create_factsheets_for_sources():
         assert len(external_info) == 1, "Should have one external source"
         assert external_info[0]["factsheet"] == "factsheet3", "External factsheet should match"
         
-        mock_aggregate_factsheets.assert_called_once_with(mock_topic, 'factsheet1{"already":"exists"}')
+        mock_aggregate_factsheets.assert_called_once_with(mock_topic, ['factsheet1', '{"already":"exists"}'])
 
         mock_update_external_source_info.assert_called_once()
         topic_id_arg, external_info_arg = mock_update_external_source_info.call_args[0]
@@ -141,5 +141,42 @@ async def test_create_factsheets_for_sources():
 
         assert mock_create_factsheet.await_count == 2, "Should create factsheets for two sources"
 
+@pytest.mark.asyncio
+async def test_create_factsheets_for_sources_keeps_the_event_loop_free():
+    """Blocking Supabase and aggregation calls must not stall other coroutines."""
+    import threading
+
+    sources = [{'id': 1, 'factsheet': 'facts', 'external_source': False, 'url': 'http://source1.com'}]
+    ticked = threading.Event()
+    progressed = []
+
+    def blocking(result):
+        def call(*args):
+            # Only a coroutine on the event loop can set the event while this call blocks
+            ticked.clear()
+            progressed.append(ticked.wait(timeout=5))
+            return result
+        return call
+
+    async def ticker(done):
+        while not done.is_set():
+            ticked.set()
+            await asyncio.sleep(0.01)
+
+    done = asyncio.Event()
+
+    async def create():
+        try:
+            return await create_factsheets_for_sources({'id': 1, 'name': 'Topic'})
+        finally:
+            done.set()
+
+    with patch("source_fetcher.get_related_sources", side_effect=blocking(sources)), \
+         patch("source_fetcher.aggregate_factsheets", side_effect=blocking("aggregated")):
+        (combined, _), _ = await asyncio.gather(create(), ticker(done))
+
+    assert combined == "aggregated"
+    assert progressed == [True, True]
+
 if __name__ == "__main__":
     asyncio.run(test_single_factsheet()) 
\ No newline at end of file
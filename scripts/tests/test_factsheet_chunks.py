@@ -0,0 +1,63 @@
+import re
+from unittest.mock import patch
+
+import pytest
+
+import source_fetcher
+from source_fetcher import map_reduce_factsheet, split_by_token_offsets
+
+
+class WordEncoding:
+    """Stand-in for a tiktoken encoding with one token per word (and its leading space)."""
+
+    def __init__(self):
+        self.vocab = []
+
+    def encode_ordinary(self, text):
+        ids = []
+        for word in re.findall(r'\s*\S+', text):
+            if word not in self.vocab:
+                self.vocab.append(word)
+            ids.append(self.vocab.index(word))
+        return ids
+
+    def decode_with_offsets(self, ids):
+        text, offsets = '', []
+        for token in ids:
+            offsets.append(len(text))
+            text += self.vocab[token]
+        return text, offsets
+
+
+def test_chunks_respect_the_token_limit_and_end_on_sentences():
+    encoding = WordEncoding()
+    content = ' '.join(f"Sentence {i} has five words." for i in range(20))
+    chunks = split_by_token_offsets(encoding, encoding.encode_ordinary(content), 12)
+
+    assert ' '.join(chunks) == content
+    assert all(len(encoding.encode_ordinary(chunk)) <= 12 for chunk in chunks)
+    assert all(chunk.endswith('.') for chunk in chunks)
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_summarizes_chunks_then_merges_without_the_full_content():
+    prompts = []
+
+    def fake_query_gpt(user_prompt, system_prompt, model=None, cache=False):
+        prompts.append(user_prompt)
+        if user_prompt.startswith('Article Title: t\n\nPart'):
+            return f"facts {len(prompts)}"
+        return 'merged factsheet'
+
+    chunks = ['first chunk text', 'second chunk text', 'third chunk text']
+    with patch.object(source_fetcher, 'query_gpt', fake_query_gpt):
+        facts = await map_reduce_factsheet(chunks, 't', 'old facts', 'system')
+
+    assert facts == 'merged factsheet'
+    assert len(prompts) == 4
+    # Each map prompt carries only its own chunk
+    for chunk, prompt in zip(chunks, sorted(prompts[:3])):
+        assert chunk in prompt
+        assert sum(other in prompt for other in chunks) == 1
+    reduce_prompt = prompts[3]
+    assert 'old facts' in reduce_prompt and 'chunk text' not in reduce_prompt
@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+import feed_parsers
+from feed_cache import FeedCache
+
+RSS = """<rss><channel>
+<item><title>Patch now</title><link>https://example.com/a</link><description>d</description><pubDate>Mon, 01 Jan 2024 00:00:00 +0000</pubDate></item>
+</channel></rss>"""
+
+FEED = {
+    'name': 'Example',
+    'url': 'https://example.com/feed.xml',
+    'category': 'news',
+    'date_format': '%a, %d %b %Y %H:%M:%S %z',
+    'article_selector': {'title': 'title', 'link': 'link', 'date': 'pubDate', 'description': 'description'},
+}
+
+
+@pytest.mark.asyncio
+async def test_not_modified_feed_skips_parsing(tmp_path):
+    cache = FeedCache(str(tmp_path))
+    seen_headers = []
+
+    def handler(request):
+        seen_headers.append(dict(request.headers))
+        if request.headers.get('if-none-match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text=RSS, headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        first = await feed_parsers.fetch_and_parse_feed(FEED, client=client, cache=cache)
+        with patch.object(feed_parsers, 'parse_feed') as parse:
+            second = await feed_parsers.fetch_and_parse_feed(FEED, client=client, cache=cache)
+            parse.assert_not_called()
+
+    assert [t['name'] for t in first] == ['Patch now']
+    assert [t['url'] for t in second] == ['https://example.com/a']
+    assert 'if-none-match' not in seen_headers[0]
+    assert seen_headers[1]['if-modified-since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_identical_body_without_validators_skips_parsing(tmp_path):
+    cache = FeedCache(str(tmp_path))
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text=RSS))) as client:
+        await feed_parsers.fetch_and_parse_feed(FEED, client=client, cache=cache)
+        with patch.object(feed_parsers, 'parse_feed') as parse:
+            topics = await feed_parsers.fetch_and_parse_feed(FEED, client=client, cache=cache)
+            parse.assert_not_called()
+
+    assert len(topics) == 1
+
+
+@pytest.mark.asyncio
+async def test_unparseable_body_is_not_cached(tmp_path):
+    cache = FeedCache(str(tmp_path))
+    bodies = ['<rss><channel><item>', RSS]
+
+    def handler(request):
+        if request.headers.get('if-none-match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text=bodies.pop(0), headers={'ETag': '"v1"'})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        broken = await feed_parsers.fetch_and_parse_feed(FEED, client=client, cache=cache)
+        # Nothing was cached, so the next fetch is unconditional and parsed again
+        fixed = await feed_parsers.fetch_and_parse_feed(FEED, client=client, cache=cache)
+
+    assert broken == []
+    assert [t['name'] for t in fixed] == ['Patch now']
@@ -0,0 +1,80 @@
+import gzip
+import json
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+import feed_parsers
+
+NVD_FEED = {'name': 'NVD', 'url': 'https://example.com/nvdcve-1.1-2024.json.gz', 'category': 'vulnerability',
+            'format': 'json', 'parser_type': 'nvd'}
+KEV_FEED = {'name': 'CISA KEV', 'url': 'https://example.com/kev.json', 'category': 'vulnerability',
+            'format': 'json', 'parser_type': 'cisa_kev'}
+
+
+def nvd_item(cve_id, published):
+    return {
+        'cve': {
+            'CVE_data_meta': {'ID': cve_id},
+            'description': {'description_data': [{'value': f'Description of {cve_id} with "quotes", [brackets] and ]'}]},
+        },
+        'impact': {'baseMetricV3': {'cvssV3': {'baseScore': 9.8, 'severity': 'CRITICAL'}}},
+        'publishedDate': published,
+    }
+
+
+def nvd_document():
+    return {
+        'CVE_data_type': 'CVE',
+        'CVE_data_numberOfCVEs': '3',
+        'CVE_Items': [
+            nvd_item('CVE-2024-0001', '2024-01-01T10:00Z'),
+            nvd_item('CVE-2024-0002', '2024-06-01T10:00Z'),
+            nvd_item('CVE-2024-0003', '2024-07-01T10:00Z'),
+        ],
+    }
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 100000])
+def test_streaming_matches_full_parse(chunk_size):
+    document = nvd_document()
+    raw = gzip.compress(json.dumps(document).encode('utf-8'))
+
+    streamed = list(feed_parsers.iter_feed_topics(chunked(raw, chunk_size), NVD_FEED, gzipped=True))
+    expected = feed_parsers.parse_nvd_feed(document, NVD_FEED)
+
+    strip = lambda topics: [{k: v for k, v in t.items() if k != 'date_accessed'} for t in topics]
+    assert strip(streamed) == strip(expected)
+
+
+def test_streaming_skips_items_before_since():
+    raw = json.dumps(nvd_document()).encode('utf-8')
+    since = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+    topics = list(feed_parsers.iter_feed_topics(chunked(raw, 16), NVD_FEED, since=since))
+
+    assert [t['name'] for t in topics] == ['CVE: CVE-2024-0002', 'CVE: CVE-2024-0003']
+
+
+@pytest.mark.asyncio
+async def test_stream_feed_topics_over_http():
+    document = {
+        'title': 'CISA Catalog of Known Exploited Vulnerabilities',
+        'catalogVersion': '2024.07.01',
+        'vulnerabilities': [
+            {'cveID': 'CVE-2024-1111', 'vulnerabilityName': 'Old bug', 'dateAdded': '2023-01-01'},
+            {'cveID': 'CVE-2024-2222', 'vulnerabilityName': 'New bug', 'dateAdded': '2024-07-01'},
+        ],
+    }
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=json.dumps(document).encode('utf-8')))
+    since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        topics = [t async for t in feed_parsers.stream_feed_topics(KEV_FEED, client=client, since=since)]
+
+    assert [t['name'] for t in topics] == ['CISA KEV: New bug']
@@ -0,0 +1,43 @@
+import asyncio
+import httpx
+import pytest
+
+from http_clients import AsyncHostLimitedTransport, HTTPClientRegistry
+
+
+@pytest.mark.asyncio
+async def test_requests_per_host_are_limited():
+    active = {}
+    peak = {}
+
+    async def handler(request):
+        host = request.url.host
+        active[host] = active.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200, text='ok')
+
+    transport = AsyncHostLimitedTransport(httpx.MockTransport(handler), per_host=2)
+    async with httpx.AsyncClient(transport=transport) as client:
+        urls = [f'https://{host}.example/{i}' for host in ('a', 'b') for i in range(6)]
+        responses = await asyncio.gather(*(client.get(url) for url in urls))
+
+    assert all(response.text == 'ok' for response in responses)
+    assert peak == {'a.example': 2, 'b.example': 2}
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_clients_per_proxy():
+    registry = HTTPClientRegistry()
+    client = registry.get_async_client(verify=False)
+
+    assert registry.get_async_client(verify=False) is client
+    assert registry.get_async_client(proxy='http://proxy.example:8080', verify=False) is not client
+    assert registry.get_client() is registry.get_client()
+
+    await registry.aclose()
+    registry.close()
+    assert client.is_closed
+    assert registry.get_async_client(verify=False) is not client
+    await registry.aclose()
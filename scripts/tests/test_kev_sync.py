@@ -0,0 +1,76 @@
+import asyncio
+import copy
+
+import pytest
+
+import cisa
+from kev_state import KevState, entry_hash
+
+
+def catalog(version, **notes):
+    entries = [
+        {'cveID': cve, 'vendorProject': 'Vendor', 'product': 'Product', 'vulnerabilityName': f'{cve} bug',
+         'dateAdded': '2024-01-01', 'shortDescription': 'desc', 'requiredAction': 'patch',
+         'dueDate': '2024-02-01', 'knownRansomwareCampaignUse': 'Unknown', 'notes': note}
+        for cve, note in notes.items()
+    ]
+    return {'catalogVersion': version, 'vulnerabilities': entries}
+
+
+def run_sync(monkeypatch, state, published, existing=(), fail=()):
+    """Run get_cisa_exploits against a fake catalog; returns the CVE IDs upserted."""
+    upserted = []
+
+    def upsert(exploits):
+        cves = [exploit['cve'] for exploit in exploits]
+        upserted.extend(cves)
+        return {cve for cve in cves if cve not in fail}
+
+    monkeypatch.setattr(cisa, 'kev_state', state)
+    monkeypatch.setattr(cisa, 'get_exploits', lambda: copy.deepcopy(published))
+    monkeypatch.setattr(cisa, 'add_hyperlinks', lambda url: [])
+    monkeypatch.setattr(cisa, 'get_list_of_supabase_exploits', lambda: list(existing))
+    monkeypatch.setattr(cisa, 'insert_or_update_exploits', upsert)
+    assert asyncio.run(cisa.get_cisa_exploits())
+    return upserted
+
+
+def test_entry_hash_ignores_key_order():
+    assert entry_hash({'a': 1, 'b': 2}) == entry_hash({'b': 2, 'a': 1})
+    assert entry_hash({'a': 1}) != entry_hash({'a': 2})
+
+
+def test_first_sync_skips_rows_already_in_supabase(monkeypatch):
+    state = KevState(':memory:')
+    published = catalog('2024.01.01', **{'CVE-1': '', 'CVE-2': ''})
+    assert run_sync(monkeypatch, state, published, existing=['CVE-1']) == ['CVE-2']
+    assert state.catalog_version == '2024.01.01'
+    assert set(state.hashes()) == {'CVE-1', 'CVE-2'}
+
+
+def test_unchanged_catalog_is_skipped(monkeypatch):
+    state = KevState(':memory:')
+    published = catalog('2024.01.01', **{'CVE-1': ''})
+    run_sync(monkeypatch, state, published)
+
+    monkeypatch.setattr(cisa, 'isolate_new_exploits', lambda *args: pytest.fail("an unchanged catalog must not be diffed"))
+    assert run_sync(monkeypatch, state, published) == []
+
+
+def test_only_changed_entries_are_upserted(monkeypatch):
+    state = KevState(':memory:')
+    run_sync(monkeypatch, state, catalog('1', **{'CVE-1': '', 'CVE-2': '', 'CVE-3': ''}))
+
+    republished = catalog('2', **{'CVE-1': '', 'CVE-2': 'ransomware seen', 'CVE-3': '', 'CVE-4': ''})
+    assert run_sync(monkeypatch, state, republished) == ['CVE-2', 'CVE-4']
+    assert state.catalog_version == '2'
+
+
+def test_failed_entries_are_retried(monkeypatch):
+    state = KevState(':memory:')
+    published = catalog('1', **{'CVE-1': '', 'CVE-2': ''})
+    assert run_sync(monkeypatch, state, published, fail={'CVE-2'}) == ['CVE-1', 'CVE-2']
+    # The version isn't recorded, so the same catalog is synced again
+    assert state.catalog_version is None
+    assert run_sync(monkeypatch, state, published) == ['CVE-2']
+    assert state.catalog_version == '1'
@@ -0,0 +1,46 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import gpt_utils
+from llm_cache import LLMCache, make_cache_key
+from openai_client import OpenAIClientManager
+
+
+def test_keys_cover_model_prompts_and_schema():
+    key = make_cache_key('gpt-4', 'system', 'user')
+    assert key == make_cache_key('gpt-4', 'system', 'user')
+    assert key != make_cache_key('gpt-3.5-turbo', 'system', 'user')
+    assert key != make_cache_key('gpt-4', 'system', 'user', [{'name': 'Fn'}])
+
+
+def test_ttl_eviction_and_stats():
+    cache = LLMCache(':memory:', ttl_hours=1)
+    cache.put('a', 'gpt-4', {'title': 'cached'})
+    assert cache.get('a') == {'title': 'cached'}
+    assert cache.get('b') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'hits_by_model': {'gpt-4': 1}}
+
+    cache.max_bytes = 30
+    cache.put('b', 'gpt-4', 'x' * 20)
+    # 'a' was used least recently and goes first
+    assert cache.get('a') is None
+    assert cache.get('b') == 'x' * 20
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get('b') is None
+
+
+def test_query_gpt_only_caches_when_asked(monkeypatch):
+    monkeypatch.setattr(gpt_utils, 'llm_cache', LLMCache(':memory:'))
+    client = MagicMock()
+    client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content='answer'))]
+    )
+    monkeypatch.setattr(gpt_utils, 'openai_manager', OpenAIClientManager(sync_factory=lambda: client))
+    assert gpt_utils.query_gpt('user', 'system', model='gpt-4', cache=True) == 'answer'
+    assert gpt_utils.query_gpt('user', 'system', model='gpt-4', cache=True) == 'answer'
+    assert client.chat.completions.create.call_count == 1
+    gpt_utils.query_gpt('user', 'system', model='gpt-4')
+    assert client.chat.completions.create.call_count == 2
@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from openai_client import OpenAIClientManager, RateBucket, is_retryable
+
+
+def completion(content='ok', total_tokens=10):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(total_tokens=total_tokens),
+    )
+
+
+def status_error(cls, status):
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    return cls('error', response=httpx.Response(status, request=request, headers={'retry-after': '0'}), body=None)
+
+
+class FakeAsyncClient:
+    def __init__(self, results, delay=0.0):
+        self.results = list(results)
+        self.delay = delay
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+
+def test_only_transient_errors_are_retryable():
+    assert is_retryable(status_error(openai.RateLimitError, 429))
+    assert is_retryable(status_error(openai.InternalServerError, 503))
+    assert not is_retryable(status_error(openai.AuthenticationError, 401))
+    assert not is_retryable(status_error(openai.BadRequestError, 400))
+    assert not is_retryable(KeyboardInterrupt())
+
+
+def test_bucket_waits_for_refill():
+    bucket = RateBucket(per_minute=600)
+    bucket.acquire_sync(600)
+    start = time.monotonic()
+    bucket.acquire_sync(3)
+    # 600 per minute refill at 10 per second
+    assert time.monotonic() - start >= 0.25
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_in_flight_are_coalesced():
+    client = FakeAsyncClient([completion('shared')], delay=0.05)
+    manager = OpenAIClientManager(async_factory=lambda: client)
+    request = {'model': 'gpt-4', 'messages': [{'role': 'user', 'content': 'hi'}]}
+
+    results = await asyncio.gather(manager.chat(**request), manager.chat(**request), manager.chat(
+        model='gpt-4', messages=[{'role': 'user', 'content': 'other'}]))
+
+    assert [r.choices[0].message.content for r in results] == ['shared', 'shared', 'shared']
+    assert client.calls == 2
+    stats = manager.stats()['gpt-4']
+    assert stats['requests'] == 2 and stats['coalesced'] == 1
+    assert stats['avg_latency'] >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_waiter_takes_over_when_the_owner_is_cancelled():
+    client = FakeAsyncClient([completion('shared')], delay=0.05)
+    manager = OpenAIClientManager(async_factory=lambda: client)
+    request = {'model': 'gpt-4', 'messages': [{'role': 'user', 'content': 'hi'}]}
+
+    owner = asyncio.create_task(manager.chat(**request))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(manager.chat(**request))
+    await asyncio.sleep(0.01)
+    owner.cancel()
+
+    # The waiter wasn't cancelled itself, so it makes the call instead of failing
+    assert (await waiter).choices[0].message.content == 'shared'
+    assert owner.cancelled()
+    assert client.calls == 2
+
+    # A waiter that is cancelled itself still stops
+    owner = asyncio.create_task(manager.chat(**request))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(manager.chat(**request))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert (await owner).choices[0].message.content == 'shared'
+
+
+@pytest.mark.asyncio
+async def test_cancelled_owner_hands_the_call_to_one_waiter():
+    client = FakeAsyncClient([completion('shared')], delay=0.05)
+    manager = OpenAIClientManager(async_factory=lambda: client)
+    request = {'model': 'gpt-4', 'messages': [{'role': 'user', 'content': 'hi'}]}
+
+    owner = asyncio.create_task(manager.chat(**request))
+    await asyncio.sleep(0.01)
+    shared = next(iter(manager._inflight.values()))[1]
+    waiters = [asyncio.create_task(manager.chat(**request)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    owner.cancel()
+
+    results = await asyncio.gather(*waiters)
+    # The shared future is resolved rather than cancelled, so waiters never
+    # have to ask whether their own task was cancelled
+    assert not shared.cancelled()
+    assert [r.choices[0].message.content for r in results] == ['shared', 'shared']
+    # One waiter made the call again and the other coalesced onto it
+    assert client.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_but_not_others():
+    client = FakeAsyncClient([status_error(openai.RateLimitError, 429), completion('after retry')])
+    manager = OpenAIClientManager(async_factory=lambda: client)
+    response = await manager.chat(model='gpt-4', messages=[{'role': 'user', 'content': 'a'}])
+    assert response.choices[0].message.content == 'after retry'
+    assert manager.stats()['gpt-4']['retries'] == 1
+
+    client = FakeAsyncClient([status_error(openai.AuthenticationError, 401)])
+    manager = OpenAIClientManager(async_factory=lambda: client)
+    with pytest.raises(openai.AuthenticationError):
+        await manager.chat(model='gpt-4', messages=[{'role': 'user', 'content': 'b'}])
+    assert client.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_per_model_tpm_budget_queues_calls():
+    client = FakeAsyncClient([completion(total_tokens=600)])
+    # 600 tokens per minute: the first call uses the whole budget, the second waits for it to refill
+    manager = OpenAIClientManager(async_factory=lambda: client, model_limits={'small': {'tpm': 600}})
+    request = {'model': 'small', 'messages': [{'role': 'user', 'content': 'x'}], 'max_tokens': 3}
+    await manager.chat(**request)
+    await manager.chat(**dict(request, messages=[{'role': 'user', 'content': 'y'}]))
+
+    stats = manager.stats()['small']
+    assert stats['max_queue_wait'] >= 0.25
+    assert stats['max_latency'] < 0.1
+
+
+def test_blocking_calls_share_the_concurrency_cap():
+    lock = threading.Lock()
+    running, peak = 0, 0
+
+    def create(**request):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return completion(request['messages'][0]['content'])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    manager = OpenAIClientManager(max_concurrency=2, sync_factory=lambda: client)
+
+    async def run_all():
+        return await asyncio.gather(*(
+            manager.run_in_thread(manager.chat_sync, model='gpt-4', messages=[{'role': 'user', 'content': str(i)}])
+            for i in range(4)
+        ))
+
+    results = asyncio.run(run_all())
+    assert [r.choices[0].message.content for r in results] == ['0', '1', '2', '3']
+    assert peak == 2
@@ -0,0 +1,47 @@
+import pytest
+
+from content_extractor import extract_main_text
+from parse_service import ParsingService
+
+PAGE = "<html><body><article><p>" + "Patch the appliance now, the flaw is exploited. " * 5 + "</p></article></body></html>"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('mode', ['process', 'thread', 'sync'])
+async def test_backends_return_the_same_result(mode):
+    service = ParsingService(workers=2, mode=mode)
+    try:
+        assert await service.run(extract_main_text, PAGE) == extract_main_text(PAGE)
+    finally:
+        service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_the_caller():
+    service = ParsingService(workers=1, mode='process')
+    try:
+        with pytest.raises(ValueError):
+            await service.run(int, 'not a number')
+    finally:
+        service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_readability_optimization_scores_in_the_parsing_pool(monkeypatch):
+    import content_optimization
+    import format_utils
+
+    scored = []
+
+    async def run(func, *args):
+        scored.append((func, args))
+        return func(*args)
+
+    monkeypatch.setattr(format_utils.parsing_service, 'run', run)
+    monkeypatch.setattr(content_optimization, 'optimize_html', lambda html: html.replace('old', 'new'))
+
+    assert await content_optimization.readability_optimization("<p>old text.</p>") == "<p>new text.</p>"
+    assert scored == [
+        (format_utils.readability_score, ("<p>old text.</p>",)),
+        (format_utils.readability_score, ("<p>new text.</p>",)),
+    ]
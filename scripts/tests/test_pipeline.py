@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+
+from pipeline import TopicPipeline
+
+
+@pytest.mark.asyncio
+async def test_pipeline_overlaps_stages():
+    """Stage N+1 work on one topic should overlap with stage N work on the next."""
+    events = []
+
+    async def scrape(topic):
+        events.append(('scrape', topic))
+        await asyncio.sleep(0.01)
+        return topic
+
+    async def synthesize(topic):
+        events.append(('synthesis', topic))
+        await asyncio.sleep(0.05)
+        return topic * 10
+
+    pipeline = TopicPipeline()
+    pipeline.add_stage('scrape', scrape, workers=1, queue_size=2)
+    pipeline.add_stage('synthesis', synthesize, workers=3, queue_size=2)
+
+    results = await pipeline.run([1, 2, 3])
+
+    assert sorted(results) == [10, 20, 30]
+    # Scraping of topic 2 starts before synthesis of topic 1 is finished
+    assert events.index(('scrape', 2)) < events.index(('synthesis', 2))
+    assert events.index(('synthesis', 1)) < events.index(('scrape', 3))
+
+
+@pytest.mark.asyncio
+async def test_pipeline_drops_and_failures_are_counted():
+    async def scrape(topic):
+        if topic == 'empty':
+            return None
+        if topic == 'broken':
+            raise RuntimeError("scrape failed")
+        return topic
+
+    async def publish(topic):
+        return topic
+
+    pipeline = TopicPipeline()
+    pipeline.add_stage('scrape', scrape, workers=2)
+    pipeline.add_stage('publish', publish)
+
+    results = await pipeline.run(['ok', 'empty', 'broken'])
+
+    assert results == ['ok']
+    scrape_stage, publish_stage = pipeline.stages
+    assert (scrape_stage.processed, scrape_stage.dropped, scrape_stage.failed) == (1, 1, 1)
+    assert publish_stage.processed == 1
+    assert scrape_stage.max_queue_depth >= 1
+
+    report = pipeline.report()
+    assert 'scrape' in report and 'publish' in report
@@ -0,0 +1,55 @@
+import prompt_packer
+from prompt_packer import context_tokens, pack_facts, split_facts
+
+
+def word_counts(texts, model):
+    return [len(text.split()) for text in texts]
+
+
+def test_split_facts_strips_bullets_and_splits_sentences():
+    text = "- The flaw affects Ivanti Connect Secure gateways. Patches are out.\n2. Attackers chain it with CVE-2024-21887 today"
+    assert split_facts(text) == [
+        'The flaw affects Ivanti Connect Secure gateways.',
+        'Attackers chain it with CVE-2024-21887 today',
+    ]
+
+
+
+def test_short_facts_with_figures_are_kept():
+    assert split_facts("- CVSS 9.1 critical.\n- See below.\n- Patch now") == ['CVSS 9.1 critical.']
+
+
+def test_factsheets_passed_separately_keep_their_facts_apart(monkeypatch):
+    monkeypatch.setattr(prompt_packer, 'count_tokens_batch', word_counts)
+    factsheets = [
+        "- Patches were released on Monday for all versions",
+        "- CVE-2024-21887 allows command injection",
+    ]
+    assert pack_facts(factsheets, budget_tokens=100).splitlines() == [
+        'Patches were released on Monday for all versions',
+        'CVE-2024-21887 allows command injection',
+    ]
+
+
+def test_duplicates_are_merged_and_budget_keeps_best_facts(monkeypatch):
+    monkeypatch.setattr(prompt_packer, 'count_tokens_batch', word_counts)
+    factsheets = [
+        "- The vendor released a statement about the incident.\n"
+        "- The botnet infected 4,000 routers across Europe.\n"
+        "- CVE-2024-1234 lets attackers bypass router authentication.",
+        "- The botnet infected 4,000 routers across Europe!\n"
+        "- Weather was sunny in the region during the attack week.",
+    ]
+    packed = pack_facts(factsheets, budget_tokens=17, topic_name='router botnet')
+
+    # The repeated fact appears once; the best two facts fit and keep their original order
+    assert packed.splitlines() == [
+        'The botnet infected 4,000 routers across Europe.',
+        'CVE-2024-1234 lets attackers bypass router authentication.',
+    ]
+
+
+def test_context_tokens_matches_dated_model_names():
+    assert context_tokens('gpt-4o-mini-2024-07-18') == 128000
+    assert context_tokens('gpt-3.5-turbo-16k') == 16384
+    assert context_tokens('gpt-4-0613') == 8192
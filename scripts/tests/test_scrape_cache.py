@@ -0,0 +1,50 @@
+import time
+
+from scrape_cache import ScrapeCache
+
+
+def test_hit_miss_and_ttl():
+    cache = ScrapeCache(':memory:', ttl_hours=1)
+
+    assert cache.get('https://example.com/a') is None
+    cache.put('https://example.com/a', 'article text', html='<p>article text</p>', metadata={'method': 'direct'})
+    entry = cache.get('https://example.com/a')
+
+    assert entry['text'] == 'article text'
+    assert entry['html'] == '<p>article text</p>'
+    assert entry['metadata'] == {'method': 'direct'}
+    # Different extraction kinds of the same URL are separate entries
+    assert cache.get('https://example.com/a', 'nvd_links') is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get('https://example.com/a') is None
+
+
+def test_identical_content_is_stored_once_and_lru_is_evicted():
+    cache = ScrapeCache(':memory:', max_mb=1)
+    cache.put('https://example.com/a', 'same body')
+    cache.put('https://mirror.example/a', 'same body')
+    assert cache.conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 1
+
+    cache.max_bytes = 0
+    cache.put('https://example.com/b', 'other body')
+    # Over the limit everything is evicted, oldest first
+    assert cache.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0
+    assert cache.conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 0
+
+
+def test_running_size_matches_stored_blobs():
+    cache = ScrapeCache(':memory:', max_mb=1)
+    cache.put('https://example.com/a', 'first body', html='<p>first body</p>')
+    cache.put('https://example.com/b', 'first body')
+    # Replacing an entry leaves its old blob until the next eviction
+    cache.put('https://example.com/a', 'second body')
+    stored = cache.conn.execute("SELECT SUM(size) FROM blobs").fetchone()[0]
+    assert cache._total == stored
+
+    cache.max_bytes = stored - 1
+    cache.put('https://example.com/c', 'third body')
+    stored = cache.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+    assert cache._total == stored <= cache.max_bytes
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+
+from enhanced_scraper import EnhancedScraper, ScrapingMethod
+from scrape_cache import ScrapeCache
+from scrape_strategy import ScrapeStrategyStats
+
+GOOD = 'x' * 200
+
+
+def test_ranking_prefers_cheap_methods_that_work():
+    stats = ScrapeStrategyStats(':memory:')
+    url = 'https://www.example.com/post'
+    methods = ['browser', 'direct', 'residential', 'datacenter']
+
+    # Unknown domains start with the cheapest method
+    assert stats.rank(url, methods)[0] == 'direct'
+
+    for _ in range(3):
+        stats.record(url, 'direct', False, 0.5)
+        stats.record(url, 'browser', True, 4.0)
+    assert stats.rank('https://example.com/other', methods)[0] == 'browser'
+    # Other domains are unaffected
+    assert stats.rank('https://another.org/', methods)[0] == 'direct'
+
+
+def make_scraper(results, race_top_two=False):
+    calls = []
+
+    def fake(method, delay=0):
+        async def scrape(url):
+            calls.append(method)
+            await asyncio.sleep(delay)
+            return results[method]
+        return scrape
+
+    scraper = EnhancedScraper(strategy_stats=ScrapeStrategyStats(':memory:'), race_top_two=race_top_two,
+                              cache=ScrapeCache(':memory:'))
+    scraper.direct_scrape = fake(ScrapingMethod.DIRECT)
+    scraper.browser_scrape = fake(ScrapingMethod.SCRAPING_BROWSER, delay=0.05)
+    scraper.proxy_scrape = lambda url, proxy_type: fake(proxy_type)(url)
+    return scraper, calls
+
+
+@pytest.mark.asyncio
+async def test_scrape_learns_working_method():
+    scraper, calls = make_scraper({'direct': None, 'datacenter': None, 'residential': None, 'browser': GOOD})
+
+    assert await scraper.scrape('https://js-heavy.example/a', max_retries=1) == GOOD
+    assert calls[-1] == 'browser' and len(calls) == 4
+
+    calls.clear()
+    assert await scraper.scrape('https://js-heavy.example/b', max_retries=1) == GOOD
+    assert calls == ['browser']
+
+    # A repeated URL is served from the scrape cache
+    calls.clear()
+    assert await scraper.scrape('https://js-heavy.example/b', max_retries=1) == GOOD
+    assert calls == [] and scraper.scrape_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_scrape_races_top_two_methods():
+    scraper, calls = make_scraper({'direct': GOOD, 'datacenter': None, 'residential': None, 'browser': GOOD}, race_top_two=True)
+
+    assert await scraper.scrape('https://example.com/a', max_retries=1) == GOOD
+    assert sorted(calls) == ['datacenter', 'direct']
+    stats = scraper.strategy_stats.get('https://example.com/')
+    assert stats['direct']['successes'] == 1
+
+
+class FakePage:
+    async def route(self, pattern, handler):
+        pass
+
+    async def goto(self, url, **kwargs):
+        pass
+
+    async def wait_for_selector(self, selector, **kwargs):
+        pass
+
+    async def evaluate(self, script):
+        return '<h2>Patch now</h2><p>' + 'The vendor fixed the flaw in version 2.1. ' * 5 + '</p>'
+
+
+class FakeBrowserPool:
+    def page(self, browser_type, **kwargs):
+        class Page:
+            async def __aenter__(self):
+                return FakePage()
+
+            async def __aexit__(self, *exc):
+                return False
+        return Page()
+
+
+@pytest.mark.asyncio
+async def test_browser_scrape_returns_cleaned_text():
+    scraper = EnhancedScraper(browser_pool=FakeBrowserPool(), strategy_stats=ScrapeStrategyStats(':memory:'),
+                              cache=ScrapeCache(':memory:'))
+
+    content = await scraper.browser_scrape('https://js-heavy.example/a')
+
+    # Only text is ever stored under the shared article text kind
+    assert 'The vendor fixed the flaw' in content
+    assert '<p>' not in content and '<h2>' not in content
@@ -0,0 +1,118 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+import source_fetcher
+from source_fetcher import scrape_first_sources
+
+
+@pytest.mark.asyncio
+async def test_stops_at_needed_sources_and_cancels_stragglers():
+    delays = {'https://a.example': 0.01, 'https://b.example': 5, 'https://c.example': 0.02,
+              'https://d.example': 0.01, 'https://e.example': 5}
+    cancelled = []
+
+    async def fake_scrape(url):
+        try:
+            await asyncio.sleep(delays[url])
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        if url == 'https://d.example':
+            return 'too short'
+        return f"content of {url} " * 20
+
+    accepted = []
+
+    def accept(source, content):
+        accepted.append(source['url'])
+        return True
+
+    candidates = [{'url': url} for url in delays]
+    count = await asyncio.wait_for(scrape_first_sources(fake_scrape, candidates, 2, accept, concurrency=3), 2)
+
+    assert count == 2
+    assert accepted == ['https://a.example', 'https://c.example']
+    # The slow scrapes still running when the target was met were cancelled
+    assert sorted(cancelled) == ['https://b.example', 'https://e.example']
+
+
+@pytest.mark.asyncio
+async def test_failed_scrapes_and_rejected_sources_do_not_count():
+    async def fake_scrape(url):
+        if url == 'https://broken.example':
+            raise RuntimeError('boom')
+        return 'x' * 200
+
+    def accept(source, content):
+        return source['url'] != 'https://duplicate.example'
+
+    candidates = [{'url': 'https://broken.example'}, {'url': 'https://duplicate.example'}, {'url': 'https://ok.example'}]
+    assert await scrape_first_sources(fake_scrape, candidates, 3, accept) == 1
+
+
+class FakeSources:
+    """Supabase stand-in recording inserts into sources; rows whose content contains NUL are rejected."""
+
+    def __init__(self):
+        self.inserted = []
+
+    def table(self, name):
+        table = MagicMock()
+
+        def insert(rows):
+            rows = rows if isinstance(rows, list) else [rows]
+            query = MagicMock()
+            if any('\x00' in row['content'] for row in rows):
+                query.execute.side_effect = RuntimeError("invalid byte sequence")
+            else:
+                self.inserted.extend(rows)
+                query.execute.return_value = MagicMock(data=list(rows))
+            return query
+        table.insert.side_effect = insert
+        return table
+
+
+def patch_gathering(monkeypatch, pages, search):
+    class Scraper:
+        async def scrape(self, url):
+            return pages.get(url)
+
+    monkeypatch.setattr(source_fetcher, 'get_related_sources', lambda topic_id: [])
+    monkeypatch.setattr(source_fetcher, 'EnhancedScraper', Scraper)
+    monkeypatch.setattr(source_fetcher, 'search_related_sources', search)
+
+
+@pytest.mark.asyncio
+async def test_topic_source_is_stored_even_if_search_fails(monkeypatch):
+    def search(query):
+        raise RuntimeError("HTTP 500 from search API")
+
+    patch_gathering(monkeypatch, {'https://topic.example': 'topic text ' * 20}, search)
+    supabase = FakeSources()
+    topic = {'id': 1, 'name': 'Topic', 'url': 'https://topic.example'}
+
+    sources = await source_fetcher.gather_sources(supabase, topic, MIN_SOURCES=3)
+    assert [row['url'] for row in supabase.inserted] == ['https://topic.example']
+    assert [row['url'] for row in sources] == ['https://topic.example']
+
+
+@pytest.mark.asyncio
+async def test_rejected_source_does_not_drop_the_others(monkeypatch):
+    pages = {
+        'https://topic.example': 'topic text ' * 20,
+        'https://bad.example': 'bad \x00 text ' * 20,
+        'https://good.example': 'good text ' * 20,
+        'https://spare.example': 'spare text ' * 20,
+    }
+    candidates = [{'url': url} for url in ('https://bad.example', 'https://good.example', 'https://spare.example')]
+    patch_gathering(monkeypatch, pages, lambda query: candidates)
+    supabase = FakeSources()
+    topic = {'id': 1, 'name': 'Topic', 'url': 'https://topic.example'}
+
+    sources = await source_fetcher.gather_sources(supabase, topic, MIN_SOURCES=3)
+    # The rejected row is replaced by the next candidate
+    assert sorted(row['url'] for row in sources) == [
+        'https://good.example', 'https://spare.example', 'https://topic.example'
+    ]
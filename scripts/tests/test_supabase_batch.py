@@ -0,0 +1,94 @@
+from unittest.mock import MagicMock
+
+from supabase_batch import BatchWriter, bulk_upsert
+
+
+def make_client(fail_on=()):
+    """Client whose upsert/insert echo the rows back; calls numbered in fail_on raise."""
+    client = MagicMock()
+    calls = []
+
+    def write(kind):
+        def method(rows, **kwargs):
+            calls.append((kind, list(rows), kwargs))
+            query = MagicMock()
+            if len(calls) in fail_on:
+                query.execute.side_effect = RuntimeError("boom")
+            else:
+                query.execute.return_value = MagicMock(data=list(rows))
+            return query
+        return method
+
+    table = client.table.return_value
+    table.upsert.side_effect = write('upsert')
+    table.insert.side_effect = write('insert')
+    return client, calls
+
+
+def rows(n):
+    return [{'id': i} for i in range(n)]
+
+
+def test_flush_writes_in_chunks():
+    client, calls = make_client()
+    writer = BatchWriter(client, 'exploits', on_conflict='cve', batch_size=4, flush_seconds=60)
+    writer.add_many(rows(3))
+    assert calls == []
+    written = writer.add_many(rows(7)[3:])
+    written += writer.flush()
+
+    assert [len(chunk) for _, chunk, _ in calls] == [4, 3]
+    assert all(kind == 'upsert' and kwargs == {'on_conflict': 'cve'} for kind, _, kwargs in calls)
+    assert written == rows(7)
+    assert writer.pending == 0
+    assert writer.stats()['rows'] == 7
+    assert writer.stats()['requests'] == 2
+
+
+def test_insert_without_conflict_column():
+    client, calls = make_client()
+    with BatchWriter(client, 'sources', batch_size=10, flush_seconds=60) as writer:
+        writer.add({'url': 'a'})
+    assert calls == [('insert', [{'url': 'a'}], {})]
+    assert writer.pending == 0
+
+
+def test_flushes_when_oldest_row_is_due():
+    client, calls = make_client()
+    writer = BatchWriter(client, 'posts', on_conflict='id', batch_size=100, flush_seconds=0)
+    assert writer.add({'id': 1}) == [{'id': 1}]
+    assert len(calls) == 1
+
+
+def test_failed_chunk_does_not_stop_the_rest():
+    client, calls = make_client(fail_on={2})
+    written = bulk_upsert(client, 'exploits', rows(6), on_conflict='cve', batch_size=2)
+
+    assert len(calls) == 3
+    assert written == rows(6)[:2] + rows(6)[4:]
+
+
+def test_stats_count_failures_and_rate():
+    client, _ = make_client(fail_on={1})
+    writer = BatchWriter(client, 'topics', batch_size=2, flush_seconds=60)
+    writer.add_many(rows(3))
+    writer.flush()
+    stats = writer.stats()
+    assert stats['rows'] == 1
+    assert stats['failed'] == 2
+    assert stats['requests'] == 2
+    assert stats['rows_per_sec'] >= 0
+    assert '1 rows to topics' in writer.report()
+    assert '2 failed' in writer.report()
+
+
+def test_isolate_failures_retries_in_halves():
+    client, calls = make_client(fail_on={1, 2})
+    writer = BatchWriter(client, 'sources', batch_size=4, flush_seconds=60, isolate_failures=True)
+    writer.add_many(rows(3))
+    written = writer.flush()
+
+    # [0, 1, 2] fails, then [0] fails on its own and [1, 2] is written
+    assert [chunk for _, chunk, _ in calls] == [rows(3), rows(1), rows(3)[1:]]
+    assert written == rows(3)[1:]
+    assert writer.stats()['failed'] == 1
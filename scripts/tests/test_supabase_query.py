@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from supabase_query import Query, SOURCES, Table
+
+
+class FakeQuery:
+    """Just enough of the PostgREST builder to run Query against a list of rows."""
+
+    def __init__(self, client, name, columns):
+        self.client = client
+        self.rows = list(client.tables[name])
+        self.columns = [column.strip() for column in columns.split(',')]
+        self.window = None
+        self.count = None
+
+    @property
+    def not_(self):
+        negate = self
+
+        class Not:
+            def is_(self, column, value):
+                negate.rows = [row for row in negate.rows if row.get(column) is not None]
+                return negate
+        return Not()
+
+    def eq(self, column, value):
+        self.rows = [row for row in self.rows if row.get(column) == value]
+        return self
+
+    def gt(self, column, value):
+        self.rows = [row for row in self.rows if row[column] > value]
+        return self
+
+    def lt(self, column, value):
+        self.rows = [row for row in self.rows if row[column] < value]
+        return self
+
+    def order(self, column, desc=False):
+        self.rows.sort(key=lambda row: row[column], reverse=desc)
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def execute(self):
+        rows = self.rows[slice(*self.window)] if self.window else self.rows
+        rows = rows[:self.count] if self.count is not None else rows
+        self.client.requests.append(self.columns)
+        return type('Response', (), {'data': [{column: row.get(column) for column in self.columns} for row in rows]})()
+
+
+class FakeClient:
+    def __init__(self, **tables):
+        self.tables = tables
+        self.requests = []
+
+    def table(self, name):
+        client = self
+
+        class Builder:
+            def select(self, columns):
+                return FakeQuery(client, name, columns)
+        return Builder()
+
+
+def sources(n):
+    return [{'id': i, 'topic_id': i % 2, 'url': f'https://example.com/{i}', 'content': 'x' * 1000,
+             'factsheet': f'facts {i}' if i % 3 == 0 else None} for i in range(n)]
+
+
+def test_reads_only_named_columns_across_pages():
+    client = FakeClient(sources=sources(10))
+    rows = Query(client, SOURCES, 'url', page_size=2).eq('topic_id', 0).all()
+
+    assert [row['id'] for row in rows] == [0, 2, 4, 6, 8]
+    # The key is added so content can be fetched later
+    assert client.requests[0] == ['id', 'url']
+    assert len(client.requests) == 3
+
+
+def test_lazy_columns_load_on_first_access():
+    client = FakeClient(sources=sources(3))
+    row = Query(client, SOURCES, 'id', 'factsheet').first()
+    assert 'content' not in row
+
+    assert row.get('content') == 'x' * 1000
+    assert row['content'] == 'x' * 1000
+    assert client.requests == [['id', 'factsheet'], ['content']]
+    assert row.get('missing', 'default') == 'default'
+    with pytest.raises(KeyError):
+        row['missing']
+
+
+def test_filters_and_limit():
+    client = FakeClient(sources=sources(10))
+    rows = Query(client, SOURCES, 'factsheet').not_null('factsheet').order('id', desc=True).limit(2).all()
+    assert [row['factsheet'] for row in rows] == ['facts 9', 'facts 6']
+
+
+def test_columns_are_checked():
+    with pytest.raises(ValueError):
+        Query(FakeClient(), SOURCES, 'contnet')
+    with pytest.raises(ValueError):
+        Query(FakeClient(), SOURCES)
+    # Tables without a column list accept any column
+    Query(FakeClient(), Table('exploits'), 'anything')
+
+
+def collect(stream):
+    async def run():
+        return [row async for row in stream]
+    return asyncio.run(run())
+
+
+def test_stream_pages_by_key_with_prefetch():
+    client = FakeClient(sources=sources(7))
+    query = Query(client, SOURCES, 'url', page_size=3).order('id', desc=True)
+    rows = collect(query.stream(prefetch=True))
+
+    assert [row['id'] for row in rows] == [6, 5, 4, 3, 2, 1, 0]
+    assert len(client.requests) == 3
+
+
+def test_stream_survives_rows_removed_while_reading():
+    rows = sources(6)
+    client = FakeClient(sources=rows)
+
+    async def run():
+        seen = []
+        async for row in Query(client, SOURCES, 'url', page_size=2).stream(prefetch=False):
+            seen.append(row['id'])
+            # Processing a row takes it out of the table, as when a topic gets its post
+            rows.remove(next(r for r in rows if r['id'] == row['id']))
+        return seen
+
+    # Offset paging would skip every other page here
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4, 5]
+
+
+def test_stream_needs_key_order():
+    query = Query(FakeClient(sources=sources(2)), SOURCES, 'url').order('url')
+    with pytest.raises(ValueError):
+        collect(query.stream())
@@ -0,0 +1,40 @@
+import tiktoken
+
+import gpt_utils
+
+# Byte-level encoding: one token per byte, needs no downloaded vocabulary
+BYTE_ENCODING = tiktoken.Encoding(
+    name='bytes',
+    pat_str=r"""\S+|\s+""",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={'<|endoftext|>': 256},
+)
+
+
+def test_encoders_are_loaded_once(monkeypatch):
+    loads = []
+
+    def fake_encoding_for_model(model):
+        loads.append(model)
+        return BYTE_ENCODING
+
+    monkeypatch.setattr(tiktoken, 'encoding_for_model', fake_encoding_for_model)
+    gpt_utils.get_encoding.cache_clear()
+    try:
+        assert gpt_utils.tokenizer('abc', 'gpt-4') == 3
+        # Special-token text in scraped content is counted as plain text
+        assert gpt_utils.tokenizer('<|endoftext|>', 'gpt-4') == 13
+        assert loads == ['gpt-4']
+    finally:
+        gpt_utils.get_encoding.cache_clear()
+
+
+def test_batch_counts_and_truncation(monkeypatch):
+    monkeypatch.setattr(gpt_utils, 'get_encoding', lambda model: BYTE_ENCODING)
+
+    texts = ['one', 'three words here', '', 'é']
+    assert gpt_utils.count_tokens_batch(texts, num_threads=2) == [3, 16, 0, 2]
+    assert gpt_utils.count_tokens_batch([]) == []
+
+    assert gpt_utils.truncate_to_tokens('short', 10) == 'short'
+    assert gpt_utils.truncate_to_tokens('a longer sentence', 8) == 'a longer'
@@ -0,0 +1,95 @@
+import pytest
+
+import topic_evaluation
+from scripts.structured_models import TopicBatchEvaluation, TopicEvaluation
+from topic_evaluation import RecentTopicIndex, evaluate_topics
+
+RECENT = [
+    {'id': 1, 'name': 'Ivanti Connect Secure zero-day exploited', 'description': 'Attackers exploit Ivanti VPN gateways'},
+    {'id': 2, 'name': 'LockBit ransomware disrupted by police', 'description': 'Operation Cronos seizes LockBit servers'},
+    {'id': 3, 'name': 'Chrome patches V8 type confusion bug', 'description': 'Google fixes an exploited Chrome flaw'},
+    {'id': 4, 'name': 'Microsoft Patch Tuesday fixes 70 flaws', 'description': 'Monthly Windows security updates'},
+]
+
+
+def evaluation(title, score, duplicate=False, rank=1):
+    return TopicEvaluation(
+        topic_id=None, title=title, relevance_score=score, significance_score=score, is_duplicate=duplicate,
+        duplicate_reason=None, recommended_action='exclude' if duplicate else 'include', priority_rank=rank,
+        tags=[], suggested_tags=[],
+    )
+
+
+def test_nearest_recent_topics_are_found_by_rare_terms():
+    index = RecentTopicIndex(RECENT)
+    nearest = index.nearest({'name': 'New Ivanti VPN flaw under attack', 'description': ''}, k=2)
+    assert nearest[0]['id'] == 1
+    assert index.nearest({'name': 'zzz', 'description': ''}) == []
+
+
+@pytest.mark.asyncio
+async def test_batches_get_compact_context_and_merge_deterministically(monkeypatch):
+    scores = {'Ivanti gateways hit again': 0.9, 'Chrome V8 exploit in the wild': 0.7,
+              'New LockBit variant appears': 0.8, 'Unrelated phishing kit': 0.3}
+    calls = []
+
+    def fake_evaluate_topic_batch(batch, recent, max_topics, description_chars):
+        calls.append(([t['name'] for t in batch], [r['id'] for r in recent], description_chars))
+        evaluated = [evaluation(t['name'], scores[t['name']], duplicate=t['name'].startswith('Ivanti')) for t in batch]
+        return TopicBatchEvaluation(
+            evaluated_topics=evaluated,
+            top_picks=[t['name'] for t in batch],
+            excluded_topics=[],
+            batch_summary=f"batch of {len(batch)}",
+        )
+
+    monkeypatch.setattr(topic_evaluation, 'evaluate_topic_batch', fake_evaluate_topic_batch)
+    topics = [{'name': name, 'description': ''} for name in scores]
+    result = await evaluate_topics(topics, RECENT, max_topics=2, batch_size=2)
+
+    assert len(calls) == 2
+    # Each batch only sees the recent topics near its own topics
+    assert sorted(calls[0][1]) == [1, 3]
+    assert calls[1][1] == [2]
+    assert result.top_picks == ['New LockBit variant appears', 'Chrome V8 exploit in the wild']
+    assert 'Ivanti gateways hit again' not in result.top_picks
+    assert [t.title for t in result.evaluated_topics] == list(scores)
+
+
+def test_similar_new_topics_share_a_batch():
+    topics = [
+        {'name': 'Ivanti VPN zero-day exploited', 'description': ''},
+        {'name': 'New LockBit variant appears', 'description': ''},
+        {'name': 'Chrome V8 exploit in the wild', 'description': ''},
+        {'name': 'Attackers hit Ivanti VPN gateways', 'description': ''},
+    ]
+    batches = topic_evaluation._group_similar(topics, batch_size=2)
+    assert [t['name'] for t in batches[0]] == ['Ivanti VPN zero-day exploited', 'Attackers hit Ivanti VPN gateways']
+    assert sorted(len(batch) for batch in batches) == [2, 2]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_keeps_the_others(monkeypatch):
+    def fake_evaluate_topic_batch(batch, recent, max_topics, description_chars):
+        if any('LockBit' in t['name'] for t in batch):
+            raise ValueError("Failed to evaluate topics using structured output")
+        return TopicBatchEvaluation(
+            evaluated_topics=[evaluation(t['name'], 0.5) for t in batch],
+            top_picks=[t['name'] for t in batch],
+            excluded_topics=[],
+            batch_summary="ok",
+        )
+
+    monkeypatch.setattr(topic_evaluation, 'evaluate_topic_batch', fake_evaluate_topic_batch)
+    topics = [{'name': 'Ivanti VPN zero-day exploited', 'description': ''},
+              {'name': 'New LockBit variant appears', 'description': ''}]
+    result = await evaluate_topics(topics, RECENT, max_topics=2, batch_size=1)
+    assert result.top_picks == ['Ivanti VPN zero-day exploited']
+
+    def failing(*args):
+        raise ValueError("down")
+
+    # With every batch failed there is nothing to merge
+    monkeypatch.setattr(topic_evaluation, 'evaluate_topic_batch', failing)
+    with pytest.raises(ValueError):
+        await evaluate_topics(topics, RECENT, batch_size=1)
@@ -0,0 +1,42 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+
+import topic_generator
+
+
+def make_feed(name):
+    return {'name': name, 'url': f'https://example.com/{name}.xml', 'category': 'news'}
+
+
+def make_topic(name):
+    return {'name': name, 'url': f'https://example.com/{name}', 'date_published': datetime.now(timezone.utc).isoformat()}
+
+
+@pytest.mark.asyncio
+async def test_gather_topics_fetches_feeds_concurrently():
+    """Total latency should be close to the slowest feed, not the sum, and a hung feed is dropped."""
+    feeds = [make_feed('fast1'), make_feed('fast2'), make_feed('hung')]
+    clients = set()
+
+    async def fake_fetch_and_parse(feed_config, client=None, cache=None, since=None):
+        clients.add(id(client))
+        if feed_config['name'] == 'hung':
+            await asyncio.sleep(10)
+        await asyncio.sleep(0.2)
+        return [make_topic(feed_config['name'])]
+
+    with patch.object(topic_generator, 'get_all_feeds', return_value=feeds), \
+         patch.object(topic_generator, 'fetch_and_parse_feed', side_effect=fake_fetch_and_parse), \
+         patch.object(topic_generator, 'FEED_TIMEOUT', 0.5):
+        start = time.monotonic()
+        topics = await topic_generator.gather_topics(min_topics=0)
+        elapsed = time.monotonic() - start
+
+    assert sorted(t['name'] for t in topics) == ['fast1', 'fast2']
+    assert elapsed < 1.0
+    # Every feed went through the same shared client
+    assert len(clients) == 1 and id(None) not in clients
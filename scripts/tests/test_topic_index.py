@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock
+
+from topic_index import TopicIndex, normalize_url, title_fingerprint
+
+
+def fake_supabase(rows):
+    """Minimal stand-in for the supabase query builder used by TopicIndex.sync."""
+    supabase = MagicMock()
+    state = {}
+
+    query = supabase.table.return_value.select.return_value
+    query.gt.side_effect = lambda column, value: state.update(after=value) or query
+    query.order.return_value = query
+    query.limit.side_effect = lambda n: state.update(limit=n) or query
+
+    def execute():
+        page = [row for row in rows if row['id'] > state['after']][:state['limit']]
+        return MagicMock(data=page)
+
+    query.execute.side_effect = execute
+    return supabase
+
+
+def test_normalization():
+    assert normalize_url('HTTPS://TheHackerNews.com/2024/01/Post.html/?utm=1#top') == 'https://thehackernews.com/2024/01/Post.html'
+    assert title_fingerprint('Patch  NOW: Ivanti flaw!') == title_fingerprint('patch now ivanti flaw')
+    assert title_fingerprint('') is None
+
+
+def test_lookup_by_url_and_title(tmp_path):
+    index = TopicIndex(str(tmp_path / 'index.sqlite3'))
+    index.add({'id': 7, 'url': 'https://example.com/a/', 'name': 'Big Breach'})
+
+    assert index.find_url('https://example.com/a?ref=rss') == 7
+    assert index.find_title('big breach.') == 7
+    assert index.find_url('https://example.com/b') is None
+
+    index.remove(7)
+    assert index.find_url('https://example.com/a') is None
+
+
+def test_incremental_sync(tmp_path):
+    path = str(tmp_path / 'index.sqlite3')
+    rows = [{'id': i, 'url': f'https://example.com/{i}', 'name': f'Topic {i}'} for i in range(1, 6)]
+
+    index = TopicIndex(path)
+    assert index.sync(fake_supabase(rows), page_size=2) == 5
+    assert index.last_synced_id == 5
+    index.close()
+
+    # A new process only pulls rows it has not seen yet
+    rows.append({'id': 6, 'url': 'https://example.com/6', 'name': 'Topic 6'})
+    index = TopicIndex(path)
+    assert index.sync(fake_supabase(rows), page_size=2) == 1
+    assert len(index) == 6
+    assert index.find_url('https://example.com/6') == 6
@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import topic_similarity
+from topic_previews import TopicPreviewCache
+
+
+@pytest.mark.asyncio
+async def test_previews_come_from_cache_then_sources_then_scrape(monkeypatch):
+    previews = TopicPreviewCache(':memory:')
+    previews.store_many({1: 'cached preview'})
+    monkeypatch.setattr(topic_similarity, 'topic_previews', previews)
+
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.in_.return_value.execute.return_value = MagicMock(data=[
+        {'topic_id': 2, 'url': 'https://other.example/2', 'content': 'related source'},
+        {'topic_id': 2, 'url': 'https://example.com/2', 'content': 'stored content'},
+    ])
+    monkeypatch.setattr(topic_similarity, 'supabase', supabase)
+
+    scraped = []
+
+    async def fake_get_topic_content(topic):
+        scraped.append(topic['id'])
+        return 'scraped content'
+
+    monkeypatch.setattr(topic_similarity, 'get_topic_content', fake_get_topic_content)
+
+    topics = [
+        {'id': 1, 'name': 'one', 'url': 'https://example.com/1'},
+        {'id': 2, 'name': 'two', 'url': 'https://example.com/2'},
+        {'id': 3, 'name': 'three', 'url': 'https://example.com/3'},
+    ]
+    await topic_similarity.attach_topic_content(topics)
+
+    assert [topic['content'] for topic in topics] == ['cached preview', 'stored content', 'scraped content']
+    assert scraped == [3]
+    supabase.table.return_value.select.return_value.in_.assert_called_once_with('topic_id', [2, 3])
+
+    # A second check is served entirely from the local cache
+    topics = [{'id': 2, 'name': 'two'}, {'id': 3, 'name': 'three'}]
+    await topic_similarity.attach_topic_content(topics)
+    assert [topic['content'] for topic in topics] == ['stored content', 'scraped content']
+    assert scraped == [3]
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from topic_vectors import TopicVectorIndex, DUPLICATE, UNIQUE
+
+
+def make_index(topics):
+    index = TopicVectorIndex(':memory:', mode='simhash')
+    index.add_topics(topics)
+    return index
+
+
+def recent(hours=1):
+    return (datetime.now() - timedelta(hours=hours)).isoformat()
+
+
+def test_near_duplicate_scores_higher_than_unrelated():
+    index = make_index([
+        {'id': 1, 'name': 'Critical RCE vulnerability in Apache Struts exploited in the wild',
+         'description': 'Attackers are exploiting a remote code execution flaw in Apache Struts', 'date_published': recent()},
+        {'id': 2, 'name': 'New phishing campaign targets banking customers in Europe',
+         'description': 'A wave of phishing emails impersonates major European banks', 'date_published': recent()},
+    ])
+
+    candidate = {'name': 'Critical RCE vulnerability in Apache Struts actively exploited in the wild',
+                 'description': 'Attackers are exploiting a remote code execution flaw in Apache Struts'}
+    neighbours = index.nearest(candidate)
+
+    assert neighbours[0][0] == 1
+    assert neighbours[0][2] > neighbours[1][2]
+    assert index.classify(candidate)[0] == DUPLICATE
+
+
+def test_old_topics_are_ignored_and_missing_vectors_are_reported():
+    index = make_index([
+        {'id': 1, 'name': 'Ransomware gang leaks hospital data', 'description': '', 'date_published': recent(hours=100)},
+    ])
+
+    verdict, neighbours = index.classify({'name': 'Ransomware gang leaks hospital data', 'description': ''}, hours=48)
+    assert (verdict, neighbours) == (UNIQUE, [])
+
+    missing = index.missing([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'name': 'no id'}])
+    assert [topic['id'] for topic in missing] == [2]
@@ -1,5 +1,5 @@
 import asyncio
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 import logging
 import random
 from bs4 import BeautifulSoup
@@ -7,6 +7,8 @@ import traceback
 import aiohttp
 import json
 from typing import Optional, Tuple, List, Dict
+from browser_pool import browser_pool
+from scrape_cache import ARTICLE_TEXT, scrape_cache
 
 # Configure logging with more detail
 logging.basicConfig(
@@ -139,53 +141,31 @@ async def scrape_thn_article(url, max_retries=3, current_retry=0):
         logger.error(f"Max retries ({max_retries}) reached for {url}")
         return None, None
 
+    cached = scrape_cache.get(url, ARTICLE_TEXT)
+    if cached:
+        logger.info(f"Scrape cache hit for THN article: {url}")
+        return cached['metadata'].get('title', ''), cached['text']
+
     logger.info(f"Attempting to scrape THN article (attempt {current_retry + 1}): {url}")
     
     try:
-        async with async_playwright() as p:
-            # Try without proxy first
-            try:
-                browser = await p.firefox.launch(  # Use Firefox instead of Chrome
-                    headless=True,
-                    firefox_user_prefs={
-                        'general.useragent.override': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:122.0) Gecko/20100101 Firefox/122.0',
-                        'privacy.trackingprotection.enabled': False,
-                        'network.http.referer.spoofSource': True,
-                        'network.cookie.cookieBehavior': 0,
-                        'permissions.default.image': 2  # Disable images for faster loading
-                    },
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-dev-shm-usage',
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox'
-                    ]
-                )
-                logger.info("Browser launched successfully without proxy")
-            except Exception as e:
-                logger.error(f"Failed to launch browser without proxy: {e}")
-                return None, None
-
-            # Create a context with specific viewport and user agent
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                extra_http_headers={
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                    'Sec-Fetch-User': '?1'
-                }
-            )
-            logger.info("Browser context created successfully")
-
-            # Create a new page
-            page = await context.new_page()
+        # Firefox page from the shared browser pool, in a context with specific viewport and headers
+        async with browser_pool.page(
+            'firefox',
+            viewport={'width': 1920, 'height': 1080},
+            extra_http_headers={
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Accept-Encoding': 'gzip, deflate, br',
+                'DNT': '1',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1',
+                'Sec-Fetch-Dest': 'document',
+                'Sec-Fetch-Mode': 'navigate',
+                'Sec-Fetch-Site': 'none',
+                'Sec-Fetch-User': '?1'
+            }
+        ) as page:
             logger.info("New page created")
 
             # Add script to modify navigator.webdriver
@@ -222,19 +202,11 @@ async def scrape_thn_article(url, max_retries=3, current_retry=0):
             # Wait for content to be loaded with increased timeout
             try:
                 await page.wait_for_load_state('domcontentloaded', timeout=60000)
-                # Take a screenshot for debugging
-                await page.screenshot(path='debug_screenshot.png')
-                logger.info("Saved debug screenshot")
-                
+
                 # Get the page content
                 html_content = await page.content()
                 logger.info(f"Page HTML length: {len(html_content)}")
                 
-                # Save HTML for debugging
-                with open('debug_page.html', 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                logger.info("Saved debug HTML")
-                
                 # Parse with BeautifulSoup
                 soup = BeautifulSoup(html_content, 'html.parser')
                 
@@ -285,6 +257,7 @@ async def scrape_thn_article(url, max_retries=3, current_retry=0):
                     
                     if content and len(content) >= 100:
                         logger.info(f"Successfully scraped article. Title length: {len(title)}, Content length: {len(content)}")
+                        scrape_cache.put(url, content, ARTICLE_TEXT, html=html_content, metadata={'title': title})
                         return title, content
                     else:
                         logger.warning(f"Retrieved content too short (length: {len(content) if content else 0})")
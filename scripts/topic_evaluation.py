@@ -1,9 +1,27 @@
 from scripts.structured_models import TopicEvaluation, TopicBatchEvaluation
 from scripts.gpt_utils import structured_output_gpt
-from typing import List, Dict, Any
+from supabase_query import Query, TOPICS
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
+import asyncio
+import math
+import os
+import re
 
-def evaluate_topic_batch(current_topics: List[Dict[str, Any]], recent_topics: List[Dict[str, Any]], max_topics: int = 5) -> TopicBatchEvaluation:
+# New topics evaluated per LLM call; batches run concurrently
+EVALUATION_BATCH_SIZE = int(os.getenv('TOPIC_EVALUATION_BATCH_SIZE', 8))
+# Recent topics shown per new topic for duplicate checking
+EVALUATION_NEIGHBORS = int(os.getenv('TOPIC_EVALUATION_NEIGHBORS', 3))
+# Characters of description kept per topic in the prompt
+EVALUATION_DESCRIPTION_CHARS = int(os.getenv('TOPIC_EVALUATION_DESCRIPTION_CHARS', 200))
+
+_WORD = re.compile(r'[a-z0-9]+(?:-[a-z0-9]+)*')
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it its new of on or the to with'.split()
+)
+
+def evaluate_topic_batch(current_topics: List[Dict[str, Any]], recent_topics: List[Dict[str, Any]], max_topics: int = 5,
+                         description_chars: Optional[int] = None) -> TopicBatchEvaluation:
     """
     Evaluate a batch of potential topics against recent topics to select the most significant and unique ones.
     
@@ -11,6 +29,7 @@ def evaluate_topic_batch(current_topics: List[Dict[str, Any]], recent_topics: Li
         current_topics: List of new topics to evaluate
         recent_topics: List of recent topics to check for duplicates
         max_topics: Maximum number of topics to select
+        description_chars: Cut recent topic descriptions to this many characters
         
     Returns:
         TopicBatchEvaluation containing the evaluation results
@@ -25,7 +44,7 @@ Current Topics to Evaluate:
 {format_topics_for_prompt(current_topics)}
 
 Recent Topics (for duplicate checking):
-{format_topics_for_prompt(recent_topics)}
+{format_topics_for_prompt(recent_topics, description_chars) if recent_topics else 'None'}
 
 Please evaluate each topic's significance, relevance to cybersecurity, and check for any duplicates or similar topics in the recent topics list.
 Rank them by importance and select the top {max_topics} most significant and unique topics.
@@ -63,7 +82,8 @@ Your response must be a valid JSON object with the following structure:
     evaluation = structured_output_gpt(
         prompt=prompt,
         model_class=TopicBatchEvaluation,
-        system_prompt=system_prompt
+        system_prompt=system_prompt,
+        cache=True
     )
     
     if evaluation is None:
@@ -71,21 +91,155 @@ Your response must be a valid JSON object with the following structure:
     
     return evaluation
 
-def format_topics_for_prompt(topics: List[Dict[str, Any]]) -> str:
-    """Format topics into a readable string for the prompt."""
+def format_topics_for_prompt(topics: List[Dict[str, Any]], description_chars: Optional[int] = None) -> str:
+    """Format topics into a readable string for the prompt, optionally cutting descriptions short."""
     formatted = []
     for topic in topics:
         title = topic.get('title', topic.get('name', 'Untitled'))
-        desc = topic.get('description', 'No description')
+        desc = topic.get('description') or 'No description'
+        if description_chars and len(desc) > description_chars:
+            desc = desc[:description_chars].rsplit(' ', 1)[0] + '...'
         formatted.append(f"- Title: {title}\n  Description: {desc}")
     return "\n\n".join(formatted)
 
+def _topic_title(topic: Dict[str, Any]) -> str:
+    return topic.get('title', topic.get('name', 'Untitled'))
+
+def _terms(topic: Dict[str, Any]) -> set:
+    text = f"{_topic_title(topic)} {topic.get('description') or ''}".lower()
+    return {word for word in _WORD.findall(text) if word not in _STOPWORDS and len(word) > 1}
+
+class RecentTopicIndex:
+    """In-memory inverted index over recent topics for finding the ones nearest to a new topic."""
+
+    def __init__(self, recent_topics: List[Dict[str, Any]]):
+        self.topics = recent_topics
+        self._postings: Dict[str, List[int]] = {}
+        for position, topic in enumerate(recent_topics):
+            for term in _terms(topic):
+                self._postings.setdefault(term, []).append(position)
+        total = max(len(recent_topics), 1)
+        # Rare terms (product names, CVE IDs) say more about a match than common ones
+        self._idf = {term: math.log(1 + total / len(positions)) for term, positions in self._postings.items()}
+
+    def nearest(self, topic: Dict[str, Any], k: int = EVALUATION_NEIGHBORS) -> List[Dict[str, Any]]:
+        scores: Dict[int, float] = {}
+        for term in _terms(topic):
+            for position in self._postings.get(term, ()):
+                scores[position] = scores.get(position, 0.0) + self._idf[term]
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.topics[position] for position, _ in ranked[:k]]
+
+def _merge_evaluations(topics: List[Dict[str, Any]], evaluations: List[TopicBatchEvaluation], max_topics: int) -> TopicBatchEvaluation:
+    """
+    Combine batch results into one ranking.
+
+    Topics are ordered by their combined scores, then by their rank inside
+    their own batch, then by their position in the input, so the merge
+    doesn't depend on which batch finished first.
+    """
+    position = {_topic_title(topic): i for i, topic in enumerate(topics)}
+    candidates = []
+    excluded = []
+    evaluated = []
+    for evaluation in evaluations:
+        picks = set(evaluation.top_picks)
+        excluded.extend(evaluation.excluded_topics)
+        for topic_eval in evaluation.evaluated_topics:
+            if topic_eval.title not in position:
+                continue
+            evaluated.append(topic_eval)
+            if topic_eval.title in picks and not topic_eval.is_duplicate and topic_eval.recommended_action != 'exclude':
+                candidates.append(topic_eval)
+    candidates.sort(key=lambda t: (
+        -(t.relevance_score + t.significance_score),
+        t.priority_rank if t.priority_rank is not None else math.inf,
+        position[t.title],
+    ))
+    top_picks = []
+    for rank, topic_eval in enumerate(candidates, start=1):
+        topic_eval.priority_rank = rank
+        if len(top_picks) < max_topics and topic_eval.title not in top_picks:
+            top_picks.append(topic_eval.title)
+    excluded.extend(t.title for t in candidates if t.title not in top_picks)
+    evaluated.sort(key=lambda t: position[t.title])
+    return TopicBatchEvaluation(
+        evaluated_topics=evaluated,
+        top_picks=top_picks,
+        excluded_topics=sorted(set(excluded), key=lambda title: position.get(title, len(position))),
+        batch_summary=" ".join(evaluation.batch_summary for evaluation in evaluations),
+    )
+
+def _group_similar(topics: List[Dict[str, Any]], batch_size: int) -> List[List[Dict[str, Any]]]:
+    """
+    Split new topics into batches, keeping each topic with its nearest new topics.
+
+    Two feeds covering the same story can only be caught as duplicates when
+    the model sees them in the same prompt, so each topic pulls its nearest
+    unassigned neighbours into its batch.
+    """
+    batch_size = max(1, batch_size)
+    index = RecentTopicIndex(topics)
+    assigned = set()
+    batches: List[List[Dict[str, Any]]] = []
+    for topic in topics:
+        if id(topic) in assigned:
+            continue
+        group = [topic]
+        assigned.add(id(topic))
+        for neighbor in index.nearest(topic, k=batch_size):
+            if len(group) >= batch_size:
+                break
+            if id(neighbor) not in assigned:
+                group.append(neighbor)
+                assigned.add(id(neighbor))
+        if batches and len(batches[-1]) + len(group) <= batch_size:
+            batches[-1].extend(group)
+        else:
+            batches.append(group)
+    return batches
+
+async def evaluate_topics(current_topics: List[Dict[str, Any]], recent_topics: List[Dict[str, Any]], max_topics: int = 5,
+                          batch_size: int = EVALUATION_BATCH_SIZE) -> TopicBatchEvaluation:
+    """
+    Evaluate any number of new topics in concurrent batches.
+
+    Similar new topics share a batch, so duplicates among them are caught.
+    Each batch is checked only against the recent topics nearest to its own
+    topics, with shortened descriptions, so prompts stay small however many
+    topics were published recently. A failed batch only loses its own topics.
+    """
+    index = RecentTopicIndex(recent_topics)
+    batches = _group_similar(current_topics, batch_size)
+
+    async def evaluate(batch):
+        neighbors, seen = [], set()
+        for topic in batch:
+            for recent in index.nearest(topic):
+                key = recent.get('id', id(recent))
+                if key not in seen:
+                    seen.add(key)
+                    neighbors.append(recent)
+        return await asyncio.to_thread(
+            evaluate_topic_batch, batch, neighbors, min(max_topics, len(batch)), EVALUATION_DESCRIPTION_CHARS
+        )
+
+    results = await asyncio.gather(*(evaluate(batch) for batch in batches), return_exceptions=True)
+    evaluations = [result for result in results if not isinstance(result, BaseException)]
+    failures = [result for result in results if isinstance(result, BaseException)]
+    for error in failures:
+        print(f"Failed to evaluate a batch of topics: {error}")
+    if failures and not evaluations:
+        raise failures[0]
+    return _merge_evaluations(current_topics, evaluations, max_topics)
+
 async def get_recent_topics(supabase, days: int = 30) -> List[Dict[str, Any]]:
     """Get topics from the last N days."""
     try:
         cutoff_date = datetime.now() - timedelta(days=days)
-        response = supabase.table('topics').select('*').gte('date_published', cutoff_date.isoformat()).execute()
-        return response.data if response and hasattr(response, 'data') else []
+        query = Query(supabase, TOPICS, 'id', 'name', 'description', 'date_published') \
+            .gte('date_published', cutoff_date.isoformat())
+        return await asyncio.to_thread(query.all)
     except Exception as e:
         print(f"Error fetching recent topics: {e}")
         return []
@@ -105,8 +259,8 @@ async def filter_topics_structured(topics: List[Dict[str, Any]], supabase) -> Li
         # Get recent topics for duplicate checking
         recent_topics = await get_recent_topics(supabase)
         
-        # Evaluate topics using structured output
-        evaluation = evaluate_topic_batch(topics, recent_topics)
+        # Evaluate topics in batches against their nearest recent topics
+        evaluation = await evaluate_topics(topics, recent_topics)
         
         if not evaluation:
             print("Failed to evaluate topics")
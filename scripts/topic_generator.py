@@ -3,16 +3,30 @@ Module for generating topics from various RSS feeds and other sources.
 """
 
 import asyncio
+import contextlib
 import logging
+import os
+import httpx
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional
 from rss_config import get_all_feeds, get_feeds_by_category, get_feed_by_name
-from feed_parsers import fetch_feed_content, parse_feed
+from feed_parsers import fetch_and_parse_feed
+from feed_cache import feed_cache
+from http_clients import get_async_client
 from dateutil import parser
 import pytz
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of feeds fetched at the same time
+FEED_CONCURRENCY = int(os.getenv('FEED_CONCURRENCY', 10))
+# Per-feed time budget in seconds, so one slow feed can't stall discovery
+FEED_TIMEOUT = float(os.getenv('FEED_TIMEOUT', 30))
+# Conditional GET feed cache, set FEED_CACHE_ENABLED=false to always refetch
+FEED_CACHE_ENABLED = os.getenv('FEED_CACHE_ENABLED', 'true').lower() == 'true'
+# gather_topics widens the age window up to this many hours (1 week) when topics are scarce
+MAX_AGE_LIMIT_HOURS = 168
+
 def parse_date_safely(date_str: str) -> Optional[datetime]:
     """Parse date string to datetime, handling various formats."""
     try:
@@ -29,24 +43,45 @@ def parse_date_safely(date_str: str) -> Optional[datetime]:
         print(f"Error parsing date '{date_str}': {e}")
         return None
 
-async def gather_topics_from_feed(feed_config: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Gather topics from a single feed source."""
-    try:
-        print(f"Attempting to gather topics from {feed_config['name']}")
-        content = await fetch_feed_content(
-            feed_config['url'],
-            format=feed_config.get('format', 'xml')
-        )
-        
-        if content is None:
-            print(f"Failed to fetch content from {feed_config['name']}")
-            return []
-            
-        print(f"Successfully fetched content from {feed_config['name']}, parsing...")
-        topics = await parse_feed(content, feed_config)
-        print(f"Successfully gathered {len(topics)} topics from {feed_config['name']}")
-        return topics
+async def _fetch_and_parse(feed_config: Dict[str, Any], client: Optional[httpx.AsyncClient], since: Optional[datetime]) -> List[Dict[str, Any]]:
+    topics = await fetch_and_parse_feed(
+        feed_config,
+        client=client,
+        cache=feed_cache if FEED_CACHE_ENABLED else None,
+        since=since
+    )
+    
+    if topics is None:
+        print(f"Failed to fetch content from {feed_config['name']}")
+        return []
         
+    print(f"Successfully gathered {len(topics)} topics from {feed_config['name']}")
+    return topics
+
+async def gather_topics_from_feed(
+    feed_config: Dict[str, Any],
+    client: Optional[httpx.AsyncClient] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = None,
+    since: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """Gather topics from a single feed source.
+
+    Args:
+        feed_config: Feed configuration from rss_config
+        client: Optional shared HTTP client
+        semaphore: Optional semaphore capping how many feeds are fetched at once
+        timeout: Overall time budget for fetching and parsing this feed (defaults to FEED_TIMEOUT)
+        since: Optional cutoff, large JSON feeds skip items published before it while streaming
+    """
+    timeout = timeout or FEED_TIMEOUT
+    try:
+        async with semaphore or contextlib.nullcontext():
+            print(f"Attempting to gather topics from {feed_config['name']}")
+            return await asyncio.wait_for(_fetch_and_parse(feed_config, client, since), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"Timed out gathering topics from {feed_config['name']} after {timeout} seconds")
+        return []
     except Exception as e:
         print(f"Error gathering topics from {feed_config['name']}: {e.__class__.__name__}: {str(e)}")
         return []
@@ -103,26 +138,26 @@ async def gather_topics(
     else:
         feeds = get_all_feeds()
     
-    for feed in feeds:
-        try:
-            feed_content = await fetch_feed_content(feed['url'], format=feed.get('format', 'xml'))
-            if not feed_content:
-                continue
-                
-            topics = await parse_feed(feed_content, feed)
-            if topics:
-                all_topics.extend(topics)
-                
-        except Exception as e:
-            logging.error(f"Error gathering topics from {feed['name']}: {str(e)}")
-            continue
+    # Items older than the widest age window used below can never be selected,
+    # so streaming parsers skip them without building topics
+    widest_age_hours = max(max_age_hours, MAX_AGE_LIMIT_HOURS)
+    since = datetime.now(timezone.utc) - timedelta(hours=widest_age_hours)
+
+    # Fetch every feed concurrently over the shared connection pool
+    semaphore = asyncio.Semaphore(FEED_CONCURRENCY)
+    client = get_async_client(verify=False)
+    results = await asyncio.gather(
+        *(gather_topics_from_feed(feed, client=client, semaphore=semaphore, since=since) for feed in feeds)
+    )
+    for topics in results:
+        all_topics.extend(topics)
     
     # Filter topics by age
     filtered_topics = filter_topics_by_age(all_topics, max_age_hours)
     
     # If we don't have enough topics, gradually increase the age limit
-    while len(filtered_topics) < min_topics and max_age_hours < 168:  # Up to 1 week
-        max_age_hours += 24
+    while len(filtered_topics) < min_topics and max_age_hours < MAX_AGE_LIMIT_HOURS:
+        max_age_hours = min(max_age_hours + 24, MAX_AGE_LIMIT_HOURS)
         filtered_topics = filter_topics_by_age(all_topics, max_age_hours)
     
     logging.info(f"Gathered {len(all_topics)} topics, {len(filtered_topics)} after age filtering")
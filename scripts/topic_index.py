@@ -0,0 +1,155 @@
+"""
+Local index of normalized topic URLs and title fingerprints.
+
+Duplicate filtering used to download every column of every historical topic
+on each run. This index lives in a small SQLite file, is synced incrementally
+from Supabase by topic id and updated whenever a topic is inserted, so a
+duplicate lookup is a single indexed query regardless of archive size.
+"""
+
+import hashlib
+import logging
+import re
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+from cache_config import TOPIC_INDEX_PATH
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+SYNC_PAGE_SIZE = 1000
+
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    """Normalize a topic URL the same way filter_new_topics compares them."""
+    if not url:
+        return None
+    url = url.strip().split('#')[0].split('?')[0].rstrip('/')
+    parts = urlsplit(url)
+    if parts.scheme and parts.netloc:
+        # Scheme and host are case-insensitive, the path is not
+        url = f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path}"
+    return url or None
+
+
+def title_fingerprint(title: Optional[str]) -> Optional[str]:
+    """Fingerprint of a topic title that ignores case, punctuation and spacing."""
+    if not title:
+        return None
+    words = re.findall(r'[a-z0-9]+', title.lower())
+    if not words:
+        return None
+    return hashlib.sha1(' '.join(words).encode('utf-8')).hexdigest()[:16]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    id INTEGER PRIMARY KEY,
+    url_key TEXT,
+    title_key TEXT
+);
+CREATE INDEX IF NOT EXISTS topics_url_key ON topics (url_key);
+CREATE INDEX IF NOT EXISTS topics_title_key ON topics (title_key);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class TopicIndex(SQLiteStore):
+    """SQLite-backed set of topic URL keys and title fingerprints."""
+
+    def __init__(self, path: str = TOPIC_INDEX_PATH):
+        super().__init__(path, _SCHEMA)
+
+    def add(self, topic: Dict[str, Any]):
+        """Add or refresh a single topic, e.g. right after inserting it into Supabase."""
+        self.add_many([topic])
+
+    def add_many(self, topics: Iterable[Dict[str, Any]]) -> int:
+        rows = [
+            (topic['id'], normalize_url(topic.get('url')), title_fingerprint(topic.get('name')))
+            for topic in topics
+            if topic.get('id') is not None
+        ]
+        if not rows:
+            return 0
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO topics (id, url_key, title_key) VALUES (?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def remove(self, topic_id: int):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM topics WHERE id = ?", (topic_id,))
+
+    def find_url(self, url: Optional[str]) -> Optional[int]:
+        """Return the id of an indexed topic with the same normalized URL."""
+        key = normalize_url(url)
+        if key is None:
+            return None
+        with self._lock:
+            row = self.conn.execute("SELECT id FROM topics WHERE url_key = ? LIMIT 1", (key,)).fetchone()
+        return row[0] if row else None
+
+    def find_title(self, title: Optional[str]) -> Optional[int]:
+        """Return the id of an indexed topic with the same title fingerprint."""
+        key = title_fingerprint(title)
+        if key is None:
+            return None
+        with self._lock:
+            row = self.conn.execute("SELECT id FROM topics WHERE title_key = ? LIMIT 1", (key,)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM topics").fetchone()[0]
+
+    @property
+    def last_synced_id(self) -> int:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'last_synced_id'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _set_last_synced_id(self, topic_id: int):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_synced_id', ?)",
+                (str(topic_id),)
+            )
+
+    def sync(self, supabase, page_size: int = SYNC_PAGE_SIZE) -> int:
+        """
+        Pull topics newer than the last synced id from Supabase.
+
+        Only the id, url and name columns are read, in pages ordered by id.
+
+        Returns:
+            int: Number of topics added to the index
+        """
+        last_id = self.last_synced_id
+        added = 0
+        while True:
+            response = supabase.table('topics') \
+                .select('id, url, name') \
+                .gt('id', last_id) \
+                .order('id') \
+                .limit(page_size) \
+                .execute()
+            rows = response.data or []
+            if not rows:
+                break
+            added += self.add_many(rows)
+            last_id = max(row['id'] for row in rows)
+            self._set_last_synced_id(last_id)
+            if len(rows) < page_size:
+                break
+        if added:
+            logger.info(f"Synced {added} topics into the local topic index")
+        return added
+
+
+topic_index = TopicIndex()
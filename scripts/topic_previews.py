@@ -0,0 +1,74 @@
+"""
+Local cache of topic content previews.
+
+Similarity checks only need the first few hundred characters of each recent
+topic. Previews are taken from the content already stored in the sources
+table where possible, kept in a small SQLite file, and a topic URL is only
+scraped when its content has never been fetched.
+"""
+
+import logging
+import time
+from typing import Dict, Iterable
+from cache_config import TOPIC_PREVIEWS_PATH
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Characters kept per topic, comfortably more than the prompts use
+PREVIEW_CHARS = 2000
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS previews (
+    topic_id INTEGER PRIMARY KEY,
+    preview TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+)
+"""
+
+
+class TopicPreviewCache(SQLiteStore):
+    """SQLite-backed map of topic id to content preview."""
+
+    def __init__(self, path: str = TOPIC_PREVIEWS_PATH):
+        super().__init__(path, _SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, topic_ids: Iterable[int]) -> Dict[int, str]:
+        """Return the cached previews for the given topic ids."""
+        topic_ids = list(topic_ids)
+        if not topic_ids:
+            return {}
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT topic_id, preview FROM previews WHERE topic_id IN ({','.join('?' * len(topic_ids))})",
+                topic_ids
+            ).fetchall()
+        previews = dict(rows)
+        self.hits += len(previews)
+        self.misses += len(topic_ids) - len(previews)
+        return previews
+
+    def store_many(self, previews: Dict[int, str]) -> int:
+        rows = [
+            (topic_id, content[:PREVIEW_CHARS], time.time())
+            for topic_id, content in previews.items()
+            if topic_id is not None and content
+        ]
+        if not rows:
+            return 0
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO previews (topic_id, preview, fetched_at) VALUES (?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def remove(self, topic_id: int):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM previews WHERE topic_id = ?", (topic_id,))
+
+
+topic_previews = TopicPreviewCache()
@@ -2,14 +2,18 @@
 Module for checking similarity between topics using structured outputs.
 """
 
+import asyncio
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
-from openai import OpenAI
+from openai_client import openai_manager
 import logging
 from extract_text import scrape_content, fetch_using_proxy
 from topic_generator import get_latest_topics
 from scripts.supabase_utils import supabase
+from supabase_query import Query, TOPICS
+from topic_vectors import topic_vectors, DUPLICATE, UNIQUE
+from topic_previews import topic_previews
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +45,78 @@ async def get_topic_content(topic: Dict[str, Any]) -> Optional[str]:
         logger.error(f"Error fetching content for topic {topic['name']}: {e}")
         return None
 
+def get_stored_source_content(topics: List[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    Look up content already scraped into the sources table for a batch of topics.
+    
+    Args:
+        topics: Topics with an id and url
+        
+    Returns:
+        Dict mapping topic id to stored content, preferring the source with the topic's own URL
+    """
+    urls = {topic['id']: topic.get('url') for topic in topics}
+    response = supabase.table('sources') \
+        .select('topic_id, url, content') \
+        .in_('topic_id', list(urls)) \
+        .execute()
+    
+    content_by_topic = {}
+    for source in response.data if response and hasattr(response, 'data') else []:
+        topic_id = source.get('topic_id')
+        if not source.get('content'):
+            continue
+        if topic_id not in content_by_topic or source.get('url') == urls.get(topic_id):
+            content_by_topic[topic_id] = source['content']
+    return content_by_topic
+
+async def attach_topic_content(topics: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fill in topic['content'] for topics that don't have it yet.
+    
+    Previews are read from the local preview cache, then from content already
+    stored in the sources table; only topics that were never fetched are scraped.
+    
+    Args:
+        topics: The topics to fill in, modified in place
+        
+    Returns:
+        The same list of topics
+    """
+    pending = [topic for topic in topics if not topic.get('content') and topic.get('id') is not None]
+    
+    if pending:
+        cached = topic_previews.get_many(topic['id'] for topic in pending)
+        for topic in pending:
+            if topic['id'] in cached:
+                topic['content'] = cached[topic['id']]
+        pending = [topic for topic in pending if not topic.get('content')]
+    
+    fetched = {}
+    if pending:
+        try:
+            fetched = await asyncio.to_thread(get_stored_source_content, pending)
+        except Exception as e:
+            logger.error(f"Error fetching stored source content: {e}")
+        for topic in pending:
+            if topic['id'] in fetched:
+                topic['content'] = fetched[topic['id']]
+        pending = [topic for topic in pending if not topic.get('content')]
+    
+    # Topics never fetched before (or without an id) still need a scrape
+    to_scrape = pending + [topic for topic in topics if not topic.get('content') and topic.get('id') is None]
+    if to_scrape:
+        logger.info(f"Scraping content for {len(to_scrape)} topics without a stored preview")
+        contents = await asyncio.gather(*(get_topic_content(topic) for topic in to_scrape))
+        for topic, content in zip(to_scrape, contents):
+            if content:
+                topic['content'] = content
+                if topic.get('id') is not None:
+                    fetched[topic['id']] = content
+    
+    topic_previews.store_many(fetched)
+    return topics
+
 async def get_recent_topics(hours: int = 48) -> List[Dict[str, Any]]:
     """
     Get topics from the last specified hours.
@@ -53,24 +129,21 @@ async def get_recent_topics(hours: int = 48) -> List[Dict[str, Any]]:
     """
     try:
         cutoff_time = datetime.now() - timedelta(hours=hours)
-        response = supabase.table('topics').select('*').gte('date_published', cutoff_time.isoformat()).execute()
+        query = Query(supabase, TOPICS, '*').gte('date_published', cutoff_time.isoformat())
+        rows = await asyncio.to_thread(query.all)
         
         # Filter to only include topics within our time window
         recent_topics = []
-        for topic in response.data if response and hasattr(response, 'data') else []:
+        for topic in rows:
             try:
                 date_published = datetime.fromisoformat(topic['date_published'].replace('Z', '+00:00'))
                 if date_published >= cutoff_time:
-                    # Get the content for each topic
-                    content = await get_topic_content(topic)
-                    if content:
-                        topic['content'] = content
                     recent_topics.append(topic)
             except (ValueError, KeyError) as e:
                 logger.warning(f"Error parsing date for topic {topic.get('name')}: {e}")
                 continue
                 
-        return recent_topics
+        return await attach_topic_content(recent_topics)
     except Exception as e:
         logger.error(f"Error fetching recent topics: {e}")
         return []
@@ -89,8 +162,6 @@ async def check_topic_similarity(new_topic: Dict[str, Any], recent_topics: List[
     if not recent_topics:
         return False
         
-    client = OpenAI()
-    
     # Get content for the new topic if not already present
     if 'content' not in new_topic:
         new_topic['content'] = await get_topic_content(new_topic)
@@ -110,7 +181,7 @@ async def check_topic_similarity(new_topic: Dict[str, Any], recent_topics: List[
     ])
     
     try:
-        completion = client.beta.chat.completions.parse(
+        completion = await openai_manager.parse(
             model="o3-mini",
             messages=[
                 {
@@ -146,10 +217,77 @@ async def check_topic_similarity(new_topic: Dict[str, Any], recent_topics: List[
         # In case of error, let it through (better to have a potential duplicate than miss content)
         return False
 
-async def is_topic_unique(topic: Dict[str, Any]) -> bool:
+async def get_recent_topic_rows(hours: int = 48) -> List[Dict[str, Any]]:
+    """
+    Get the rows of topics published in the last specified hours, without scraping them.
+    
+    Args:
+        hours: Number of hours to look back
+        
+    Returns:
+        List of recent topics with their id, name, description, url and date_published
+    """
+    try:
+        cutoff_time = datetime.now() - timedelta(hours=hours)
+        query = Query(supabase, TOPICS, 'id', 'name', 'description', 'url', 'date_published') \
+            .gte('date_published', cutoff_time.isoformat())
+        return await asyncio.to_thread(query.all)
+    except Exception as e:
+        logger.error(f"Error fetching recent topics: {e}")
+        return []
+
+async def is_topic_unique(topic: Dict[str, Any], hours: int = 48) -> bool:
     """
     Check if a topic is unique compared to recent topics.
     
+    Candidates are compared against the local vector index first; only
+    borderline matches are sent to the LLM, together with just those matches.
+    
+    Args:
+        topic: The topic to check
+        hours: Number of hours of recent topics to compare against
+        
+    Returns:
+        bool: True if the topic is unique, False if it's similar to recent topics
+    """
+    try:
+        recent_topics = await get_recent_topic_rows(hours=hours)
+        logger.info(f"Found {len(recent_topics)} topics from the last {hours} hours")
+        
+        # Backfill vectors for recent topics stored before they were indexed
+        missing = topic_vectors.missing(recent_topics)
+        if missing:
+            await asyncio.to_thread(topic_vectors.add_topics, missing)
+        
+        verdict, matches = await asyncio.to_thread(topic_vectors.classify, topic, hours)
+    except Exception as e:
+        logger.error(f"Vector similarity check failed, falling back to LLM comparison: {e}")
+        return await is_topic_unique_llm(topic)
+    
+    if verdict == DUPLICATE:
+        topic_id, name, score = matches[0]
+        logger.info(f"Topic '{topic.get('name')}' duplicates recent topic '{name}' (ID: {topic_id}, similarity {score:.2f})")
+        return False
+    if verdict == UNIQUE:
+        return True
+    
+    # Borderline: let the LLM decide, but only against the closest matches
+    match_ids = {match[0] for match in matches}
+    candidates = [recent for recent in recent_topics if recent['id'] in match_ids]
+    logger.info(f"Topic '{topic.get('name')}' is borderline against {len(candidates)} recent topics, asking the LLM")
+    await attach_topic_content(candidates)
+    try:
+        is_similar = await check_topic_similarity(topic, candidates)
+        return not is_similar
+    except Exception as e:
+        logger.error(f"Error checking topic uniqueness: {e}")
+        # In case of error, let it through (better to have a potential duplicate than miss content)
+        return True
+
+async def is_topic_unique_llm(topic: Dict[str, Any]) -> bool:
+    """
+    Check if a topic is unique by comparing it with every recent topic using the LLM.
+    
     Args:
         topic: The topic to check
         
@@ -169,4 +307,4 @@ async def is_topic_unique(topic: Dict[str, Any]) -> bool:
     except Exception as e:
         logger.error(f"Error checking topic uniqueness: {e}")
         # In case of error, let it through (better to have a potential duplicate than miss content)
-        return True 
\ No newline at end of file
+        return True
@@ -0,0 +1,231 @@
+"""
+Local vector index for near-duplicate topic detection.
+
+Every topic gets one vector when it is inserted: an OpenAI embedding, or a
+SimHash signature in offline mode. Checking a candidate is then a single
+vectorized NumPy cosine query against the recent topics, and only the
+borderline matches need to be sent to the LLM.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from dateutil import parser as date_parser
+from cache_config import TOPIC_VECTORS_PATH
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# 'embedding' uses the OpenAI embeddings API, 'simhash' works fully offline
+SIMILARITY_MODE = os.getenv('SIMILARITY_MODE', 'embedding')
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+SIMHASH_BITS = 256
+
+# Cosine thresholds per mode: at or above 'duplicate' a topic is rejected
+# outright, below 'unique' it is accepted, anything between goes to the LLM
+THRESHOLDS = {
+    'embedding': {'duplicate': 0.90, 'unique': 0.75},
+    'simhash': {'duplicate': 0.80, 'unique': 0.50},
+}
+
+DUPLICATE = 'duplicate'
+UNIQUE = 'unique'
+BORDERLINE = 'borderline'
+
+
+def topic_text(topic: Dict[str, Any]) -> str:
+    """Text used to represent a topic: its title and description."""
+    name = topic.get('name') or topic.get('title') or ''
+    description = topic.get('description') or ''
+    return f"{name}\n{description}"[:4000]
+
+
+def simhash_vector(text: str, bits: int = SIMHASH_BITS) -> np.ndarray:
+    """
+    SimHash signature of a text as a +1/-1 vector.
+
+    Word unigrams and bigrams are hashed into `bits` signed projections;
+    the cosine of two signatures tracks their Hamming similarity.
+    """
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    totals = np.zeros(bits, dtype=np.float32)
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=bits // 8).digest()
+        signs = np.unpackbits(np.frombuffer(digest, dtype=np.uint8)).astype(np.float32) * 2 - 1
+        totals += signs
+    return np.where(totals >= 0, 1.0, -1.0).astype(np.float32)
+
+
+def embed_texts(texts: List[str], mode: str = SIMILARITY_MODE) -> Tuple[str, np.ndarray]:
+    """
+    Compute vectors for a batch of texts.
+
+    Returns:
+        Tuple of the model name the vectors belong to and a (len(texts), dim) array
+    """
+    if mode == 'simhash':
+        vectors = [simhash_vector(text) for text in texts]
+        return f"simhash-{SIMHASH_BITS}", np.vstack(vectors) if vectors else np.zeros((0, SIMHASH_BITS), dtype=np.float32)
+
+    from openai_client import openai_manager
+    response = openai_manager.sync_client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+    vectors = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    return EMBEDDING_MODEL, np.asarray(vectors, dtype=np.float32)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _to_utc(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        dt = date_parser.parse(value)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS topic_vectors (
+    topic_id INTEGER PRIMARY KEY,
+    model TEXT NOT NULL,
+    name TEXT,
+    published REAL,
+    vector BLOB NOT NULL
+)
+"""
+
+
+class TopicVectorIndex(SQLiteStore):
+    """SQLite-backed store of topic vectors with an in-memory NumPy matrix for queries."""
+
+    def __init__(self, path: str = TOPIC_VECTORS_PATH, mode: str = SIMILARITY_MODE):
+        super().__init__(path, _SCHEMA)
+        self.mode = mode
+        self.thresholds = THRESHOLDS.get(mode, THRESHOLDS['embedding'])
+        # Cached query matrix: (model, ids, names, published timestamps, normalized vectors)
+        self._matrix = None
+
+    def _embed(self, topics: List[Dict[str, Any]]) -> Tuple[str, np.ndarray]:
+        return embed_texts([topic_text(topic) for topic in topics], self.mode)
+
+    def missing(self, topics: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Topics that have an id but no stored vector yet."""
+        topics = [topic for topic in topics if topic.get('id') is not None]
+        if not topics:
+            return []
+        with self._lock:
+            known = {row[0] for row in self.conn.execute(
+                f"SELECT topic_id FROM topic_vectors WHERE topic_id IN ({','.join('?' * len(topics))})",
+                [topic['id'] for topic in topics]
+            )}
+        return [topic for topic in topics if topic['id'] not in known]
+
+    def add_topics(self, topics: List[Dict[str, Any]]) -> int:
+        """Compute and store vectors for topics with an id. One embedding request per call."""
+        topics = [topic for topic in topics if topic.get('id') is not None]
+        if not topics:
+            return 0
+        model, vectors = self._embed(topics)
+        rows = []
+        for topic, vector in zip(topics, vectors):
+            published = _to_utc(topic.get('date_published'))
+            rows.append((
+                topic['id'],
+                model,
+                topic.get('name'),
+                published.timestamp() if published else None,
+                vector.astype(np.float32).tobytes(),
+            ))
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO topic_vectors (topic_id, model, name, published, vector) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._matrix = None
+        return len(rows)
+
+    async def add_topic(self, topic: Dict[str, Any]):
+        """Store the vector for a newly inserted topic without blocking the event loop."""
+        try:
+            await asyncio.to_thread(self.add_topics, [topic])
+        except Exception as e:
+            logger.error(f"Failed to store vector for topic {topic.get('id')}: {e}")
+
+    def _load_matrix(self, model: str):
+        with self._lock:
+            if self._matrix is not None and self._matrix[0] == model:
+                return self._matrix
+            rows = self.conn.execute(
+                "SELECT topic_id, name, published, vector FROM topic_vectors WHERE model = ?",
+                (model,)
+            ).fetchall()
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            names = [row[1] for row in rows]
+            published = np.array([row[2] if row[2] is not None else np.nan for row in rows], dtype=np.float64)
+            vectors = np.vstack([np.frombuffer(row[3], dtype=np.float32) for row in rows]) if rows else np.zeros((0, 0), dtype=np.float32)
+            self._matrix = (model, ids, names, published, _normalize(vectors) if rows else vectors)
+            return self._matrix
+
+    def nearest(self, topic: Dict[str, Any], hours: Optional[int] = 48, k: int = 5) -> List[Tuple[int, str, float]]:
+        """
+        Most similar stored topics to a candidate.
+
+        Args:
+            topic: Candidate topic (does not need an id)
+            hours: Only consider topics published within this many hours (None for all)
+            k: Number of neighbours to return
+
+        Returns:
+            List of (topic_id, name, cosine similarity), best first
+        """
+        model, query = self._embed([topic])
+        _, ids, names, published, vectors = self._load_matrix(model)
+        if not len(ids):
+            return []
+
+        scores = vectors @ _normalize(query[0])
+        mask = ids != topic.get('id', -1)
+        if hours is not None:
+            cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours)).timestamp()
+            # Topics without a publish date are kept rather than silently ignored
+            mask &= np.isnan(published) | (published >= cutoff)
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+
+        top = candidates[np.argsort(-scores[candidates])[:k]]
+        return [(int(ids[i]), names[i], float(scores[i])) for i in top]
+
+    def classify(self, topic: Dict[str, Any], hours: Optional[int] = 48, k: int = 5) -> Tuple[str, List[Tuple[int, str, float]]]:
+        """
+        Decide whether a candidate duplicates a recent topic.
+
+        Returns:
+            Tuple of the verdict (DUPLICATE, UNIQUE or BORDERLINE) and the
+            neighbours that fell in the borderline band (or the duplicate match)
+        """
+        neighbours = self.nearest(topic, hours, k)
+        if not neighbours:
+            return UNIQUE, []
+        best = neighbours[0]
+        if best[2] >= self.thresholds['duplicate']:
+            return DUPLICATE, [best]
+        borderline = [n for n in neighbours if n[2] >= self.thresholds['unique']]
+        if borderline:
+            return BORDERLINE, borderline
+        return UNIQUE, []
+
+
+topic_vectors = TopicVectorIndex()
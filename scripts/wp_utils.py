@@ -1,6 +1,7 @@
 import os
 import json
 import httpx
+from http_clients import get_client
 import csv
 import base64
 from bs4 import BeautifulSoup
@@ -66,7 +67,7 @@ def delete_wp_post(wp_id):
     timeouts = [10, 20, 30]  # seconds
     for timeout in timeouts:
         try:
-            response = httpx.delete(url, headers=HEADERS, timeout=timeout)
+            response = get_client().delete(url, headers=HEADERS, timeout=timeout)
             if response.status_code == 200:
                 print(f"Successfully deleted post with ID {numeric_id}")
                 return response.json()
@@ -98,7 +99,7 @@ def update_wp_post(post_info):
         print(f"Failed to type check post info: {e}")
         return
     try:
-        response = httpx.post(url, json=post_info, headers=headers)
+        response = get_client().post(url, json=post_info, headers=headers)
         if response.status_code != 200:
             print(f"Failed to update post: {response.text}")
             return
@@ -213,7 +214,7 @@ def add_tag_to_wordpress(tag):
     }
 
     # Check if the tag already exists
-    response = httpx.get(f"{tags_endpoint}?search={tag}", headers=headers)
+    response = get_client().get(f"{tags_endpoint}?search={tag}", headers=headers)
     if response.status_code == 200:
         tags = response.json()
         for existing_tag in tags:
@@ -227,7 +228,7 @@ def add_tag_to_wordpress(tag):
         'description': f'Articles related to {tag}',
         'slug': tag.lower().replace(' ', '-')
     }
-    response = httpx.post(tags_endpoint, headers=headers, json=payload)
+    response = get_client().post(tags_endpoint, headers=headers, json=payload)
     if response.status_code == 201:
         print(f"Created tag '{tag}' with ID {response.json()['id']}")
         return response.json()['id']
@@ -261,7 +262,7 @@ def upload_media_to_wordpress(image_data, title=None, alt_text=None):
         
         # Make the request with proper error handling
         try:
-            response = httpx.post(
+            response = get_client().post(
                 media_endpoint,
                 headers=headers,
                 content=image_data,
@@ -285,7 +286,7 @@ def upload_media_to_wordpress(image_data, title=None, alt_text=None):
                             'Authorization': f'Basic {auth_token}',
                             'Content-Type': 'application/json'
                         }
-                        update_response = httpx.post(
+                        update_response = get_client().post(
                             f"{media_endpoint}/{media_id}",
                             headers=update_headers,
                             json=update_data,
@@ -525,7 +526,7 @@ def create_wordpress_post(post_info, immediate_post=True, delay_hours=1):
         
         # Create the post
         print("Creating WordPress post with data:", json.dumps(post_info, indent=2))
-        response = httpx.post(post_endpoint, headers=headers, json=post_info, timeout=30.0)
+        response = get_client().post(post_endpoint, headers=headers, json=post_info, timeout=30.0)
         
         if response.status_code == 201:
             created_post = response.json()
@@ -534,7 +535,7 @@ def create_wordpress_post(post_info, immediate_post=True, delay_hours=1):
             # Update meta fields separately if needed
             if meta_data:
                 meta_endpoint = f"{BASE_URL}/posts/{created_post['id']}"
-                meta_response = httpx.post(meta_endpoint, headers=headers, json={'meta': meta_data})
+                meta_response = get_client().post(meta_endpoint, headers=headers, json={'meta': meta_data})
                 if meta_response.status_code != 200:
                     print(f"Warning: Failed to update meta fields: {meta_response.text}")
             
@@ -591,7 +592,7 @@ def fetch_from_wp_api(endpoint):
         
     url = f"{BASE_URL}/{endpoint}"
     try:
-        response = httpx.get(url, headers=HEADERS)
+        response = get_client().get(url, headers=HEADERS)
         if response.status_code == 200:
             return response.json()
         else:
@@ -606,7 +607,7 @@ def fetch_posts_since_date(date_str):
     page = 1
     while True:
         params = {'per_page': 100, 'page': page, 'after': date_str}
-        response = httpx.get(f"{BASE_URL}/posts", headers=HEADERS, params=params)
+        response = get_client().get(f"{BASE_URL}/posts", headers=HEADERS, params=params)
         if response.status_code != 200:
             print(f"Failed to fetch posts on page {page}: {response.text}")
             break